@@ -2,15 +2,24 @@
 Flask REST API server for the Earning Robot.
 Provides HTTP endpoints for task execution and management.
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from backend.config import Config
 from backend.database import Database, User, Task, Transaction
 from backend.ai_providers import AIManager
 from billing.payment_processor import PaymentProcessor
 from billing.reporting import ReportGenerator
+from billing.analytics import get_timeseries
+from backend.stats import get_stats_snapshot
+from backend.user_cache import get_or_create_user_id
+from backend.money import to_float
+from backend.response_cache import cached_response, set_version_source
+from backend.http_encoding import init_response_encoding, dumps_bytes
+from backend.pagination import MAX_PAGE_SIZE, apply_keyset, decode_cursor, encode_cursor, iter_keyset
 from backend.optimizer_api import register_optimizer_api
 from backend.optimizer_middleware import get_optimizer_middleware
 from datetime import datetime
+from functools import wraps
+import hmac
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -18,9 +27,11 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = Config.SECRET_KEY
+init_response_encoding(app)
 
 # Initialize database
 db = Database(Config.DATABASE_PATH).initialize()
+set_version_source(lambda domains: db.read_versions(domains))
 ai_manager = AIManager()
 
 # Register Model Optimizer API
@@ -63,17 +74,13 @@ def create_task():
         
         try:
             # Get or create user
-            user = None
+            user_id = None
             if user_identifier:
-                user = session.query(User).filter_by(email=user_identifier).first()
-                if not user:
-                    user = User(email=user_identifier)
-                    session.add(user)
-                    session.commit()
+                user_id = get_or_create_user_id(session, 'email', user_identifier)
             
             # Create task record
             task = Task(
-                user_id=user.id if user else None,
+                user_id=user_id,
                 task_type='completion',
                 ai_provider=provider,
                 input_text=prompt,
@@ -107,13 +114,7 @@ def create_task():
             except Exception as e:
                 logger.warning(f"Failed to log usage to optimizer: {e}")
             
-            # Record expense
-            payment_processor = PaymentProcessor(session)
-            payment_processor.record_expense(
-                amount=result['cost'],
-                category='api_cost',
-                description=f"{provider.upper()} API - {result['tokens_used']} tokens"
-            )
+            # The API cost reaches the ledger via the expense accumulator job
             
             return jsonify({
                 'task_id': task.id,
@@ -158,39 +159,154 @@ def get_task(task_id):
         session.close()
 
 
+# Lightweight task columns that listings and exports may project
+TASK_FIELDS = {
+    'id': Task.id,
+    'status': Task.status,
+    'provider': Task.ai_provider,
+    'task_type': Task.task_type,
+    'user_id': Task.user_id,
+    'tokens_used': Task.tokens_used,
+    'cost': Task.cost,
+    'created_at': Task.created_at,
+    'completed_at': Task.completed_at,
+}
+DEFAULT_LIST_FIELDS = ['id', 'status', 'provider', 'created_at']
+
+
+def _parse_task_fields(default):
+    """Parse the `fields` query parameter into a list of known field names"""
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default)
+    
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in TASK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _parse_datetime_arg(name):
+    """Parse an optional ISO-8601 query parameter"""
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: expected ISO-8601 date or datetime")
+
+
+def _task_listing_query(session, fields):
+    """Build a projected, filtered task query from request arguments"""
+    # Ordering columns are always selected so the next cursor can be built
+    columns = [TASK_FIELDS[f].label(f) for f in fields]
+    if 'id' not in fields:
+        columns.append(Task.id.label('id'))
+    if 'created_at' not in fields:
+        columns.append(Task.created_at.label('created_at'))
+    
+    query = session.query(*columns)
+    
+    status = request.args.get('status')
+    provider = request.args.get('provider')
+    since = _parse_datetime_arg('since')
+    until = _parse_datetime_arg('until')
+    
+    if status:
+        query = query.filter(Task.status == status)
+    if provider:
+        query = query.filter(Task.ai_provider == provider)
+    if since:
+        query = query.filter(Task.created_at >= since)
+    if until:
+        query = query.filter(Task.created_at < until)
+    
+    return query
+
+
+def _serialize_task_row(row, fields):
+    """Convert a projected task row into a JSON-friendly dict"""
+    item = {}
+    for field in fields:
+        value = getattr(row, field)
+        item[field] = value.isoformat() if isinstance(value, datetime) else value
+    return item
+
+
 @app.route('/api/tasks', methods=['GET'])
 def list_tasks():
-    """List all tasks with optional filtering"""
+    """
+    List tasks with cursor pagination and optional filtering
+    
+    Query params:
+    - status, provider: exact-match filters
+    - since, until: ISO-8601 creation time range (until is exclusive)
+    - fields: comma-separated projection (default: id,status,provider,created_at)
+    - limit: page size (default: 50, max: 500)
+    - cursor: `next_cursor` from the previous page
+    """
     session = db.get_session()
     
     try:
-        status = request.args.get('status')
-        limit = int(request.args.get('limit', 50))
-        
-        query = session.query(Task)
+        try:
+            fields = _parse_task_fields(DEFAULT_LIST_FIELDS)
+            limit = min(max(int(request.args.get('limit', 50)), 1), MAX_PAGE_SIZE)
+            cursor = request.args.get('cursor')
+            position = decode_cursor(cursor) if cursor else None
+            query = _task_listing_query(session, fields)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if status:
-            query = query.filter_by(status=status)
+        # Fetch one extra row to know whether another page exists
+        rows = apply_keyset(query, Task.created_at, Task.id, position).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
-        tasks = query.order_by(Task.created_at.desc()).limit(limit).all()
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
         
         return jsonify({
-            'tasks': [
-                {
-                    'id': task.id,
-                    'status': task.status,
-                    'provider': task.ai_provider,
-                    'created_at': task.created_at.isoformat()
-                }
-                for task in tasks
-            ]
+            'tasks': [_serialize_task_row(row, fields) for row in rows],
+            'next_cursor': next_cursor
         })
         
     finally:
         session.close()
 
 
+@app.route('/api/tasks/export', methods=['GET'])
+def export_tasks():
+    """
+    Stream matching tasks as NDJSON (one JSON object per line)
+    
+    Accepts the same filters and `fields` as /api/tasks (default: all
+    lightweight fields). Rows are read in keyset batches, so exports of any
+    size run in constant memory.
+    """
+    session = db.get_session()
+    
+    try:
+        fields = _parse_task_fields(TASK_FIELDS.keys())
+        query = _task_listing_query(session, fields)
+    except ValueError as e:
+        session.close()
+        return jsonify({'error': str(e)}), 400
+    
+    def generate():
+        try:
+            for row in iter_keyset(query, Task.created_at, Task.id):
+                yield dumps_bytes(_serialize_task_row(row, fields)) + b'\n'
+        finally:
+            session.close()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 @app.route('/api/report/<report_type>', methods=['GET'])
+@cached_response('transactions', 'fx_rates')
 def get_report(report_type):
     """
     Get financial report
@@ -204,6 +320,8 @@ def get_report(report_type):
     
     try:
         generator = ReportGenerator(session)
+        breakdown_days = 7 if report_type == 'weekly' else 30
+        generator.prefetch(report_type, breakdown_days)
         
         if report_type == 'daily':
             report = generator.get_daily_summary()
@@ -213,9 +331,7 @@ def get_report(report_type):
             report = generator.get_monthly_summary()
         
         # Add category breakdown
-        report['breakdown'] = generator.get_category_breakdown(
-            7 if report_type == 'weekly' else 30
-        )
+        report['breakdown'] = generator.get_category_breakdown(breakdown_days)
         
         return jsonify(report)
         
@@ -223,6 +339,34 @@ def get_report(report_type):
         session.close()
 
 
+@app.route('/api/analytics/timeseries', methods=['GET'])
+@cached_response('transactions', 'fx_rates')
+def get_analytics_timeseries():
+    """
+    Get income/expenses/profit as a bucketed time series
+    
+    Query params: bucket (hour, day, week, month), start, end (ISO-8601),
+    group_by (category, provider)
+    """
+    session = db.get_session()
+    
+    try:
+        series = get_timeseries(
+            session,
+            bucket=request.args.get('bucket', 'day'),
+            start=_parse_datetime_arg('start'),
+            end=_parse_datetime_arg('end'),
+            group_by=request.args.get('group_by')
+        )
+        return jsonify(series)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+        
+    finally:
+        session.close()
+
+
 @app.route('/api/payment/subscription', methods=['POST'])
 def create_subscription():
     """Create a subscription checkout session"""
@@ -237,11 +381,7 @@ def create_subscription():
         
         try:
             # Get or create user
-            user = session.query(User).filter_by(email=email).first()
-            if not user:
-                user = User(email=email)
-                session.add(user)
-                session.commit()
+            user = session.get(User, get_or_create_user_id(session, 'email', email))
             
             # Create payment session
             payment_processor = PaymentProcessor(session)
@@ -313,53 +453,55 @@ def stripe_webhook():
         session.close()
 
 
+@app.route('/api/telegram/webhook', methods=['POST'])
+def telegram_webhook():
+    """Receive a Telegram update (TELEGRAM_MODE=webhook)"""
+    from frontend.telegram_webhook import get_webhook_dispatcher
+    
+    if not Config.TELEGRAM_WEBHOOK_SECRET:
+        return jsonify({'error': 'Telegram webhook disabled (TELEGRAM_WEBHOOK_SECRET not set)'}), 403
+    token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), Config.TELEGRAM_WEBHOOK_SECRET.encode('utf-8')):
+        return jsonify({'error': 'Invalid secret token'}), 401
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'update_id' not in data:
+        return jsonify({'error': 'Invalid update'}), 400
+    
+    dispatcher = get_webhook_dispatcher()
+    if dispatcher is None:
+        return jsonify({'error': 'Telegram bot is not running in this process'}), 503
+    if not dispatcher.submit(data):
+        # Telegram retries non-2xx deliveries later
+        return jsonify({'error': 'Update queue full'}), 503
+    
+    return jsonify({'ok': True})
+
+
 @app.route('/api/stats', methods=['GET'])
+@cached_response('tasks', 'users', 'transactions')
 def get_statistics():
     """Get overall statistics"""
     session = db.get_session()
     
     try:
-        from sqlalchemy import func
-        
-        # Task statistics
-        total_tasks = session.query(Task).count()
-        completed_tasks = session.query(Task).filter_by(status='completed').count()
-        total_tokens = session.query(func.sum(Task.tokens_used)).scalar() or 0
-        total_api_cost = session.query(func.sum(Task.cost)).scalar() or 0.0
-        
-        # User statistics
-        total_users = session.query(User).count()
-        active_subscriptions = session.query(User).filter_by(
-            subscription_type='monthly',
-            is_active=True
-        ).count()
-        
-        # Financial statistics
-        total_income = session.query(func.sum(Transaction.amount)).filter_by(
-            transaction_type='income',
-            status='completed'
-        ).scalar() or 0.0
-        
-        total_expenses = session.query(func.sum(Transaction.amount)).filter_by(
-            transaction_type='expense',
-            status='completed'
-        ).scalar() or 0.0
+        stats = get_stats_snapshot(session)
         
         return jsonify({
             'tasks': {
-                'total': total_tasks,
-                'completed': completed_tasks,
-                'total_tokens': total_tokens,
-                'total_cost': round(total_api_cost, 2)
+                'total': stats['total_tasks'],
+                'completed': stats['completed_tasks'],
+                'total_tokens': stats['total_tokens'],
+                'total_cost': to_float(stats['total_task_cost_micros'], 2)
             },
             'users': {
-                'total': total_users,
-                'subscriptions': active_subscriptions
+                'total': stats['total_users'],
+                'subscriptions': stats['active_subscriptions']
             },
             'financials': {
-                'total_income': round(total_income, 2),
-                'total_expenses': round(total_expenses, 2),
-                'profit': round(total_income - total_expenses, 2)
+                'total_income': to_float(stats['total_income_micros'], 2),
+                'total_expenses': to_float(stats['total_expenses_micros'], 2),
+                'profit': to_float(stats['total_income_micros'] - stats['total_expenses_micros'], 2)
             }
         })
         
@@ -367,6 +509,65 @@ def get_statistics():
         session.close()
 
 
+def require_admin(view):
+    """Allow the request only with a valid `X-Admin-Token` header"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not Config.ADMIN_TOKEN:
+            return jsonify({'error': 'Admin API disabled (ADMIN_TOKEN not set)'}), 403
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token.encode('utf-8'), Config.ADMIN_TOKEN.encode('utf-8')):
+            return jsonify({'error': 'Invalid admin token'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/api/admin/jobs', methods=['GET'])
+@require_admin
+def list_scheduler_jobs():
+    """List scheduled jobs with their run metrics"""
+    from backend.scheduler import get_active_scheduler, job_metrics, job_specs
+    
+    session = db.get_session()
+    
+    try:
+        metrics = job_metrics(session)
+    finally:
+        session.close()
+    
+    scheduler = get_active_scheduler()
+    if scheduler:
+        jobs = scheduler.list_jobs()
+    else:
+        jobs = [
+            {'id': spec['id'], 'name': spec['name'], 'trigger': str(spec['trigger']), 'next_run_time': None}
+            for spec in job_specs()
+        ]
+    
+    return jsonify({
+        'scheduler_running': scheduler is not None,
+        'jobs': [{**job, 'metrics': metrics.get(job['id'])} for job in jobs]
+    })
+
+
+@app.route('/api/admin/jobs/<job_id>/run', methods=['POST'])
+@require_admin
+def trigger_scheduler_job(job_id):
+    """Run a scheduled job now (skipped if it is already running)"""
+    from backend.scheduler import get_active_scheduler
+    
+    scheduler = get_active_scheduler()
+    if scheduler is None:
+        return jsonify({'error': 'Scheduler is not running in this process'}), 503
+    
+    try:
+        scheduler.trigger(job_id)
+    except KeyError:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'job_id': job_id, 'status': 'scheduled'}), 202
+
+
 if __name__ == '__main__':
     logger.info("🚀 Starting Flask API server...")
     app.run(host=Config.HOST, port=Config.PORT, debug=True)
@@ -0,0 +1,300 @@
+"""
+Content-addressed blob store for large text fields.
+Prompts, LLM outputs and generated content are stored once, compressed,
+in a `content_blobs` table keyed by SHA-256. Hot tables keep only the hash,
+the size and a short preview; the full text is loaded lazily on access.
+Blobs no longer referenced by any row are removed by `sweep_blobs`.
+"""
+from sqlalchemy import Table, Column, String, Integer, LargeBinary, DateTime, event, inspect, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Mapper, object_session
+from datetime import datetime
+import hashlib
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 200
+COMPRESSION_LEVEL = 6
+MIGRATION_BATCH_SIZE = 500
+SWEEP_BATCH_SIZE = 500
+
+# Instance attribute holding a BlobText's loaded value
+CACHE_PREFIX = '_blob_text_'
+
+
+def define_blob_table(metadata):
+    """
+    Declare the `content_blobs` table on a MetaData
+
+    Args:
+        metadata: MetaData of the database that should hold the blobs
+
+    Returns:
+        The blob Table
+    """
+    return Table(
+        'content_blobs', metadata,
+        Column('hash', String(64), primary_key=True),  # SHA-256 of the UTF-8 text
+        Column('size', Integer, nullable=False),  # Uncompressed bytes
+        Column('encoding', String(10), nullable=False, default='zlib'),
+        Column('data', LargeBinary, nullable=False),
+        Column('created_at', DateTime, default=datetime.utcnow),
+    )
+
+
+def content_hash(value):
+    """SHA-256 hex digest of a text value"""
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def load_blob(session, blob_table, digest):
+    """
+    Fetch and decompress a blob
+
+    Args:
+        session: Session (or connection) bound to the blob database
+        blob_table: The blob Table
+        digest: Content hash
+
+    Returns:
+        The stored text, or None if the blob is missing
+    """
+    row = session.execute(
+        select(blob_table.c.data, blob_table.c.encoding).where(blob_table.c.hash == digest)
+    ).first()
+
+    if row is None:
+        logger.warning(f"Blob {digest} referenced but missing")
+        return None
+
+    data = zlib.decompress(row.data) if row.encoding == 'zlib' else row.data
+    return data.decode('utf-8')
+
+
+def _store_blobs(connection, blob_table, blobs):
+    """Insert blobs, skipping hashes that are already stored"""
+    if not blobs:
+        return
+
+    rows = [
+        {
+            'hash': digest,
+            'size': len(raw),
+            'encoding': 'zlib',
+            'data': zlib.compress(raw, COMPRESSION_LEVEL),
+            'created_at': datetime.utcnow(),
+        }
+        for digest, raw in blobs.items()
+    ]
+    connection.execute(sqlite_insert(blob_table).on_conflict_do_nothing(), rows)
+
+
+class BlobText:
+    """Model attribute backed by the blob store
+
+    Reading returns the full text (loaded once per instance, and again
+    after the instance is expired or refreshed); writing updates the
+    `<prefix>_hash/_size/_preview` columns and queues the blob to be stored
+    on the next flush.
+    """
+
+    def __init__(self, prefix, blob_table):
+        self.prefix = prefix
+        self.blob_table = blob_table
+        self.cache_key = f'{CACHE_PREFIX}{prefix}'
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+
+        if self.cache_key in obj.__dict__:
+            return obj.__dict__[self.cache_key]
+
+        digest = getattr(obj, f'{self.prefix}_hash')
+        if digest is None:
+            return None
+
+        session = object_session(obj)
+        if session is None:
+            return getattr(obj, f'{self.prefix}_preview')
+
+        value = load_blob(session, self.blob_table, digest)
+        obj.__dict__[self.cache_key] = value
+        return value
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.cache_key] = value
+
+        if value is None:
+            setattr(obj, f'{self.prefix}_hash', None)
+            setattr(obj, f'{self.prefix}_size', None)
+            setattr(obj, f'{self.prefix}_preview', None)
+            return
+
+        value = str(value)
+        raw = value.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+
+        setattr(obj, f'{self.prefix}_hash', digest)
+        setattr(obj, f'{self.prefix}_size', len(raw))
+        setattr(obj, f'{self.prefix}_preview', value[:PREVIEW_LENGTH])
+
+        pending = obj.__dict__.setdefault('_pending_blobs', {})
+        pending.setdefault(self.blob_table, {})[digest] = raw
+
+
+def _drop_loaded_text(target, attrs):
+    """Forget loaded BlobText values whose hash column was expired or refreshed"""
+    for key in [k for k in target.__dict__ if k.startswith(CACHE_PREFIX)]:
+        if attrs is None or f"{key[len(CACHE_PREFIX):]}_hash" in attrs:
+            del target.__dict__[key]
+
+
+def _on_expire(target, attrs):
+    _drop_loaded_text(target, attrs)
+
+
+def _on_refresh(target, context, attrs):
+    _drop_loaded_text(target, attrs)
+
+
+def install_blob_store(session_factory):
+    """
+    Persist queued blobs in the same transaction as the rows that use them
+
+    Also makes expired or refreshed instances reload their BlobText values.
+
+    Args:
+        session_factory: sessionmaker of the database holding the blobs
+    """
+    if not event.contains(Mapper, 'expire', _on_expire):
+        event.listen(Mapper, 'expire', _on_expire)
+        event.listen(Mapper, 'refresh', _on_refresh)
+
+    @event.listens_for(session_factory, 'before_flush')
+    def _flush_blobs(session, flush_context, instances):
+        queued = {}
+        for obj in list(session.new) + list(session.dirty):
+            pending = obj.__dict__.pop('_pending_blobs', None)
+            if not pending:
+                continue
+            for blob_table, blobs in pending.items():
+                queued.setdefault(blob_table, {}).update(blobs)
+
+        if queued:
+            connection = session.connection()
+            for blob_table, blobs in queued.items():
+                _store_blobs(connection, blob_table, blobs)
+
+
+def migrate_inline_text(engine, table_name, fields, blob_table, batch_size=MIGRATION_BATCH_SIZE):
+    """
+    Move text from legacy inline columns into the blob store
+
+    Rows are converted in batches, then the legacy column is dropped so the
+    hot table shrinks and later startups skip it (run VACUUM to return the
+    space to the OS).
+
+    Args:
+        engine: SQLAlchemy engine
+        table_name: Table with legacy text columns
+        fields: Mapping of legacy column -> blob prefix, e.g. {'input_text': 'input'}
+        blob_table: The blob Table
+
+    Returns:
+        Number of values moved
+    """
+    existing = {c['name'] for c in inspect(engine).get_columns(table_name)}
+    moved = 0
+
+    for legacy, prefix in fields.items():
+        if legacy not in existing:
+            continue
+
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(text(
+                    f"SELECT id, {legacy} AS value FROM {table_name} "
+                    f"WHERE {legacy} IS NOT NULL AND {prefix}_hash IS NULL LIMIT :limit"
+                ), {'limit': batch_size}).all()
+
+                if not rows:
+                    break
+
+                blobs = {}
+                updates = []
+                for row in rows:
+                    raw = row.value.encode('utf-8')
+                    digest = hashlib.sha256(raw).hexdigest()
+                    blobs[digest] = raw
+                    updates.append({
+                        'id': row.id,
+                        'hash': digest,
+                        'size': len(raw),
+                        'preview': row.value[:PREVIEW_LENGTH],
+                    })
+
+                _store_blobs(conn, blob_table, blobs)
+                conn.execute(text(
+                    f"UPDATE {table_name} SET {prefix}_hash = :hash, {prefix}_size = :size, "
+                    f"{prefix}_preview = :preview, {legacy} = NULL WHERE id = :id"
+                ), updates)
+                moved += len(rows)
+
+        with engine.begin() as conn:
+            try:
+                with conn.begin_nested():
+                    conn.execute(text(f'ALTER TABLE {table_name} DROP COLUMN {legacy}'))
+            except OperationalError as e:
+                # SQLite before 3.35 cannot drop columns; keep it, cleared
+                logger.warning(f"Could not drop {table_name}.{legacy}: {e}")
+
+    if moved:
+        logger.info(f"Moved {moved} inline text values from {table_name} into the blob store")
+    return moved
+
+
+def sweep_blobs(engine, blob_table, references, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Delete blobs no row references any more
+
+    Blobs are written in the same transaction as the rows that reference
+    them, so a sweep never removes a blob that is about to be used. Deletes
+    run in small batches to keep write locks short.
+
+    Args:
+        engine: SQLAlchemy engine of the blob database
+        blob_table: The blob Table
+        references: (table, hash column) pairs that point at blobs
+        batch_size: Blobs deleted per transaction
+
+    Returns:
+        Number of blobs deleted
+    """
+    existing = set(inspect(engine).get_table_names())
+    checks = [
+        f"NOT EXISTS (SELECT 1 FROM {table} WHERE {table}.{column} = b.hash)"
+        for table, column in references
+        if table in existing
+    ]
+    if blob_table.name not in existing or not checks:
+        return 0
+    unreferenced = ' AND '.join(checks)
+
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            count = conn.execute(text(
+                f"DELETE FROM {blob_table.name} WHERE hash IN ("
+                f"SELECT b.hash FROM {blob_table.name} b WHERE {unreferenced} LIMIT :limit)"
+            ), {'limit': batch_size}).rowcount
+        deleted += count
+        if count < batch_size:
+            break
+
+    if deleted:
+        logger.info(f"Deleted {deleted} unreferenced blob(s) from {blob_table.name}")
+    return deleted
@@ -0,0 +1,175 @@
+"""
+In-process caching primitives for the Earning Robot.
+Provides data version counters (bumped by write paths) and a small
+thread-safe TTL cache keyed on anything hashable. Tables listed in
+`VERSIONED_TABLES` also keep a persistent counter in `data_versions`,
+bumped by SQLite triggers, so writes from other processes or raw SQL are
+visible to readers too.
+"""
+from sqlalchemy import event, text
+import threading
+import time
+
+
+class DataVersions:
+    """Monotonic per-domain version counters
+
+    A domain is a logical data set such as `tasks`, `transactions` or
+    `usage`. Write paths bump it; readers fold the current versions into
+    cache keys and ETags so any write invalidates dependent entries.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *domains):
+        """Advance the version of every given domain"""
+        with self._lock:
+            for domain in domains:
+                self._versions[domain] = self._versions.get(domain, 0) + 1
+
+    def get(self, domain):
+        """Current version of a domain (0 if never written)"""
+        return self._versions.get(domain, 0)
+
+    def snapshot(self, domains):
+        """Tuple of (domain, version) pairs for the given domains"""
+        return tuple((domain, self.get(domain)) for domain in sorted(domains))
+
+
+class TTLCache:
+    """Thread-safe dictionary cache with per-entry expiry"""
+
+    def __init__(self, ttl=30.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value, or `default` if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value for `ttl` seconds (defaults to the cache TTL)"""
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                self._evict()
+            self._entries[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        """Remove expired entries, or the oldest one if none expired"""
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _) in self._entries.items() if expires_at < now]
+        for key in expired:
+            del self._entries[key]
+        if not expired and self._entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+
+
+# Process-wide version registry shared by all caches
+data_versions = DataVersions()
+
+
+def invalidate(*domains):
+    """Invalidate cached data derived from the given domains"""
+    data_versions.bump(*domains)
+
+
+def track_session_writes(session_factory, versions=data_versions):
+    """
+    Bump the data version of every table written through a session
+
+    Versions advance only after a successful commit, so readers never see a
+    new version paired with uncommitted data.
+
+    Args:
+        session_factory: sessionmaker whose sessions should be tracked
+        versions: DataVersions registry to bump
+    """
+    @event.listens_for(session_factory, 'after_flush')
+    def _collect(session, flush_context):
+        touched = session.info.setdefault('written_domains', set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            table = getattr(obj, '__tablename__', None)
+            if table:
+                touched.add(table)
+
+    @event.listens_for(session_factory, 'after_commit')
+    def _bump(session):
+        touched = session.info.pop('written_domains', None)
+        if touched:
+            versions.bump(*touched)
+
+    @event.listens_for(session_factory, 'after_rollback')
+    def _discard(session):
+        session.info.pop('written_domains', None)
+
+
+# Tables whose writes are counted in the `data_versions` table
+VERSIONED_TABLES = ('users', 'tasks', 'transactions', 'fx_rates')
+
+
+def install_data_versions(engine, tables=VERSIONED_TABLES):
+    """
+    Create a version row and bump triggers for every versioned table
+
+    Args:
+        engine: SQLAlchemy engine of the robot database
+        tables: Tables to count writes of
+    """
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(text(
+                "INSERT OR IGNORE INTO data_versions (domain, version) VALUES (:domain, 0)"
+            ), {'domain': table})
+            for event_name in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(text(f"""
+CREATE TRIGGER IF NOT EXISTS data_version_{table}_{event_name.lower()}
+AFTER {event_name} ON {table}
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE domain = '{table}';
+END
+"""))
+
+
+def read_data_versions(conn, domains):
+    """
+    Committed write counters of the given domains
+
+    Args:
+        conn: Connection to the robot database
+        domains: Domain names; those without a version row are skipped
+
+    Returns:
+        Tuple of (domain, version) pairs sorted by domain
+    """
+    domains = sorted(domains)
+    if not domains:
+        return ()
+    params = {f"d{i}": domain for i, domain in enumerate(domains)}
+    rows = conn.execute(text(
+        f"SELECT domain, version FROM data_versions "
+        f"WHERE domain IN ({', '.join(':' + key for key in params)}) ORDER BY domain"
+    ), params).all()
+    return tuple((row.domain, row.version) for row in rows)
@@ -14,6 +14,20 @@ class Config:
     # Telegram Bot
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
     TELEGRAM_OWNER_ID = os.getenv('TELEGRAM_OWNER_ID', '')
+    TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+    NOTIFICATION_MERGE_WINDOW = float(os.getenv('NOTIFICATION_MERGE_WINDOW', '2.0'))  # seconds
+    TELEGRAM_CONCURRENT_UPDATES = int(os.getenv('TELEGRAM_CONCURRENT_UPDATES', '64'))  # Updates handled at once
+    TELEGRAM_WORKERS = int(os.getenv('TELEGRAM_WORKERS', '16'))  # Threads for AI calls and DB work
+    TELEGRAM_MAX_INFLIGHT_PER_USER = int(os.getenv('TELEGRAM_MAX_INFLIGHT_PER_USER', '2'))
+    TELEGRAM_MODE = os.getenv('TELEGRAM_MODE', 'polling')  # polling or webhook
+    TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL', '')  # Public URL of /api/telegram/webhook
+    TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')  # Required in webhook mode
+    TELEGRAM_WEBHOOK_WORKERS = int(os.getenv('TELEGRAM_WEBHOOK_WORKERS', '4'))  # Chat-sharded workers
+    TELEGRAM_WEBHOOK_MAX_PENDING = int(os.getenv('TELEGRAM_WEBHOOK_MAX_PENDING', '1000'))
+    BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))  # messages/second, below Telegram's ~30
+    BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '8'))  # Sends in flight
+    BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '500'))  # Recipients per checkpoint
+    BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '10'))  # seconds
     
     # AI APIs
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
@@ -23,16 +37,27 @@ class Config:
     STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', '')
     STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', '')
     STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
+    STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', '')  # e.g. a local Stripe stand-in; empty = api.stripe.com
+    WEBHOOK_PROCESS_INTERVAL = int(os.getenv('WEBHOOK_PROCESS_INTERVAL', '15'))  # seconds
+    WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '200'))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '5'))
+    WEBHOOK_RETRY_BACKOFF = int(os.getenv('WEBHOOK_RETRY_BACKOFF', '30'))  # seconds, doubled per failed attempt
     
     # Application
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/robot.db')
+    SCHEDULER_DB_PATH = os.getenv('SCHEDULER_DB_PATH', 'data/scheduler.db')  # Persistent job store
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')  # X-Admin-Token for /api/admin; empty disables it
     
     # Pricing
     SUBSCRIPTION_MONTHLY_PRICE = float(os.getenv('SUBSCRIPTION_MONTHLY_PRICE', '29.99'))
     MICRO_PAYMENT_PRICE = float(os.getenv('MICRO_PAYMENT_PRICE', '0.50'))
     
     # Reporting
+    EXPENSE_FLUSH_INTERVAL = int(os.getenv('EXPENSE_FLUSH_INTERVAL', '60'))  # seconds
+    REPORTING_CURRENCY = os.getenv('REPORTING_CURRENCY', 'USD')
+    FX_RATE_SOURCE = os.getenv('FX_RATE_SOURCE', 'file')  # Registered in billing.fx
+    FX_RATES_FILE = os.getenv('FX_RATES_FILE', 'data/fx_rates.csv')
     REPORT_TIME = os.getenv('REPORT_TIME', '09:00')
     TIMEZONE = os.getenv('TIMEZONE', 'UTC')
     TRENDING_UPDATE_TIME = os.getenv('TRENDING_UPDATE_TIME', '03:00')
@@ -41,6 +66,7 @@ class Config:
     # Server
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', '5000'))
+    RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '10'))
     
     @classmethod
     def validate(cls):
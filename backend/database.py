@@ -2,14 +2,35 @@
 Database models for the Earning Robot.
 Handles transactions, users, and task tracking.
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Float, Date, DateTime, Boolean, Text, Index, UniqueConstraint, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from backend.blob_store import PREVIEW_LENGTH, BlobText, define_blob_table, install_blob_store, migrate_inline_text
+from backend.money import money_column, money_property
 from datetime import datetime
 import os
 
 Base = declarative_base()
 
+# Compressed, deduplicated storage for prompts and LLM outputs
+content_blobs = define_blob_table(Base.metadata)
+
+# Columns holding content_blobs hashes (see blob_store.sweep_blobs)
+BLOB_REFERENCES = [('tasks', 'input_hash'), ('tasks', 'output_hash')]
+
+# Float money columns of older versions -> their integer micros columns
+MONEY_COLUMNS = {
+    'transactions': {'amount': 'amount_micros'},
+    'tasks': {'cost': 'cost_micros'},
+}
+
+# Tables derived from money columns; dropped and rebuilt when outdated
+DERIVED_TABLE_GROUPS = [
+    ['stats_counters'],
+    ['ledger_daily_snapshots', 'ledger_day_closures'],
+    ['ledger_hourly_buckets'],
+]
+
 class User(Base):
     """User/Customer model"""
     __tablename__ = 'users'
@@ -17,6 +38,7 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     telegram_id = Column(String(50), unique=True, nullable=True)
     email = Column(String(100), unique=True, nullable=True)
+    stripe_customer_id = Column(String(100), nullable=True)  # Reused across checkouts
     subscription_type = Column(String(20), default='free')  # free, monthly
     subscription_expires = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -29,12 +51,22 @@ class User(Base):
 class Transaction(Base):
     """Financial transaction model"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Date-range scans for reports over live (not yet snapshotted) days
+        Index('ix_transactions_created_at', 'created_at'),
+        # A provider payment is recorded at most once (webhook retries, replays)
+        Index(
+            'uq_transactions_external_id', 'external_id',
+            unique=True, sqlite_where=text('external_id IS NOT NULL')
+        ),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, nullable=True)
     transaction_type = Column(String(20))  # income, expense
     category = Column(String(50))  # subscription, micro_payment, api_cost, other
-    amount = Column(Float)
+    amount_micros = money_column(nullable=True)  # Integer micro-units of `currency`
+    amount = money_property('amount_micros')
     currency = Column(String(3), default='USD')
     description = Column(Text)
     payment_provider = Column(String(50), nullable=True)  # stripe, paypal
@@ -49,15 +81,27 @@ class Transaction(Base):
 class Task(Base):
     """AI Task execution model"""
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # Keyset pagination order for task listings and exports
+        Index('ix_tasks_created_at_id', 'created_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, nullable=True)
     task_type = Column(String(50))  # chat, completion, analysis
     ai_provider = Column(String(20))  # openai, mistral
-    input_text = Column(Text)
-    output_text = Column(Text, nullable=True)
+    # Prompt/output live in content_blobs; the row keeps hash, size and preview
+    input_hash = Column(String(64), nullable=True, index=True)
+    input_size = Column(Integer, nullable=True)  # Bytes before compression
+    input_preview = Column(String(PREVIEW_LENGTH), nullable=True)
+    output_hash = Column(String(64), nullable=True, index=True)
+    output_size = Column(Integer, nullable=True)
+    output_preview = Column(String(PREVIEW_LENGTH), nullable=True)
+    input_text = BlobText('input', content_blobs)
+    output_text = BlobText('output', content_blobs)
     tokens_used = Column(Integer, default=0)
-    cost = Column(Float, default=0.0)
+    cost_micros = money_column()  # USD micro-units
+    cost = money_property('cost_micros')
     status = Column(String(20), default='pending')  # pending, processing, completed, failed
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -67,6 +111,207 @@ class Task(Base):
         return f"<Task {self.id} - {self.task_type} - {self.status}>"
 
 
+class StatsCounter(Base):
+    """Materialized running totals (single row, maintained by backend.stats)"""
+    __tablename__ = 'stats_counters'
+    
+    id = Column(Integer, primary_key=True)
+    total_tasks = Column(Integer, default=0, nullable=False)
+    completed_tasks = Column(Integer, default=0, nullable=False)
+    failed_tasks = Column(Integer, default=0, nullable=False)
+    total_tokens = Column(Integer, default=0, nullable=False)
+    total_task_cost_micros = Column(BigInteger, default=0, nullable=False)
+    total_users = Column(Integer, default=0, nullable=False)
+    active_users = Column(Integer, default=0, nullable=False)
+    active_subscriptions = Column(Integer, default=0, nullable=False)
+    total_income_micros = Column(BigInteger, default=0, nullable=False)
+    total_expenses_micros = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime, nullable=True)
+    reconciled_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<StatsCounter tasks={self.total_tasks} users={self.total_users}>"
+
+
+class LedgerDailySnapshot(Base):
+    """Totals of completed transactions for one closed day (see billing.ledger)"""
+    __tablename__ = 'ledger_daily_snapshots'
+    __table_args__ = (
+        UniqueConstraint('day', 'transaction_type', 'category', 'currency', name='uq_ledger_snapshot_key'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    transaction_type = Column(String(20), nullable=False)  # income, expense
+    category = Column(String(50), nullable=True)
+    currency = Column(String(3), nullable=True)
+    total_micros = Column(BigInteger, default=0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<LedgerDailySnapshot {self.day} {self.transaction_type}/{self.category} {self.total_micros} {self.currency}>"
+
+
+class LedgerDayClosure(Base):
+    """Marks a day whose snapshots are complete; removed when the day changes"""
+    __tablename__ = 'ledger_day_closures'
+    
+    day = Column(Date, primary_key=True)
+    closed_at = Column(DateTime, default=datetime.utcnow)
+    transaction_count = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<LedgerDayClosure {self.day}>"
+
+
+class LedgerHourlyBucket(Base):
+    """Completed transaction totals per hour (maintained by billing.analytics triggers)"""
+    __tablename__ = 'ledger_hourly_buckets'
+    __table_args__ = (
+        UniqueConstraint(
+            'hour', 'transaction_type', 'category', 'provider', 'currency',
+            name='uq_ledger_hourly_bucket_key'
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, nullable=False)  # Start of the hour
+    transaction_type = Column(String(20), nullable=False)  # income, expense
+    category = Column(String(50), nullable=False, default='')  # '' when unset
+    provider = Column(String(50), nullable=False, default='')  # payment_provider, '' when unset
+    currency = Column(String(3), nullable=False, default='')
+    total_micros = Column(BigInteger, default=0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<LedgerHourlyBucket {self.hour} {self.transaction_type}/{self.category} {self.total_micros}>"
+
+
+class FxRate(Base):
+    """Daily exchange rate: `rate` units of `base` per one unit of `currency` (see billing.fx)"""
+    __tablename__ = 'fx_rates'
+    __table_args__ = (
+        UniqueConstraint('day', 'base', 'currency', name='uq_fx_rates_key'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    base = Column(String(3), nullable=False)  # Reporting currency
+    currency = Column(String(3), nullable=False)
+    rate = Column(Float, nullable=False)
+    filled = Column(Boolean, default=False, nullable=False)  # Carried forward from an earlier quote
+    source = Column(String(50), nullable=True)
+    
+    def __repr__(self):
+        return f"<FxRate {self.day} {self.currency}/{self.base} {self.rate}>"
+
+
+class ExpenseTaskLink(Base):
+    """Links a task's API cost to the aggregated expense transaction (see billing.expenses)"""
+    __tablename__ = 'expense_task_links'
+    
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, unique=True, nullable=False)
+    transaction_id = Column(Integer, nullable=True, index=True)  # NULL: recorded per request before aggregation
+    
+    def __repr__(self):
+        return f"<ExpenseTaskLink task={self.task_id} transaction={self.transaction_id}>"
+
+
+class WebhookEvent(Base):
+    """Raw payment provider webhook event, stored before processing (see billing.webhooks)"""
+    __tablename__ = 'webhook_events'
+    __table_args__ = (
+        Index('ix_webhook_events_status_id', 'status', 'id'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    event_id = Column(String(100), unique=True, nullable=False)  # Provider event ID (dedup key)
+    provider = Column(String(50), default='stripe')
+    event_type = Column(String(100))
+    payload = Column(Text)  # Raw JSON body as received
+    status = Column(String(20), default='pending')  # pending, processed, ignored, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)  # Earliest retry after a failure
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<WebhookEvent {self.event_id} {self.event_type} - {self.status}>"
+
+
+class WebhookDeadLetter(Base):
+    """Webhook event that kept failing; replayable via billing.webhooks"""
+    __tablename__ = 'webhook_dead_letters'
+    
+    id = Column(Integer, primary_key=True)
+    webhook_event_id = Column(Integer, nullable=False)
+    event_id = Column(String(100))
+    event_type = Column(String(100))
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    failed_at = Column(DateTime, default=datetime.utcnow)
+    replayed_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<WebhookDeadLetter {self.event_id} {self.event_type}>"
+
+
+class JobMetric(Base):
+    """Run statistics of one scheduler job (maintained by backend.scheduler)"""
+    __tablename__ = 'scheduler_job_metrics'
+    
+    job_id = Column(String(100), primary_key=True)
+    runs = Column(Integer, default=0, nullable=False)
+    failures = Column(Integer, default=0, nullable=False)
+    skipped = Column(Integer, default=0, nullable=False)  # Previous run still going
+    missed = Column(Integer, default=0, nullable=False)  # Later than the misfire grace time
+    last_status = Column(String(20), nullable=True)  # running, success, failed
+    last_started_at = Column(DateTime, nullable=True)
+    last_finished_at = Column(DateTime, nullable=True)
+    last_success_at = Column(DateTime, nullable=True)
+    last_duration_ms = Column(Integer, nullable=True)
+    max_duration_ms = Column(Integer, default=0, nullable=False)
+    total_duration_ms = Column(BigInteger, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    
+    def __repr__(self):
+        return f"<JobMetric {self.job_id} runs={self.runs} - {self.last_status}>"
+
+
+class BroadcastJob(Base):
+    """Owner broadcast with its delivery checkpoint (maintained by frontend.broadcast)"""
+    __tablename__ = 'broadcast_jobs'
+    
+    id = Column(Integer, primary_key=True)
+    text = Column(Text, nullable=False)
+    owner_chat_id = Column(String(50), nullable=False)  # Receives progress reports
+    status = Column(String(20), default='running', nullable=False)  # running, completed, failed
+    total = Column(Integer, default=0, nullable=False)  # Recipients when the job was created
+    sent = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    # Recipients are processed in users.id order; everything up to here is done
+    last_user_id = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<BroadcastJob {self.id} {self.status} {self.sent + self.failed}/{self.total}>"
+
+
+class DataVersion(Base):
+    """Write counter of one table (bumped by triggers, see backend.cache)"""
+    __tablename__ = 'data_versions'
+    
+    domain = Column(String(50), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<DataVersion {self.domain}={self.version}>"
+
+
 class Database:
     """Database connection manager"""
     
@@ -77,17 +322,63 @@ class Database:
         
     def initialize(self):
         """Initialize database connection and create tables"""
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # Ensure data directory exists (skip for in-memory databases)
+        if self.db_path != ':memory:' and os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
         # Create engine
         self.engine = create_engine(f'sqlite:///{self.db_path}')
+        existing_tables = set(inspect(self.engine).get_table_names())
+        
+        # Derived totals from older versions are rebuilt from the source tables
+        from backend.migrations import upgrade_schema, reset_outdated_tables, migrate_money_columns, backfill_created_at
+        reset_outdated_tables(self.engine, Base.metadata, DERIVED_TABLE_GROUPS)
         
         # Create tables
         Base.metadata.create_all(self.engine)
         
+        # Upgrade tables created by older versions
+        upgrade_schema(self.engine, Base.metadata)
+        migrate_money_columns(self.engine, MONEY_COLUMNS)
+        migrate_inline_text(
+            self.engine, 'tasks',
+            {'input_text': 'input', 'output_text': 'output'},
+            content_blobs
+        )
+        backfill_created_at(self.engine, {'tasks': 'completed_at'})
+        
+        # Seed materialized counters and their maintenance triggers
+        from backend.stats import install_stats
+        install_stats(self.engine)
+        
+        # Per-table write counters for ETags, bumped by every process
+        from backend.cache import install_data_versions
+        install_data_versions(self.engine)
+        
+        # Costs of tasks from before expense aggregation are already in the ledger
+        if 'tasks' in existing_tables and 'expense_task_links' not in existing_tables:
+            from billing.expenses import mark_recorded_expenses
+            mark_recorded_expenses(self.engine)
+        
+        # Reopen closed ledger days when their transactions change
+        from billing.ledger import install_ledger
+        install_ledger(self.engine)
+        
+        # Hourly pre-aggregates for the time-series analytics API
+        from billing.analytics import install_buckets
+        install_buckets(self.engine)
+        
         # Create session factory
         self.Session = sessionmaker(bind=self.engine)
+        install_blob_store(self.Session)
+        
+        # Invalidate cached reads whenever a commit touches a table
+        from backend.cache import track_session_writes
+        track_session_writes(self.Session)
+        
+        # Drop cached user identities when users change
+        from backend.user_cache import install_user_cache
+        install_user_cache(self.Session)
         
         return self
     
@@ -97,6 +388,12 @@ class Database:
             self.initialize()
         return self.Session()
     
+    def read_versions(self, domains):
+        """Committed write counters of the given tables (see backend.cache.read_data_versions)"""
+        from backend.cache import read_data_versions
+        with self.engine.connect() as conn:
+            return read_data_versions(conn, domains)
+    
     def close(self):
         """Close database connection"""
         if self.engine:
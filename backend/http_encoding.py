@@ -0,0 +1,216 @@
+"""
+Response encoding for the Earning Robot API.
+Fast compact JSON (orjson when installed, stdlib fallback), optional
+MessagePack for machine clients and negotiated gzip/brotli/zstd
+compression of response bodies.
+
+Optional accelerators: `orjson`, `msgpack`, `brotli`, `zstandard`.
+Each is used only when importable; without them the API still serves
+compact JSON compressed with gzip.
+"""
+from flask import request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+import datetime
+import gzip
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional accelerator
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional accelerator
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional accelerator
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional accelerator
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+# Bodies smaller than this are not worth the compression overhead
+MIN_COMPRESS_SIZE = 512
+
+COMPRESSIBLE_MIMETYPES = {
+    JSON_MIMETYPE,
+    MSGPACK_MIMETYPE,
+    'application/x-ndjson',
+    'text/markdown',
+    'text/plain',
+    'text/html',
+}
+
+
+def _compress_zstd(data):
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _compress_br(data):
+    return brotli.compress(data, quality=4)
+
+
+def _compress_gzip(data):
+    return gzip.compress(data, compresslevel=6)
+
+
+# Server preference order; only installed codecs are offered
+COMPRESSORS = [
+    (name, func)
+    for name, func, available in (
+        ('zstd', _compress_zstd, zstandard is not None),
+        ('br', _compress_br, brotli is not None),
+        ('gzip', _compress_gzip, True),
+    )
+    if available
+]
+
+
+def preferred_representation():
+    """
+    Negotiate the body format for the current request
+
+    Returns:
+        'msgpack' if the client prefers MessagePack and it is installed,
+        otherwise 'json'
+    """
+    if msgpack is None or not has_request_context():
+        return 'json'
+
+    accept = request.accept_mimetypes
+    msgpack_quality = max(accept[m] for m in MSGPACK_MIMETYPES)
+    if msgpack_quality and msgpack_quality > accept[JSON_MIMETYPE]:
+        return 'msgpack'
+    return 'json'
+
+
+def _fallback_default(obj):
+    """
+    Serialize values the JSON encoders do not know natively
+
+    Dates and times become ISO 8601 strings, as orjson writes them, instead
+    of Flask's HTTP dates, so the payload does not depend on which encoder
+    is installed.
+    """
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+
+def _msgpack_default(obj):
+    """Map values MessagePack cannot encode to their JSON representation"""
+    return json.loads(dumps_bytes(obj))
+
+
+def dumps_bytes(obj):
+    """Serialize to compact UTF-8 JSON bytes using the fastest encoder available"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_fallback_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        obj, default=_fallback_default, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider using orjson and MessagePack when available"""
+
+    compact = True
+    ensure_ascii = False
+    default = staticmethod(_fallback_default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if preferred_representation() == 'msgpack':
+            body = msgpack.packb(obj, default=_msgpack_default)
+            response = self._app.response_class(body, mimetype=MSGPACK_MIMETYPE)
+        else:
+            response = self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+        if msgpack is not None:
+            response.vary.add('Accept')
+        return response
+
+
+def _choose_encoding():
+    """Pick the installed codec the client accepts with the highest quality"""
+    accepted = request.accept_encodings
+    best_name, best_func, best_quality = None, None, 0
+    for name, func in COMPRESSORS:
+        quality = accepted[name]
+        if quality > best_quality:
+            best_name, best_func, best_quality = name, func, quality
+    return best_name, best_func
+
+
+def compress_response(response):
+    """after_request hook: compress eligible bodies with a negotiated codec"""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    name, compress = _choose_encoding()
+    if not name:
+        return response
+
+    response.set_data(compress(data))
+    response.headers['Content-Encoding'] = name
+
+    # The encoded body differs byte-wise, so the validator becomes weak
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
+
+    return response
+
+
+def init_response_encoding(app):
+    """
+    Install fast JSON and response compression on a Flask app
+
+    Args:
+        app: Flask application
+    """
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
+
+    codecs = ','.join(name for name, _ in COMPRESSORS)
+    logger.info(
+        f"Response encoding: json={'orjson' if orjson else 'stdlib'}, "
+        f"msgpack={'on' if msgpack else 'off'}, compression={codecs}"
+    )
@@ -0,0 +1,174 @@
+"""
+Lightweight schema upgrades for existing Earning Robot databases.
+`create_all` only creates missing tables; this module brings tables that
+already exist up to date with the models (new columns and indexes,
+float money columns converted to integer micros, missing creation times
+filled in).
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _add_missing_columns(conn, table, existing_columns):
+    """Add model columns that are missing from an existing table"""
+    for column in table.columns:
+        if column.name in existing_columns:
+            continue
+
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        logger.info(f"Added column {table.name}.{column.name}")
+
+
+def _add_missing_indexes(conn, table, existing_indexes):
+    """Create model indexes that are missing from an existing table"""
+    for index in table.indexes:
+        if index.name in existing_indexes:
+            continue
+
+        try:
+            with conn.begin_nested():
+                index.create(conn)
+        except IntegrityError as e:
+            # Existing rows violate a new unique index; keep running without it
+            logger.error(f"Could not create unique index {index.name} on {table.name}: {e}")
+            continue
+        logger.info(f"Created index {index.name} on {table.name}")
+
+
+def upgrade_schema(engine, metadata):
+    """
+    Bring existing tables in line with the model metadata
+
+    Args:
+        engine: SQLAlchemy engine
+        metadata: MetaData holding the model tables
+    """
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            _add_missing_columns(conn, table, existing_columns)
+
+            existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            _add_missing_indexes(conn, table, existing_indexes)
+
+
+def reset_outdated_tables(engine, metadata, groups):
+    """
+    Drop derived tables whose columns no longer match the models
+
+    Each group is dropped as a whole (e.g. snapshots with the closures
+    that vouch for them); `create_all` recreates the tables empty and
+    their owners rebuild the contents from the source tables.
+
+    Args:
+        engine: SQLAlchemy engine
+        metadata: MetaData holding the model tables
+        groups: Lists of table names that are reset together
+    """
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+
+        for group in groups:
+            outdated = any(
+                name in existing_tables and not {
+                    column.name for column in metadata.tables[name].columns
+                } <= {c['name'] for c in inspector.get_columns(name)}
+                for name in group
+            )
+            if not outdated:
+                continue
+
+            for name in group:
+                if name in existing_tables:
+                    conn.execute(text(f'DROP TABLE {name}'))
+            logger.info(f"Reset outdated derived tables {', '.join(group)}")
+
+
+def migrate_money_columns(engine, tables):
+    """
+    Move float money columns into their integer micros columns
+
+    Values are rounded to the nearest micro-unit. Triggers on a migrated
+    table are dropped (their owners reinstall them against the new
+    columns), then the float column is dropped so later startups skip it.
+
+    Args:
+        engine: SQLAlchemy engine
+        tables: Mapping of table name -> {float column: micros column}
+    """
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+
+        for table_name, columns in tables.items():
+            if table_name not in existing_tables:
+                continue
+
+            existing_columns = {c['name'] for c in inspector.get_columns(table_name)}
+            legacy = {old: new for old, new in columns.items() if old in existing_columns}
+            if not legacy:
+                continue
+
+            triggers = conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table"
+            ), {'table': table_name}).scalars().all()
+            for trigger in triggers:
+                conn.execute(text(f'DROP TRIGGER {trigger}'))
+
+            for old, new in legacy.items():
+                converted = conn.execute(text(
+                    f'UPDATE {table_name} SET {new} = CAST(ROUND({old} * 1000000) AS INTEGER) '
+                    f'WHERE {new} IS NULL AND {old} IS NOT NULL'
+                )).rowcount
+
+                try:
+                    with conn.begin_nested():
+                        conn.execute(text(f'ALTER TABLE {table_name} DROP COLUMN {old}'))
+                except OperationalError as e:
+                    # SQLite before 3.35 cannot drop columns; keep it, cleared
+                    logger.warning(f"Could not drop {table_name}.{old}: {e}")
+                    conn.execute(text(f'UPDATE {table_name} SET {old} = NULL'))
+
+                logger.info(f"Converted {converted} {table_name}.{old} value(s) to {new}")
+
+
+def backfill_created_at(engine, tables):
+    """
+    Fill in NULL `created_at` values left by legacy or raw-SQL inserts
+
+    Keyset pagination skips rows without a creation time, so each one gets
+    its fallback column's value or, failing that, the table's oldest known
+    creation time (the row predates tracking), or the current time.
+
+    Args:
+        engine: SQLAlchemy engine
+        tables: Mapping of table name -> fallback timestamp column (or None)
+    """
+    now = datetime.utcnow().isoformat(sep=' ')
+    with engine.begin() as conn:
+        existing_tables = set(inspect(conn).get_table_names())
+
+        for table_name, fallback in tables.items():
+            if table_name not in existing_tables:
+                continue
+
+            candidates = [fallback] if fallback else []
+            candidates.append(f'(SELECT MIN(created_at) FROM {table_name})')
+            filled = conn.execute(text(
+                f"UPDATE {table_name} SET created_at = COALESCE({', '.join(candidates)}, :now) "
+                f"WHERE created_at IS NULL"
+            ), {'now': now}).rowcount
+            if filled:
+                logger.info(f"Backfilled created_at of {filled} {table_name} row(s)")
@@ -13,6 +13,9 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 import statistics
 
+from backend.cache import invalidate
+from backend.money import to_float, to_micros
+
 
 @dataclass
 class ModelPricing:
@@ -94,12 +97,13 @@ class ModelOptimizer:
                 task_type TEXT,
                 input_tokens INTEGER,
                 output_tokens INTEGER,
-                cost_usd REAL,
+                cost_micros INTEGER,
                 latency_ms INTEGER,
                 success INTEGER,
                 quality_rating REAL
             )
         ''')
+        self._migrate_usage_costs(cursor)
         
         # Таблица рекомендаций
         cursor.execute('''
@@ -120,6 +124,24 @@ class ModelOptimizer:
         conn.commit()
         conn.close()
     
+    def _migrate_usage_costs(self, cursor):
+        """Перенос стоимости из REAL cost_usd в целые микродоллары (старые базы)."""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(usage_records)")}
+        if 'cost_usd' not in columns:
+            return
+        
+        if 'cost_micros' not in columns:
+            cursor.execute("ALTER TABLE usage_records ADD COLUMN cost_micros INTEGER")
+        cursor.execute('''
+            UPDATE usage_records SET cost_micros = CAST(ROUND(cost_usd * 1000000) AS INTEGER)
+            WHERE cost_micros IS NULL AND cost_usd IS NOT NULL
+        ''')
+        try:
+            cursor.execute("ALTER TABLE usage_records DROP COLUMN cost_usd")
+        except sqlite3.OperationalError:
+            # SQLite < 3.35 не умеет удалять колонки - оставляем пустой
+            cursor.execute("UPDATE usage_records SET cost_usd = NULL")
+    
     def _load_model_pricing(self):
         """Загрузка актуальных цен на модели."""
         pricing_data = [
@@ -188,6 +210,7 @@ class ModelOptimizer:
         
         conn.commit()
         conn.close()
+        invalidate('pricing')
     
     def record_usage(self, record: UsageRecord):
         """Записать использование модели."""
@@ -197,7 +220,7 @@ class ModelOptimizer:
         cursor.execute('''
             INSERT INTO usage_records 
             (timestamp, provider, model, task_type, input_tokens, output_tokens, 
-             cost_usd, latency_ms, success, quality_rating)
+             cost_micros, latency_ms, success, quality_rating)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             record.timestamp,
@@ -206,7 +229,7 @@ class ModelOptimizer:
             record.task_type,
             record.input_tokens,
             record.output_tokens,
-            record.cost_usd,
+            to_micros(record.cost_usd),
             record.latency_ms,
             1 if record.success else 0,
             record.quality_rating
@@ -214,6 +237,8 @@ class ModelOptimizer:
         
         conn.commit()
         conn.close()
+        # Сбрасываем кэш ответов, зависящих от статистики использования
+        invalidate('usage')
     
     def calculate_cost(self, provider: str, model: str, 
                       input_tokens: int, output_tokens: int) -> float:
@@ -275,17 +300,17 @@ class ModelOptimizer:
         
         # Общие затраты
         cursor.execute('''
-            SELECT SUM(cost_usd), COUNT(*), AVG(cost_usd)
+            SELECT SUM(cost_micros), COUNT(*)
             FROM usage_records
             WHERE timestamp >= ?
         ''', (since,))
-        total_cost, total_requests, avg_cost = cursor.fetchone()
+        total_cost, total_requests = cursor.fetchone()
         
         # По моделям
         cursor.execute('''
             SELECT provider || '/' || model as model_name,
                    COUNT(*) as requests,
-                   SUM(cost_usd) as cost,
+                   SUM(cost_micros) as cost,
                    AVG(latency_ms) as avg_latency,
                    AVG(quality_rating) as avg_quality
             FROM usage_records
@@ -299,7 +324,7 @@ class ModelOptimizer:
         cursor.execute('''
             SELECT task_type,
                    COUNT(*) as requests,
-                   SUM(cost_usd) as cost
+                   SUM(cost_micros) as cost
             FROM usage_records
             WHERE timestamp >= ?
             GROUP BY task_type
@@ -311,14 +336,14 @@ class ModelOptimizer:
         
         return {
             "period_days": days,
-            "total_cost_usd": total_cost or 0,
+            "total_cost_usd": to_float(total_cost),
             "total_requests": total_requests or 0,
-            "average_cost_per_request": avg_cost or 0,
+            "average_cost_per_request": to_float(total_cost / total_requests) if total_requests else 0,
             "by_model": [
                 {
                     "model": row[0],
                     "requests": row[1],
-                    "cost_usd": row[2],
+                    "cost_usd": to_float(row[2]),
                     "avg_latency_ms": row[3],
                     "avg_quality": row[4]
                 }
@@ -328,7 +353,7 @@ class ModelOptimizer:
                 {
                     "task_type": row[0],
                     "requests": row[1],
-                    "cost_usd": row[2]
+                    "cost_usd": to_float(row[2])
                 }
                 for row in by_task
             ]
@@ -0,0 +1,102 @@
+"""
+Money representation for the Earning Robot.
+Amounts are stored as integer micro-units (1 USD = 1_000_000 micros) with
+a currency code next to them. SQL aggregates sum integers exactly;
+values become Decimal only when presented, and float only at the JSON /
+legacy attribute boundary.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+from sqlalchemy import BigInteger, Column
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.sql import cast
+from sqlalchemy.types import Float
+
+MICROS_PER_UNIT = 1_000_000
+DEFAULT_CURRENCY = 'USD'
+
+CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£'}
+
+
+def to_micros(value):
+    """
+    Convert an amount in major units to integer micros
+
+    Floats go through their shortest repr, so 0.1 becomes exactly 100000.
+
+    Args:
+        value: int, float, Decimal or numeric string (None stays None)
+
+    Returns:
+        Integer micros
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value * MICROS_PER_UNIT
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * MICROS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+
+def from_micros(micros):
+    """Exact Decimal amount in major units (None -> Decimal 0)"""
+    return Decimal(int(micros or 0)).scaleb(-6)
+
+
+def to_decimal(micros, places=2):
+    """Decimal amount rounded (banker's rounding) to `places` decimals"""
+    return from_micros(micros).quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_EVEN)
+
+
+def to_float(micros, places=None):
+    """
+    Float amount for JSON and legacy callers
+
+    Args:
+        micros: Integer micros
+        places: Round to this many decimals via Decimal (None: full precision)
+    """
+    if places is None:
+        return (micros or 0) / MICROS_PER_UNIT
+    return float(to_decimal(micros, places))
+
+
+def format_money(micros, currency=DEFAULT_CURRENCY, places=2):
+    """Human-readable amount, e.g. '$12.34', '€12.34' or '12.34 CHF'"""
+    amount = to_decimal(micros, places)
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    if symbol:
+        return f"{symbol}{amount}"
+    return f"{amount} {currency}"
+
+
+def money_column(**kwargs):
+    """Integer micros column (use with `money_property`)"""
+    kwargs.setdefault('default', 0)
+    return Column(BigInteger, **kwargs)
+
+
+def money_property(micros_attr):
+    """
+    Float view of a micros column, readable and writable
+
+    Keeps `Transaction(amount=29.99)` and `task.cost` working while the
+    database stores integers. In SQL expressions it divides the column, so
+    prefer the micros column for filters and aggregates.
+
+    Args:
+        micros_attr: Name of the micros column attribute
+    """
+    def getter(self):
+        micros = getattr(self, micros_attr)
+        return None if micros is None else micros / MICROS_PER_UNIT
+
+    def setter(self, value):
+        setattr(self, micros_attr, to_micros(value))
+
+    def expression(cls):
+        return cast(getattr(cls, micros_attr), Float) / MICROS_PER_UNIT
+
+    prop = hybrid_property(getter)
+    prop = prop.setter(setter)
+    return prop.expression(expression)
@@ -0,0 +1,225 @@
+"""
+Outbound Telegram notifications for the Earning Robot.
+Reports, alerts and job results are queued and sent by a background
+thread over one pooled HTTP session. Messages queued for the same chat
+within `merge_window` seconds are merged into one message; sends are paced
+to Telegram's per-chat and global rate limits and retried with backoff
+(honouring `retry_after` on HTTP 429).
+"""
+from backend.config import Config
+from backend.rate_limit import TokenBucket
+import logging
+import queue
+import random
+import threading
+import time
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Bot API limits: message length, ~1 message/second per chat, ~30/second overall
+MAX_MESSAGE_LENGTH = 4096
+CHAT_RATE = 1.0
+GLOBAL_RATE = 30.0
+
+MERGE_SEPARATOR = '\n\n'
+
+_STOP = object()
+
+
+def merge_messages(texts, limit=MAX_MESSAGE_LENGTH):
+    """
+    Join queued texts into as few messages as fit the length limit
+
+    Args:
+        texts: Message texts in queue order
+        limit: Maximum message length
+
+    Returns:
+        List of message texts
+    """
+    messages = []
+    current = ''
+    for text in texts:
+        # A single text over the limit is split into plain chunks
+        parts = [text[i:i + limit] for i in range(0, len(text), limit)] or ['']
+        for part in parts:
+            if current and len(current) + len(MERGE_SEPARATOR) + len(part) <= limit:
+                current += MERGE_SEPARATOR + part
+            else:
+                if current:
+                    messages.append(current)
+                current = part
+    if current:
+        messages.append(current)
+    return messages
+
+
+class TelegramNotifier:
+    """Background Telegram message sender
+
+    Args:
+        token: Bot token
+        default_chat_id: Chat used when `notify` gets none
+        api_base: Bot API base URL
+        merge_window: Seconds to wait for more messages to merge into a burst
+        max_retries: Attempts after the first before a message is dropped
+        backoff: Base delay in seconds for exponential backoff
+        timeout: HTTP timeout in seconds
+        http: requests.Session to use (created if omitted)
+    """
+
+    def __init__(self, token, default_chat_id=None, api_base=None, merge_window=1.0,
+                 max_retries=5, backoff=0.5, timeout=10, http=None):
+        self.url = f"{(api_base or Config.TELEGRAM_API_BASE).rstrip('/')}/bot{token}/sendMessage"
+        self.default_chat_id = default_chat_id
+        self.merge_window = merge_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.http = http or requests.Session()
+        self.stats = {'queued': 0, 'sent': 0, 'merged': 0, 'retries': 0, 'dropped': 0}
+
+        self._queue = queue.Queue()
+        self._chat_buckets = {}
+        self._global_bucket = TokenBucket(GLOBAL_RATE)
+        self._unsent = 0
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='telegram-notifier', daemon=True)
+        self._thread.start()
+
+    def notify(self, text, chat_id=None, parse_mode='HTML'):
+        """
+        Queue a message (returns immediately)
+
+        Args:
+            text: Message text
+            chat_id: Target chat (defaults to `default_chat_id`)
+            parse_mode: Telegram parse mode of the text
+        """
+        chat_id = chat_id or self.default_chat_id
+        if not chat_id:
+            logger.warning("No chat for Telegram notification, skipping")
+            return
+
+        with self._idle:
+            self._unsent += 1
+            self.stats['queued'] += 1
+        self._queue.put((chat_id, parse_mode, text))
+
+    def flush(self, timeout=None):
+        """Wait until every queued message was sent or dropped; returns True if drained"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unsent == 0, timeout)
+
+    def close(self, timeout=30):
+        """Send what is queued, then stop the sender thread"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self.http.close()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            # Collect the rest of the burst, grouped per chat and parse mode
+            batch = {(item[0], item[1]): [item[2]]}
+            count = 1
+            deadline = time.monotonic() + self.merge_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.setdefault((item[0], item[1]), []).append(item[2])
+                count += 1
+
+            for (chat_id, parse_mode), texts in batch.items():
+                messages = merge_messages(texts)
+                self.stats['merged'] += len(texts) - len(messages)
+                for message in messages:
+                    self._send(chat_id, parse_mode, message)
+
+            with self._idle:
+                self._unsent -= count
+                self._idle.notify_all()
+
+    def _send(self, chat_id, parse_mode, text):
+        """Deliver one message, retrying transient failures"""
+        bucket = self._chat_buckets.setdefault(chat_id, TokenBucket(CHAT_RATE))
+        payload = {'chat_id': chat_id, 'text': text}
+        if parse_mode:
+            payload['parse_mode'] = parse_mode
+
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            self._global_bucket.acquire()
+
+            delay = None
+            try:
+                response = self.http.post(self.url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                logger.warning(f"Telegram send failed: {e}")
+            else:
+                if response.status_code == 200:
+                    self.stats['sent'] += 1
+                    return True
+                if response.status_code == 429:
+                    delay = self._retry_after(response)
+                elif response.status_code < 500:
+                    # Bad request, blocked bot, unknown chat: retrying won't help
+                    logger.error(f"Telegram rejected notification: {response.status_code} {response.text}")
+                    break
+                else:
+                    logger.warning(f"Telegram server error {response.status_code}, retrying")
+
+            if attempt < self.max_retries:
+                self.stats['retries'] += 1
+                if delay is None:
+                    delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+                time.sleep(delay)
+
+        self.stats['dropped'] += 1
+        logger.error(f"Dropped Telegram notification to {chat_id}")
+        return False
+
+    def _retry_after(self, response):
+        """Delay requested by a 429 response (`parameters.retry_after`, seconds)"""
+        try:
+            return float(response.json()['parameters']['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            return float(response.headers.get('Retry-After', self.backoff))
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """
+    Process-wide notifier for the bot owner
+
+    Returns:
+        TelegramNotifier, or None when the bot token or owner is not configured
+    """
+    global _notifier
+    if not Config.TELEGRAM_BOT_TOKEN or not Config.TELEGRAM_OWNER_ID:
+        return None
+
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = TelegramNotifier(
+                Config.TELEGRAM_BOT_TOKEN,
+                default_chat_id=Config.TELEGRAM_OWNER_ID,
+                merge_window=Config.NOTIFICATION_MERGE_WINDOW
+            )
+        return _notifier
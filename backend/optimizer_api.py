@@ -10,6 +10,7 @@ REST API для Model Optimizer.
 
 from flask import Blueprint, jsonify, request
 from backend.model_optimizer import ModelOptimizer, UsageRecord
+from backend.response_cache import cached_response
 from datetime import datetime
 import os
 
@@ -32,6 +33,7 @@ def health():
 
 
 @optimizer_bp.route('/stats', methods=['GET'])
+@cached_response('usage')
 def get_stats():
     """
     Получить статистику использования.
@@ -92,6 +94,7 @@ def get_recommendations():
 
 
 @optimizer_bp.route('/report', methods=['GET'])
+@cached_response('usage', 'pricing')
 def get_report():
     """
     Получить полный отчет по оптимизации в Markdown.
@@ -244,6 +247,7 @@ def record_usage():
 
 
 @optimizer_bp.route('/pricing', methods=['GET'])
+@cached_response('pricing')
 def get_pricing():
     """
     Получить информацию о ценах на все модели.
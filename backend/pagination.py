@@ -0,0 +1,103 @@
+"""
+Keyset (cursor) pagination helpers for the Earning Robot API.
+Pages are ordered by (created_at DESC, id DESC) so that deep pages cost the
+same as the first one and concurrent inserts never shift results. Rows
+without a creation time are skipped (startup backfills them, see
+backend.migrations.backfill_created_at).
+"""
+from sqlalchemy import and_, or_
+from datetime import datetime
+import base64
+
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+
+def encode_cursor(created_at, row_id):
+    """
+    Encode the position of the last returned row as an opaque cursor
+
+    Args:
+        created_at: Creation timestamp of the last row
+        row_id: Primary key of the last row
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string from a previous page
+
+    Returns:
+        Tuple of (created_at, row_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        created_raw, id_raw = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_raw), int(id_raw)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def apply_keyset(query, created_column, id_column, cursor=None):
+    """
+    Order a query newest-first and continue after the given cursor
+
+    Args:
+        query: SQLAlchemy query
+        created_column: Timestamp column used for ordering
+        id_column: Primary key column used as tie-breaker
+        cursor: Optional (created_at, row_id) tuple from decode_cursor
+
+    Returns:
+        Query filtered and ordered for keyset pagination
+    """
+    # NULL timestamps cannot be placed in the order or encoded in a cursor
+    query = query.filter(created_column.isnot(None))
+    if cursor is not None:
+        created_at, row_id = cursor
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+    return query.order_by(created_column.desc(), id_column.desc())
+
+
+def iter_keyset(query, created_column, id_column, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Iterate over every row of a query in keyset-sized batches
+
+    Each batch is a separate bounded query, so memory use stays constant
+    regardless of how many rows match.
+
+    Args:
+        query: Query selecting at least the ordering columns (labelled
+            `created_at` and `id`)
+        created_column: Timestamp column used for ordering
+        id_column: Primary key column used as tie-breaker
+        batch_size: Rows fetched per round trip
+
+    Yields:
+        Result rows in newest-first order
+    """
+    cursor = None
+    while True:
+        rows = apply_keyset(query, created_column, id_column, cursor).limit(batch_size).all()
+        if not rows:
+            return
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        cursor = (last.created_at, last.id)
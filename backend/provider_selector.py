@@ -1,10 +1,22 @@
 """
 Dynamic provider selector with trend_score support.
 Combines estimated cost, latency, quality, and OpenRouter weekly popularity.
+
+`score_batch` and `choose_many` score columnar candidate data in one pass
+with NumPy when it is installed (optional accelerator), falling back to
+plain Python with identical results.
 """
-import json
-import os
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence
+
+from backend.trend_store import TrendScoreStore, get_trend_store
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional accelerator
+    np = None
+
+DEFAULT_QUALITY = 0.5
+DEFAULT_LATENCY_MS = 500.0
 
 
 class DynamicProviderSelector:
@@ -14,47 +26,27 @@ class DynamicProviderSelector:
             + w_trend*trend_score
 
     - `quality`, `latency` can be provided heuristically or from telemetry.
-    - `trend_score` is normalized weekly tokens from OpenRouter feed.
+    - `trend_score` is normalized weekly tokens from OpenRouter feed, read
+      from the process-wide trend store so daily updates are picked up.
     """
 
-    def __init__(self, weights: Optional[Dict[str, float]] = None):
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 trend_store: Optional[TrendScoreStore] = None):
         self.weights = weights or {
             'quality': 0.4,
             'cost': 0.3,
             'speed': 0.1,
             'trend': 0.2,
         }
-        self.trending = self._load_trending()
-
-    def _load_trending(self) -> Dict[str, float]:
-        """Load data/trending_models.json and build model->trend_score mapping."""
-        base = os.path.dirname(os.path.dirname(__file__))
-        path = os.path.join(base, 'data', 'trending_models.json')
-        if not os.path.exists(path):
-            return {}
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            items = data.get('items', [])
-            # Normalize model name to lowercase key
-            scores = {}
-            max_tokens = 0
-            for item in items:
-                wt = item.get('weekly_tokens')
-                if isinstance(wt, (int, float)):
-                    max_tokens = max(max_tokens, wt)
-            # Prevent division by zero
-            denom = max_tokens or 1
-            for item in items:
-                name = str(item.get('name') or '').lower()
-                wt = item.get('weekly_tokens')
-                norm = (wt / denom) if isinstance(wt, (int, float)) else 0.0
-                scores[name] = norm
-            return scores
-        except Exception:
-            return {}
-
-    def score(self, *, model: str, cost_per_1k: float, quality: float = 0.5, latency_ms: float = 500.0) -> float:
+        self.trend_store = trend_store or get_trend_store()
+
+    @property
+    def trending(self) -> Dict[str, float]:
+        """Current model->trend_score mapping (shared, reloaded on change)."""
+        return self.trend_store.scores()
+
+    def score(self, *, model: str, cost_per_1k: float, quality: float = DEFAULT_QUALITY,
+              latency_ms: float = DEFAULT_LATENCY_MS) -> float:
         """Compute the score for a model.
         - `model`: model identifier string
         - `cost_per_1k`: dollars per 1K tokens
@@ -64,7 +56,7 @@ class DynamicProviderSelector:
         w = self.weights
         inv_cost = 1.0 / max(cost_per_1k, 1e-9)
         inv_latency = 1.0 / max(latency_ms, 1e-3)
-        trend = self.trending.get(model.lower(), 0.0)
+        trend = self.trend_store.score(model)
         return (
             w['quality'] * quality +
             w['cost'] * inv_cost +
@@ -83,10 +75,80 @@ class DynamicProviderSelector:
             s = self.score(
                 model=model,
                 cost_per_1k=float(meta.get('cost_per_1k', 0.001)),
-                quality=float(meta.get('quality', 0.5)),
-                latency_ms=float(meta.get('latency_ms', 500.0)),
+                quality=float(meta.get('quality', DEFAULT_QUALITY)),
+                latency_ms=float(meta.get('latency_ms', DEFAULT_LATENCY_MS)),
             )
             if s > best_score:
                 best_score = s
                 best_model = model
         return best_model or list(candidates.keys())[0]
+
+    def score_batch(self, cost_per_1k: Sequence[float], quality: Optional[Sequence[float]] = None,
+                    latency_ms: Optional[Sequence[float]] = None, trend: Optional[Sequence[float]] = None,
+                    models: Optional[Sequence[str]] = None):
+        """Score many candidates at once from equal-length columns.
+        - `cost_per_1k`: dollars per 1K tokens per candidate
+        - `quality`, `latency_ms`: per candidate (defaults as in `score`)
+        - `trend`: trend scores; looked up by `models` when omitted
+        Returns a NumPy array of scores (a list without NumPy), in input order.
+        """
+        n = len(cost_per_1k)
+        if quality is None:
+            quality = [DEFAULT_QUALITY] * n
+        if latency_ms is None:
+            latency_ms = [DEFAULT_LATENCY_MS] * n
+        if trend is None:
+            # One table read for the whole batch
+            table = self.trend_store.scores()
+            trend = [table.get(m.lower(), 0.0) for m in models] if models is not None else [0.0] * n
+        if not (len(quality) == len(latency_ms) == len(trend) == n):
+            raise ValueError("score_batch columns must have equal length")
+
+        w = self.weights
+        if np is not None:
+            return (
+                w['quality'] * np.asarray(quality, dtype=float) +
+                w['cost'] / np.maximum(np.asarray(cost_per_1k, dtype=float), 1e-9) +
+                w['speed'] / np.maximum(np.asarray(latency_ms, dtype=float), 1e-3) +
+                w['trend'] * np.asarray(trend, dtype=float)
+            )
+        return [
+            w['quality'] * q + w['cost'] / max(c, 1e-9) + w['speed'] / max(l, 1e-3) + w['trend'] * t
+            for c, q, l, t in zip(cost_per_1k, quality, latency_ms, trend)
+        ]
+
+    def choose_many(self, models: Sequence[str], cost_per_1k: Sequence[float],
+                    quality: Optional[Sequence[float]] = None, latency_ms: Optional[Sequence[float]] = None,
+                    trend: Optional[Sequence[float]] = None, eligible=None, k: int = 1) -> List[List[str]]:
+        """Choose the top-k models for many requests in one pass.
+        Candidates are scored once; `eligible` is an optional
+        (requests x models) boolean matrix selecting each request's
+        candidates (one request over all models when omitted).
+        Returns, per request, up to `k` model names best first (ties keep
+        input order; requests without candidates get an empty list).
+        """
+        if eligible is None:
+            eligible = [[True] * len(models)]
+        if not len(models):
+            return [[] for _ in eligible]
+        scores = self.score_batch(cost_per_1k, quality, latency_ms, trend, models)
+
+        if np is not None:
+            mask = np.asarray(eligible, dtype=bool).reshape(-1, len(models))
+            masked = np.where(mask, scores, -np.inf)
+            if k == 1:
+                order = masked.argmax(axis=1)[:, None]
+            else:
+                order = np.argsort(-masked, axis=1, kind='stable')[:, :k]
+            picked = np.take_along_axis(mask, order, axis=1)
+            return [
+                [models[i] for i, ok in zip(row, ok_row) if ok]
+                for row, ok_row in zip(order.tolist(), picked.tolist())
+            ]
+
+        chosen = []
+        for row in eligible:
+            indices = [i for i, ok in enumerate(row) if ok]
+            indices.sort(key=lambda i: -scores[i])
+            chosen.append([models[i] for i in indices[:k]])
+        return chosen
@@ -0,0 +1,69 @@
+"""
+Token bucket rate limiting for the Earning Robot.
+Used to pace outbound calls to APIs with published rate limits (e.g. the
+Telegram Bot API). `TokenBucket` blocks the calling thread;
+`AsyncTokenBucket` is the asyncio equivalent.
+"""
+import asyncio
+import threading
+import time
+
+
+class _Bucket:
+    """Shared refill arithmetic (callers hold the lock)"""
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _reserve(self, tokens):
+        """Take `tokens` (may go negative) and return the seconds to wait before using them"""
+        if tokens > self.capacity:
+            raise ValueError("tokens exceed bucket capacity")
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= tokens
+        return max(0.0, -self._tokens / self.rate)
+
+
+class TokenBucket(_Bucket):
+    """Thread-safe token bucket
+
+    Args:
+        rate: Tokens added per second
+        capacity: Burst size (defaults to one second's worth, at least 1)
+    """
+
+    def __init__(self, rate, capacity=None):
+        super().__init__(rate, capacity)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them; returns seconds waited"""
+        with self._lock:
+            wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class AsyncTokenBucket(_Bucket):
+    """Token bucket for coroutines (one event loop)
+
+    Args:
+        rate: Tokens added per second
+        capacity: Burst size (defaults to one second's worth, at least 1)
+    """
+
+    async def acquire(self, tokens=1):
+        """Wait until `tokens` are available, then take them; returns seconds waited"""
+        # Reservation happens synchronously, so waiters are served in call order
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
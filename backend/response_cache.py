@@ -0,0 +1,105 @@
+"""
+HTTP response caching for read-heavy Earning Robot endpoints.
+Combines data-version ETags (`If-None-Match` -> 304) with a short-TTL
+in-process cache of rendered responses. ETags include the database's
+persistent table versions (see `set_version_source`), so writes made by
+other processes or through raw SQL change them as well.
+"""
+from flask import request, make_response
+from functools import wraps
+from datetime import datetime
+from backend.cache import TTLCache, data_versions
+from backend.http_encoding import preferred_representation
+from backend.config import Config
+import hashlib
+import os
+
+# Distinguishes ETags across restarts, when version counters start over
+_BOOT_ID = os.urandom(8).hex()
+
+_response_cache = TTLCache(ttl=Config.RESPONSE_CACHE_TTL, max_entries=512)
+
+# Callable(domains) -> committed (domain, version) pairs read from the database
+_version_source = None
+
+
+def set_version_source(source):
+    """
+    Read persistent data versions for ETags
+
+    Args:
+        source: Callable taking the domain names and returning (domain,
+            version) pairs, e.g. Database.read_versions; None to disable
+    """
+    global _version_source
+    _version_source = source
+
+
+def _request_key():
+    """Cache key for the current request (format + path + sorted query string)"""
+    args = sorted(request.args.items(multi=True))
+    query = '&'.join(f"{k}={v}" for k, v in args)
+    return f"{preferred_representation()}:{request.path}?{query}"
+
+
+def _compute_etag(key, domains):
+    """ETag derived from the request, the data versions and the UTC date"""
+    stored = _version_source(domains) if _version_source else ()
+    seed = '|'.join([
+        _BOOT_ID,
+        key,
+        repr(data_versions.snapshot(domains)),
+        repr(stored),
+        # Date-windowed reports roll over at midnight even without writes
+        datetime.utcnow().date().isoformat(),
+    ])
+    return hashlib.sha1(seed.encode('utf-8')).hexdigest()
+
+
+def cached_response(*domains, ttl=None):
+    """
+    Cache a GET view and answer conditional requests
+
+    Args:
+        domains: Data domains the response is derived from; writes to any
+            of them (see backend.cache.invalidate) change the ETag
+        ttl: Seconds to keep a rendered response (default: RESPONSE_CACHE_TTL)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = _request_key()
+            etag = _compute_etag(key, domains)
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+            cached = _response_cache.get(key)
+            if cached is not None and cached['etag'] == etag:
+                response = make_response(cached['body'], cached['status'])
+                response.headers['Content-Type'] = cached['content_type']
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    _response_cache.set(key, {
+                        'etag': etag,
+                        'body': response.get_data(),
+                        'status': response.status_code,
+                        'content_type': response.headers.get('Content-Type'),
+                    }, ttl)
+
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        return wrapper
+    return decorator
+
+
+def clear_response_cache():
+    """Drop every cached response"""
+    _response_cache.clear()
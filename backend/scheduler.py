@@ -1,55 +1,156 @@
 """
 Automated task scheduler for the Earning Robot.
 Handles periodic tasks like daily reports.
+
+Jobs are declared in `job_specs()` and kept in a persistent SQLite job
+store (`SCHEDULER_DB_PATH`), so schedules and missed runs survive
+restarts. Every job runs through `run_job`, which enforces one instance
+at a time and records duration and outcome in `scheduler_job_metrics`.
 """
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from backend.config import Config
-from backend.database import Database
+from backend.database import BLOB_REFERENCES, Database, JobMetric, content_blobs
+from backend.blob_store import sweep_blobs
 from billing.reporting import ReportGenerator
 from backend.trending import update_openrouter_top_weekly
+from backend.stats import reconcile_stats
+from billing.ledger import close_pending_days
+from billing.webhooks import process_all_pending
+from billing.expenses import accumulate_expenses
+from billing.fx import load_rates
+from backend.notifications import get_notifier
+from datetime import datetime
 import logging
-import requests
+import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Scheduler running in this process (set by TaskScheduler.start)
+_active_scheduler = None
+
+
+def job_specs():
+    """
+    Registry of scheduled jobs
+
+    Returns:
+        List of dicts with `id`, `name`, `method` (TaskScheduler method),
+        `trigger` and `misfire_grace_time` (seconds a late run may still start)
+    """
+    report_hour, report_minute = map(int, Config.REPORT_TIME.split(':'))
+    trend_hour, trend_minute = map(int, Config.TRENDING_UPDATE_TIME.split(':'))
+
+    return [
+        # Daily report at configured time
+        {'id': 'daily_report', 'name': 'Generate Daily Report', 'method': 'generate_daily_report',
+         'trigger': CronTrigger(hour=report_hour, minute=report_minute), 'misfire_grace_time': 3600},
+        # Weekly report every Monday at configured time
+        {'id': 'weekly_report', 'name': 'Generate Weekly Report', 'method': 'generate_weekly_report',
+         'trigger': CronTrigger(day_of_week='mon', hour=report_hour, minute=report_minute),
+         'misfire_grace_time': 3600},
+        # Exchange rates for report conversion, shortly after midnight UTC
+        {'id': 'fx_rates', 'name': 'Refresh FX Rates', 'method': 'refresh_fx_rates',
+         'trigger': CronTrigger(hour=0, minute=5), 'misfire_grace_time': 6 * 3600},
+        # Health check every hour
+        {'id': 'health_check', 'name': 'System Health Check', 'method': 'check_system_health',
+         'trigger': CronTrigger(minute=0), 'misfire_grace_time': 300},
+        # Stats counters reconciliation every hour (offset from health check)
+        {'id': 'stats_reconcile', 'name': 'Reconcile Statistics Counters', 'method': 'reconcile_statistics',
+         'trigger': CronTrigger(minute=30), 'misfire_grace_time': 600},
+        # Remove prompt/output blobs of deleted or rewritten tasks
+        {'id': 'blob_sweep', 'name': 'Sweep Unreferenced Blobs', 'method': 'sweep_content_blobs',
+         'trigger': CronTrigger(hour=3, minute=15), 'misfire_grace_time': 6 * 3600},
+        # Stored Stripe webhook events -> transactions
+        {'id': 'webhook_processing', 'name': 'Process Webhook Events', 'method': 'process_webhooks',
+         'trigger': IntervalTrigger(seconds=Config.WEBHOOK_PROCESS_INTERVAL),
+         'misfire_grace_time': Config.WEBHOOK_PROCESS_INTERVAL},
+        # Task API costs -> aggregated expense transactions
+        {'id': 'expense_accumulator', 'name': 'Record API Expenses', 'method': 'record_api_expenses',
+         'trigger': IntervalTrigger(seconds=Config.EXPENSE_FLUSH_INTERVAL),
+         'misfire_grace_time': Config.EXPENSE_FLUSH_INTERVAL},
+        # Daily trending models update
+        {'id': 'trending_update', 'name': 'Update OpenRouter Top Weekly', 'method': 'update_trending_models',
+         'trigger': CronTrigger(hour=trend_hour, minute=trend_minute), 'misfire_grace_time': 6 * 3600},
+    ]
+
+
+def run_job(job_id):
+    """Job store entry point: run a registered job on this process's scheduler"""
+    if _active_scheduler is None:
+        raise RuntimeError(f"No active scheduler to run job {job_id}")
+    _active_scheduler.run_job(job_id)
+
+
+def get_active_scheduler():
+    """The TaskScheduler started in this process, if any"""
+    return _active_scheduler
+
+
+def job_metrics(session):
+    """
+    Run statistics of every job
+
+    Args:
+        session: Database session
+
+    Returns:
+        Dictionary of job_id -> metrics dict
+    """
+    metrics = {}
+    for metric in session.query(JobMetric):
+        finished = metric.runs - (1 if metric.last_status == 'running' else 0)
+        metrics[metric.job_id] = {
+            'runs': metric.runs,
+            'failures': metric.failures,
+            'skipped': metric.skipped,
+            'missed': metric.missed,
+            'last_status': metric.last_status,
+            'last_started_at': metric.last_started_at.isoformat() if metric.last_started_at else None,
+            'last_finished_at': metric.last_finished_at.isoformat() if metric.last_finished_at else None,
+            'last_success_at': metric.last_success_at.isoformat() if metric.last_success_at else None,
+            'last_duration_ms': metric.last_duration_ms,
+            'avg_duration_ms': round(metric.total_duration_ms / finished) if finished > 0 else None,
+            'max_duration_ms': metric.max_duration_ms,
+            'last_error': metric.last_error,
+        }
+    return metrics
+
 
 class TaskScheduler:
     """Manages scheduled tasks"""
     
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
+        if os.path.dirname(Config.SCHEDULER_DB_PATH):
+            os.makedirs(os.path.dirname(Config.SCHEDULER_DB_PATH), exist_ok=True)
+        
+        self.scheduler = BackgroundScheduler(
+            jobstores={'default': SQLAlchemyJobStore(url=f'sqlite:///{Config.SCHEDULER_DB_PATH}')},
+            # A job never overlaps itself; runs piled up while down collapse into one
+            job_defaults={'coalesce': True, 'max_instances': 1}
+        )
+        self.scheduler.add_listener(self._on_job_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
         self.db = Database(Config.DATABASE_PATH).initialize()
+        self.jobs = {spec['id']: spec for spec in job_specs()}
     
     def send_telegram_notification(self, message):
         """
-        Send notification via Telegram
+        Queue a notification to the owner via Telegram
         
         Args:
             message: Message text to send
         """
-        if not Config.TELEGRAM_BOT_TOKEN or not Config.TELEGRAM_OWNER_ID:
+        notifier = get_notifier()
+        if notifier is None:
             logger.warning("Telegram not configured, skipping notification")
             return
         
-        try:
-            url = f"https://api.telegram.org/bot{Config.TELEGRAM_BOT_TOKEN}/sendMessage"
-            data = {
-                'chat_id': Config.TELEGRAM_OWNER_ID,
-                'text': message,
-                'parse_mode': 'HTML'
-            }
-            
-            response = requests.post(url, json=data)
-            
-            if response.status_code == 200:
-                logger.info("Telegram notification sent successfully")
-            else:
-                logger.error(f"Failed to send Telegram notification: {response.text}")
-                
-        except Exception as e:
-            logger.error(f"Error sending Telegram notification: {e}")
+        notifier.notify(message)
     
     def generate_daily_report(self):
         """Generate and send daily financial report"""
@@ -58,6 +159,10 @@ class TaskScheduler:
         session = self.db.get_session()
         
         try:
+            # Snapshot days that closed since the last run
+            accumulate_expenses(session)
+            close_pending_days(session)
+            
             generator = ReportGenerator(session)
             report = generator.format_report('daily')
             
@@ -66,9 +171,6 @@ class TaskScheduler:
             
             logger.info("Daily report sent successfully")
             
-        except Exception as e:
-            logger.error(f"Error generating daily report: {e}")
-            
         finally:
             session.close()
     
@@ -87,9 +189,6 @@ class TaskScheduler:
             
             logger.info("Weekly report sent successfully")
             
-        except Exception as e:
-            logger.error(f"Error generating weekly report: {e}")
-            
         finally:
             session.close()
     
@@ -116,58 +215,191 @@ class TaskScheduler:
                 self.send_telegram_notification(alert)
                 logger.warning(alert)
             
+        finally:
+            session.close()
+    
+    def reconcile_statistics(self):
+        """Recompute materialized stats counters and repair drift"""
+        logger.info("Reconciling statistics counters...")
+        
+        session = self.db.get_session()
+        
+        try:
+            reconcile_stats(session)
+            
+        finally:
+            session.close()
+    
+    def sweep_content_blobs(self):
+        """Delete stored prompts/outputs no task references any more"""
+        sweep_blobs(self.db.engine, content_blobs, BLOB_REFERENCES)
+    
+    def record_api_expenses(self):
+        """Fold completed task costs into per-provider, per-minute expenses"""
+        session = self.db.get_session()
+        
+        try:
+            accumulate_expenses(session)
+            
+        finally:
+            session.close()
+    
+    def process_webhooks(self):
+        """Record transactions from stored payment webhook events"""
+        session = self.db.get_session()
+        
+        try:
+            process_all_pending(session)
+            
+        finally:
+            session.close()
+    
+    def refresh_fx_rates(self):
+        """Load exchange rates from the configured source and forward-fill today"""
+        session = self.db.get_session()
+        
+        try:
+            load_rates(session)
+            
+        finally:
+            session.close()
+    
+    def run_job(self, job_id):
+        """
+        Run one registered job now and record its metrics
+
+        Errors are logged and counted, not raised, so a failing job keeps
+        its schedule.
+
+        Args:
+            job_id: Job ID from `job_specs()`
+        """
+        spec = self.jobs[job_id]
+        started_at = datetime.utcnow()
+        self._record(job_id, runs=1, last_status='running', last_started_at=started_at)
+        
+        started = time.perf_counter()
+        error = None
+        try:
+            getattr(self, spec['method'])()
         except Exception as e:
-            logger.error(f"Error checking system health: {e}")
+            error = e
+            logger.error(f"Job {job_id} failed: {e}")
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        
+        finished_at = datetime.utcnow()
+        outcome = {'last_status': 'failed', 'failures': 1, 'last_error': str(error)} if error else {
+            'last_status': 'success', 'last_success_at': finished_at, 'last_error': None
+        }
+        self._record(
+            job_id, last_finished_at=finished_at, last_duration_ms=duration_ms,
+            total_duration_ms=duration_ms, max_duration_ms=duration_ms, **outcome
+        )
+    
+    def _record(self, job_id, **changes):
+        """Update a job's metrics row; counters and totals add, the maximum keeps the larger"""
+        session = self.db.get_session()
+        
+        try:
+            metric = session.get(JobMetric, job_id) or JobMetric(
+                job_id=job_id, runs=0, failures=0, skipped=0, missed=0,
+                max_duration_ms=0, total_duration_ms=0
+            )
+            for field, value in changes.items():
+                if field in ('runs', 'failures', 'skipped', 'missed', 'total_duration_ms'):
+                    value += getattr(metric, field)
+                elif field == 'max_duration_ms':
+                    value = max(value, metric.max_duration_ms)
+                setattr(metric, field, value)
+            session.add(metric)
+            session.commit()
+            
+        except Exception as e:
+            logger.error(f"Error recording metrics for job {job_id}: {e}")
             
         finally:
             session.close()
     
+    def _on_job_skipped(self, event):
+        """Count runs dropped because the previous one was still going or too late"""
+        if event.job_id not in self.jobs:
+            return
+        if event.code == EVENT_JOB_MISSED:
+            logger.warning(f"Job {event.job_id} missed its run at {event.scheduled_run_time}")
+            self._record(event.job_id, missed=1)
+        else:
+            logger.warning(f"Job {event.job_id} still running, skipped run at {event.scheduled_run_times}")
+            self._record(event.job_id, skipped=1)
+    
+    def trigger(self, job_id):
+        """
+        Run a job as soon as possible (skipped if it is already running)
+
+        Args:
+            job_id: Job ID from `job_specs()`
+
+        Raises:
+            KeyError: Unknown job
+        """
+        if job_id not in self.jobs:
+            raise KeyError(job_id)
+        self.scheduler.modify_job(job_id, next_run_time=datetime.now(self.scheduler.timezone))
+    
+    def list_jobs(self):
+        """Registered jobs with their next run time"""
+        return [
+            {
+                'id': job.id,
+                'name': job.name,
+                'trigger': str(job.trigger),
+                'next_run_time': job.next_run_time.isoformat() if job.next_run_time else None,
+            }
+            for job in self.scheduler.get_jobs()
+        ]
+    
     def start(self):
         """Start the scheduler with configured tasks"""
-        # Parse report time (format: HH:MM)
-        report_hour, report_minute = map(int, Config.REPORT_TIME.split(':'))
-        trend_hour, trend_minute = map(int, Config.TRENDING_UPDATE_TIME.split(':'))
+        global _active_scheduler
         
-        # Daily report at configured time
-        self.scheduler.add_job(
-            self.generate_daily_report,
-            trigger=CronTrigger(hour=report_hour, minute=report_minute),
-            id='daily_report',
-            name='Generate Daily Report'
-        )
+        # Paused start loads the persisted jobs without running any yet
+        self.scheduler.start(paused=True)
         
-        # Weekly report every Monday at configured time
-        self.scheduler.add_job(
-            self.generate_weekly_report,
-            trigger=CronTrigger(day_of_week='mon', hour=report_hour, minute=report_minute),
-            id='weekly_report',
-            name='Generate Weekly Report'
-        )
+        for job_id, spec in self.jobs.items():
+            job = self.scheduler.get_job(job_id)
+            if job is None:
+                self.scheduler.add_job(
+                    'backend.scheduler:run_job', trigger=spec['trigger'], args=[job_id],
+                    id=job_id, name=spec['name'], misfire_grace_time=spec['misfire_grace_time']
+                )
+            elif str(job.trigger) != str(spec['trigger']):
+                # Configured time changed since the schedule was stored
+                job.modify(name=spec['name'], misfire_grace_time=spec['misfire_grace_time'])
+                job.reschedule(spec['trigger'])
+            elif job.name != spec['name'] or job.misfire_grace_time != spec['misfire_grace_time']:
+                job.modify(name=spec['name'], misfire_grace_time=spec['misfire_grace_time'])
         
-        # Health check every hour
-        self.scheduler.add_job(
-            self.check_system_health,
-            trigger=CronTrigger(minute=0),
-            id='health_check',
-            name='System Health Check'
-        )
-
-        # Daily trending models update
-        self.scheduler.add_job(
-            self.update_trending_models,
-            trigger=CronTrigger(hour=trend_hour, minute=trend_minute),
-            id='trending_update',
-            name='Update OpenRouter Top Weekly'
-        )
+        for job in self.scheduler.get_jobs():
+            if job.id not in self.jobs:
+                logger.info(f"Removing unregistered job {job.id}")
+                job.remove()
         
-        self.scheduler.start()
+        _active_scheduler = self
+        self.scheduler.resume()
         logger.info("📅 Task scheduler started")
         logger.info(f"Daily reports scheduled for {Config.REPORT_TIME} {Config.TIMEZONE}")
         logger.info(f"Trending updates scheduled for {Config.TRENDING_UPDATE_TIME} {Config.TIMEZONE}")
     
     def stop(self):
         """Stop the scheduler"""
+        global _active_scheduler
         self.scheduler.shutdown()
+        if _active_scheduler is self:
+            _active_scheduler = None
+        
+        # Deliver notifications still queued
+        notifier = get_notifier()
+        if notifier:
+            notifier.flush(timeout=30)
         logger.info("Task scheduler stopped")
 
     def update_trending_models(self):
@@ -182,11 +414,13 @@ class TaskScheduler:
             )
             self.send_telegram_notification(msg)
         except Exception as e:
-            logger.error(f"Error updating trending models: {e}")
             self.send_telegram_notification(f"❌ Trending update failed: {e}")
+            raise
 
 
 if __name__ == '__main__':
+    # Jobs resolve `backend.scheduler:run_job`, so use that module, not __main__
+    from backend.scheduler import TaskScheduler
     scheduler = TaskScheduler()
     scheduler.start()
     
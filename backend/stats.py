@@ -0,0 +1,194 @@
+"""
+Materialized statistics for the Earning Robot.
+Keeps running task, user and financial totals in a single row so that
+/api/stats, the Telegram /status command and the CLI read in O(1).
+
+The counters are maintained by SQLite triggers on the source tables, so
+every write path (ORM, bulk or raw SQL, any process) updates them inside
+the same transaction. A periodic reconciliation job recomputes them from
+scratch and repairs any drift.
+"""
+from sqlalchemy import text
+from backend.database import StatsCounter
+from backend.money import to_float
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATS_ROW_ID = 1
+
+# Per-table contribution of a single row to each counter.
+# `{row}` is replaced with NEW/OLD inside triggers and with the table
+# alias during reconciliation, so both always agree.
+COUNTER_EXPRESSIONS = {
+    'tasks': {
+        'total_tasks': "1",
+        'completed_tasks': "CASE WHEN {row}.status = 'completed' THEN 1 ELSE 0 END",
+        'failed_tasks': "CASE WHEN {row}.status = 'failed' THEN 1 ELSE 0 END",
+        'total_tokens': "COALESCE({row}.tokens_used, 0)",
+        'total_task_cost_micros': "COALESCE({row}.cost_micros, 0)",
+    },
+    'users': {
+        'total_users': "1",
+        'active_users': "CASE WHEN {row}.is_active THEN 1 ELSE 0 END",
+        'active_subscriptions': (
+            "CASE WHEN {row}.is_active AND {row}.subscription_type = 'monthly' "
+            "THEN 1 ELSE 0 END"
+        ),
+    },
+    'transactions': {
+        'total_income_micros': (
+            "CASE WHEN {row}.transaction_type = 'income' AND {row}.status = 'completed' "
+            "THEN COALESCE({row}.amount_micros, 0) ELSE 0 END"
+        ),
+        'total_expenses_micros': (
+            "CASE WHEN {row}.transaction_type = 'expense' AND {row}.status = 'completed' "
+            "THEN COALESCE({row}.amount_micros, 0) ELSE 0 END"
+        ),
+    },
+}
+
+COUNTER_COLUMNS = [
+    column
+    for expressions in COUNTER_EXPRESSIONS.values()
+    for column in expressions
+]
+
+
+def _trigger_statements(table, expressions):
+    """Build INSERT/UPDATE/DELETE trigger DDL for one source table"""
+    def assignments(sign_new, sign_old):
+        parts = []
+        for column, expr in expressions.items():
+            delta = ""
+            if sign_new:
+                delta += f" + ({expr.format(row='NEW')})"
+            if sign_old:
+                delta += f" - ({expr.format(row='OLD')})"
+            parts.append(f"{column} = {column}{delta}")
+        parts.append("updated_at = CURRENT_TIMESTAMP")
+        return ",\n        ".join(parts)
+
+    events = {
+        'insert': ('INSERT', assignments(True, False)),
+        'update': ('UPDATE', assignments(True, True)),
+        'delete': ('DELETE', assignments(False, True)),
+    }
+
+    return [
+        f"""
+CREATE TRIGGER IF NOT EXISTS stats_{table}_{name}
+AFTER {event} ON {table}
+BEGIN
+    UPDATE stats_counters SET
+        {body}
+    WHERE id = {STATS_ROW_ID};
+END
+"""
+        for name, (event, body) in events.items()
+    ]
+
+
+def install_stats(engine):
+    """
+    Create the counter row and its maintenance triggers if missing
+
+    Args:
+        engine: SQLAlchemy engine of the robot database
+    """
+    columns = ', '.join(COUNTER_COLUMNS)
+    zeros = ', '.join('0' for _ in COUNTER_COLUMNS)
+
+    with engine.begin() as conn:
+        for table, expressions in COUNTER_EXPRESSIONS.items():
+            for ddl in _trigger_statements(table, expressions):
+                conn.execute(text(ddl))
+
+        created = conn.execute(text(
+            f"INSERT OR IGNORE INTO stats_counters (id, {columns}) "
+            f"VALUES ({STATS_ROW_ID}, {zeros})"
+        )).rowcount
+
+        if created:
+            # Existing database without counters yet - seed from the tables
+            _reconcile(conn)
+
+
+def _compute_totals(conn):
+    """Recompute every counter from the source tables"""
+    totals = {}
+    for table, expressions in COUNTER_EXPRESSIONS.items():
+        select_list = ', '.join(
+            f"COALESCE(SUM({expr.format(row='t')}), 0) AS {column}"
+            for column, expr in expressions.items()
+        )
+        row = conn.execute(text(f"SELECT {select_list} FROM {table} t")).mappings().one()
+        totals.update(row)
+    return totals
+
+
+def _reconcile(conn):
+    """Overwrite the counter row with freshly computed totals and return the drift"""
+    current = conn.execute(text(
+        f"SELECT {', '.join(COUNTER_COLUMNS)} FROM stats_counters WHERE id = :id"
+    ), {'id': STATS_ROW_ID}).mappings().one()
+    totals = _compute_totals(conn)
+
+    drift = {
+        column: totals[column] - current[column]
+        for column in COUNTER_COLUMNS
+        if (totals[column] or 0) != (current[column] or 0)
+    }
+
+    assignments = ', '.join(f"{column} = :{column}" for column in COUNTER_COLUMNS)
+    conn.execute(text(
+        f"UPDATE stats_counters SET {assignments}, reconciled_at = :now WHERE id = :id"
+    ), {**totals, 'now': datetime.utcnow(), 'id': STATS_ROW_ID})
+
+    return drift
+
+
+def reconcile_stats(session):
+    """
+    Recompute the materialized counters and repair any drift
+
+    Args:
+        session: Database session
+
+    Returns:
+        Dictionary of counter -> correction applied (empty if consistent)
+    """
+    drift = _reconcile(session.connection())
+    session.commit()
+
+    if drift:
+        logger.warning(f"Stats counters drifted, corrected: {drift}")
+    return drift
+
+
+def get_stats_snapshot(session):
+    """
+    Read the materialized counters
+
+    Args:
+        session: Database session
+
+    Returns:
+        Dictionary with every counter plus `updated_at`/`reconciled_at`;
+        money counters are also given in major units without the
+        `_micros` suffix (e.g. `total_income`)
+    """
+    row = session.get(StatsCounter, STATS_ROW_ID, populate_existing=True)
+
+    if row is None:
+        snapshot = {column: 0 for column in COUNTER_COLUMNS}
+    else:
+        snapshot = {column: getattr(row, column) or 0 for column in COUNTER_COLUMNS}
+        snapshot['updated_at'] = row.updated_at
+        snapshot['reconciled_at'] = row.reconciled_at
+
+    for column in COUNTER_COLUMNS:
+        if column.endswith('_micros'):
+            snapshot[column[:-len('_micros')]] = to_float(snapshot[column])
+    return snapshot
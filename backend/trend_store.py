@@ -0,0 +1,141 @@
+"""
+Process-wide trend score store.
+Holds the normalized weekly-token scores from `data/trending_models.json`
+as a ready lookup table shared by every provider selector. The table is
+swapped in whole, so readers never take a lock; it is rebuilt when the
+file's mtime/size changes (checked at most every `check_interval` seconds)
+or immediately when `persist_json` publishes new items in this process.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRENDING_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'trending_models.json')
+
+# Seconds between file stat checks on the lookup path
+CHECK_INTERVAL = 1.0
+
+
+def normalize_trending(items: List[Dict]) -> Dict[str, float]:
+    """
+    Build the model -> trend score mapping
+
+    Args:
+        items: Trending items with `name` and `weekly_tokens`
+
+    Returns:
+        Dict of lowercase model name to weekly tokens divided by the maximum
+    """
+    tokens = [item.get('weekly_tokens') for item in items]
+    # Prevent division by zero
+    denom = max((wt for wt in tokens if isinstance(wt, (int, float))), default=0) or 1
+    scores = {}
+    for item, wt in zip(items, tokens):
+        name = str(item.get('name') or '').lower()
+        scores[name] = (wt / denom) if isinstance(wt, (int, float)) else 0.0
+    return scores
+
+
+class TrendScoreStore:
+    """Trend scores for one trending JSON file
+
+    Args:
+        path: Trending JSON file
+        check_interval: Minimum seconds between file stat checks
+    """
+
+    def __init__(self, path: str = TRENDING_PATH, check_interval: float = CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._scores: Dict[str, float] = {}
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._reload()
+
+    def score(self, model: str) -> float:
+        """Trend score of a model (0.0 if not trending)"""
+        if time.monotonic() >= self._next_check:
+            self._check()
+        return self._scores.get(model.lower(), 0.0)
+
+    def scores(self) -> Dict[str, float]:
+        """Current model -> score table (do not modify)"""
+        if time.monotonic() >= self._next_check:
+            self._check()
+        return self._scores
+
+    def publish(self, items: List[Dict]) -> None:
+        """Replace the scores with freshly persisted items, skipping the file read"""
+        scores = normalize_trending(items)
+        with self._lock:
+            self._scores = scores
+            self._signature = self._stat()
+            self._next_check = time.monotonic() + self.check_interval
+
+    def _check(self):
+        """Reload if the file changed since the last load"""
+        with self._lock:
+            # Another thread may have just checked
+            if time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            if self._stat() == self._signature:
+                return
+        self._reload()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _reload(self):
+        with self._lock:
+            signature = self._stat()
+            if signature is None:
+                self._scores, self._signature = {}, None
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._scores = normalize_trending(data.get('items', []))
+            except Exception as e:
+                # Keep the previous table; retried once the file changes again
+                logger.warning(f"Failed to load trend scores from {self.path}: {e}")
+            self._signature = signature
+
+
+_stores: Dict[str, TrendScoreStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_trend_store(path: Optional[str] = None) -> TrendScoreStore:
+    """
+    Process-wide store for a trending JSON file
+
+    Args:
+        path: Trending JSON file (defaults to data/trending_models.json)
+
+    Returns:
+        TrendScoreStore shared by all callers using the same path
+    """
+    key = os.path.abspath(path or TRENDING_PATH)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = TrendScoreStore(key)
+        return store
+
+
+def publish_trending(path: str, items: List[Dict]) -> None:
+    """Push newly written items to the store for `path`, if one is loaded"""
+    store = _stores.get(os.path.abspath(path))
+    if store is not None:
+        store.publish(items)
@@ -2,55 +2,227 @@
 OpenRouter trending models updater.
 Fetches Top Weekly models and updates documentation tables marked with
 BEGIN/END markers, and persists raw data for use in provider selection.
+
+Fetches are conditional: the ETag/Last-Modified validators and body of the
+last good response per format are cached in `data/trending_fetch_cache.json`,
+so an unchanged feed costs one 304 round trip. Without a usable cache the
+JSON, CSV and table formats are requested in parallel and the first one
+that parses wins; the other probes' bodies are not read and their
+connections are closed.
 """
 import os
 import json
 import logging
 import re
-from typing import List, Dict
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Dict, NamedTuple, Optional
 
 import requests
 
 from backend.config import Config
+from backend.trend_store import TRENDING_PATH, publish_trending
 
 logger = logging.getLogger(__name__)
 
 MARKER_BEGIN = "<!-- BEGIN: OPENROUTER_TOP_WEEKLY -->"
 MARKER_END = "<!-- END: OPENROUTER_TOP_WEEKLY -->"
 
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+FETCH_CACHE_PATH = os.path.join(DATA_DIR, 'trending_fetch_cache.json')
 
-def fetch_openrouter_top_weekly(url: str = None) -> List[Dict]:
-    """Fetch OpenRouter Top Weekly models (JSON).
+# (connect, read) timeouts in seconds
+FETCH_TIMEOUT = (5, 30)
 
-    Returns a list of records with fields like `id`, `name`, `provider`,
-    `weekly_tokens` if available. If the schema differs, we map best-effort.
+# Bytes read at a time from a response body (probes check for cancellation in between)
+CHUNK_SIZE = 64 * 1024
+
+FORMAT_ACCEPT = {
+    'json': "application/json, text/plain; q=0.9, */*;q=0.8",
+    'csv': "text/csv, text/plain; q=0.9, */*;q=0.8",
+    'table': "text/markdown, text/plain; q=0.9, */*;q=0.8",
+}
+
+_http = requests.Session()
+
+
+class FetchResult(NamedTuple):
+    """Outcome of a trending fetch"""
+    items: List[Dict]
+    not_modified: bool  # Same payload as last time (304, identical body, or feed unavailable)
+    format: Optional[str]
+
+
+def _format_urls(feed_url: str) -> Dict[str, str]:
+    """Feed URL per format, in preference order, without duplicates"""
+    urls = {}
+    for fmt in FORMAT_ACCEPT:
+        candidate = feed_url.replace('fmt=json', f'fmt={fmt}')
+        if candidate not in urls.values():
+            urls[fmt] = candidate
+    return urls
+
+
+def _parse(fmt: str, body: str) -> List[Dict]:
+    """Parse a response body of the given format; empty list if unusable"""
+    if fmt == 'json':
+        try:
+            return _normalize_openrouter_json(json.loads(body))
+        except ValueError:
+            return []
+    if fmt == 'csv':
+        return _parse_csv(body) if ',' in body else []
+    return _parse_markdown_table(body)
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Write JSON to a temporary file next to `path`, then swap it in"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _load_fetch_cache(path: str, feed_url: str) -> Dict:
+    """Cached validators and bodies per format (empty if for another feed)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get('formats', {}) if cache.get('url') == feed_url else {}
+
+
+def _request(fmt: str, url: str, cached: Optional[Dict], session=None, cancelled=None, responses=None):
+    """Conditional GET of one format; returns (fmt, status, body, response headers)
+
+    The body is streamed. If `cancelled` is set while it downloads, reading
+    stops and the connection is closed; each response is added to
+    `responses` so the caller can close it from another thread.
     """
-    feed_url = url or Config.OPENROUTER_TREND_URL
+    headers = {'Accept': FORMAT_ACCEPT[fmt]}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+
+    resp = (session or _http).get(url, timeout=FETCH_TIMEOUT, headers=headers, stream=True)
+    if responses is not None:
+        responses.append(resp)
     try:
-        resp = requests.get(feed_url, timeout=30, headers={"Accept": "application/json, text/plain; q=0.9, */*;q=0.8"})
+        if resp.status_code == 304:
+            return fmt, 304, None, resp.headers
         resp.raise_for_status()
+
+        chunks = []
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            if cancelled is not None and cancelled.is_set():
+                raise requests.RequestException(f"{fmt} probe cancelled")
+            chunks.append(chunk)
+        body = b''.join(chunks).decode(resp.encoding or 'utf-8', errors='replace')
+        return fmt, resp.status_code, body, resp.headers
+    finally:
+        resp.close()
+
+
+def fetch_trending(url: str = None, cache_path: str = None) -> FetchResult:
+    """Fetch OpenRouter Top Weekly models with conditional requests.
+
+    The format that last succeeded is revalidated first; a 304 returns the
+    cached payload without re-downloading. Otherwise all formats are probed
+    in parallel and the first parsable answer is used. The other probes are
+    cancelled: bodies being downloaded are closed at once, and probes still
+    waiting for response headers give up when the headers arrive (or at
+    FETCH_TIMEOUT). If nothing works, the last good payload is returned.
+    """
+    feed_url = url or Config.OPENROUTER_TREND_URL
+    cache_path = cache_path or FETCH_CACHE_PATH
+    formats = _load_fetch_cache(cache_path, feed_url)
+    urls = _format_urls(feed_url)
+
+    def accept(fmt, status, body, headers):
+        """FetchResult for a response, or None if it is unusable"""
+        cached = formats.get(fmt)
+        if status == 304:
+            if not cached:
+                return None
+            return FetchResult(_parse(fmt, cached['body']), True, fmt)
+
+        items = _parse(fmt, body)
+        if not items:
+            return None
+        unchanged = bool(cached) and cached['body'] == body
+        formats[fmt] = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'body': body,
+            'fetched_at': datetime.utcnow().isoformat(),
+        }
         try:
-            data = resp.json()
-            return _normalize_openrouter_json(data)
-        except Exception:
-            pass
+            write_json_atomic(cache_path, {'url': feed_url, 'preferred': fmt, 'formats': formats})
+        except OSError as e:
+            logger.warning(f"Could not save trending fetch cache: {e}")
+        return FetchResult(items, unchanged, fmt)
+
+    # Revalidate the format that worked last time
+    preferred = next((fmt for fmt in urls if fmt in formats), None)
+    if preferred:
+        try:
+            result = accept(*_request(preferred, urls[preferred], formats[preferred]))
+            if result:
+                return result
+        except requests.RequestException as e:
+            logger.warning(f"Revalidating trending {preferred} feed failed: {e}")
+
+    # Probe every format at once; first usable answer wins
+    probe_session = requests.Session()
+    cancelled = threading.Event()
+    responses = []
+    pool = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix='trending-fetch')
+    try:
+        futures = [
+            pool.submit(_request, fmt, u, formats.get(fmt), probe_session, cancelled, responses)
+            for fmt, u in urls.items()
+        ]
+        for future in as_completed(futures):
+            try:
+                result = accept(*future.result())
+            except requests.RequestException as e:
+                logger.warning(f"Trending feed request failed: {e}")
+                continue
+            if result:
+                return result
+    finally:
+        cancelled.set()
+        for resp in list(responses):
+            resp.close()
+        probe_session.close()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    for fmt in urls:
+        if fmt in formats:
+            logger.warning(f"Trending feed unavailable; using cached {fmt} payload")
+            return FetchResult(_parse(fmt, formats[fmt]['body']), True, fmt)
+
+    logger.error("Failed to fetch OpenRouter Top Weekly")
+    return FetchResult([], False, None)
 
-        # Try CSV
-        csv_url = feed_url.replace('fmt=json', 'fmt=csv')
-        resp_csv = requests.get(csv_url, timeout=30)
-        if resp_csv.ok and ',' in resp_csv.text:
-            return _parse_csv(resp_csv.text)
 
-        # Try table (markdown)
-        table_url = feed_url.replace('fmt=json', 'fmt=table')
-        resp_tbl = requests.get(table_url, timeout=30)
-        if resp_tbl.ok:
-            return _parse_markdown_table(resp_tbl.text)
+def fetch_openrouter_top_weekly(url: str = None) -> List[Dict]:
+    """Fetch OpenRouter Top Weekly models (JSON, CSV or table).
 
-        return []
-    except Exception as e:
-        logger.error(f"Failed to fetch OpenRouter Top Weekly: {e}")
-        return []
+    Returns a list of records with fields like `id`, `name`, `provider`,
+    `weekly_tokens` if available. If the schema differs, we map best-effort.
+    """
+    return fetch_trending(url).items
 
 
 def _normalize_openrouter_json(data) -> List[Dict]:
@@ -177,26 +349,46 @@ def update_doc_file(path: str, table_md: str) -> bool:
 
 
 def persist_json(items: List[Dict], out_path: str = None) -> None:
-    """Persist fetched items to data/trending_models.json."""
-    target = out_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'trending_models.json')
-    os.makedirs(os.path.dirname(target), exist_ok=True)
+    """Persist fetched items to data/trending_models.json.
+
+    The file is replaced atomically and the in-process trend score store
+    is updated straight away.
+    """
+    target = out_path or TRENDING_PATH
     try:
-        with open(target, 'w', encoding='utf-8') as f:
-            json.dump({'source': Config.OPENROUTER_TREND_URL, 'items': items}, f, ensure_ascii=False, indent=2)
+        write_json_atomic(target, {'source': Config.OPENROUTER_TREND_URL, 'items': items})
         logger.info(f"Saved trending data to {target}")
     except Exception as e:
         logger.error(f"Failed to save trending data: {e}")
+        return
+    publish_trending(target, items)
+
+
+def _published_ok(path: str) -> bool:
+    """Whether the persisted trending JSON exists and holds an item list"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return isinstance(json.load(f).get('items'), list)
+    except (OSError, ValueError, AttributeError):
+        return False
 
 
 def update_openrouter_top_weekly(doc_paths: List[str] = None) -> bool:
     """Fetch trending models and update docs.
 
+    An unchanged feed is skipped unless the persisted JSON is missing or
+    unreadable, in which case it is rewritten from the cached payload.
+
     Args:
         doc_paths: list of documentation files to update.
     Returns:
         True if at least one file updated.
     """
-    items = fetch_openrouter_top_weekly()
+    result = fetch_trending()
+    if result.not_modified and _published_ok(TRENDING_PATH):
+        logger.info("Trending feed not modified; nothing to update")
+        return False
+    items = result.items
     if not items:
         logger.warning("No trending items fetched; skipping doc update")
         return False
@@ -0,0 +1,192 @@
+"""
+User identity cache for the Earning Robot.
+Maps a user's email or Telegram ID to their `users.id` so hot paths
+(`/api/task`, Telegram `/ask`, checkout) skip the lookup query. Entries live
+in a per-database LRU; misses are cached briefly as well. Unknown users are
+created with `INSERT ... ON CONFLICT DO NOTHING`, so concurrent requests for
+the same new user agree on one row. Commits that add, change or delete a
+User drop the affected entries.
+"""
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from collections import OrderedDict
+from backend.cache import invalidate
+from backend.database import User
+import threading
+import time
+import weakref
+
+# Columns a user can be looked up by (each is unique)
+IDENTITY_FIELDS = ('email', 'telegram_id')
+
+DEFAULT_MAX_ENTRIES = 10000
+# Seconds a "no such user" answer is trusted (covers users created by other processes)
+NEGATIVE_TTL = 30.0
+
+_MISSING = object()
+
+
+class UserIdCache:
+    """Thread-safe LRU of (field, value) -> user id, with expiring negative entries
+
+    Args:
+        max_entries: Entries kept before the least recently used is dropped
+        negative_ttl: Seconds a cached miss stays valid
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, negative_ttl=NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.stats = {'hits': 0, 'misses': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, field, value):
+        """Cached user id, None for a cached miss, or `_MISSING` if unknown"""
+        key = (field, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                user_id, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return user_id
+                del self._entries[key]
+            self.stats['misses'] += 1
+            return _MISSING
+
+    def set(self, field, value, user_id):
+        """Cache a user id, or a miss when `user_id` is None"""
+        expires_at = time.monotonic() + self.negative_ttl if user_id is None else None
+        key = (field, value)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys):
+        """Drop the given (field, value) entries"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# One cache per engine, so separate databases never share user ids
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_user_cache(engine):
+    """Identity cache for a database engine (created on first use)"""
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = _caches[engine] = UserIdCache()
+        return cache
+
+
+def _session_cache(session):
+    return get_user_cache(session.get_bind())
+
+
+def _check_field(field):
+    if field not in IDENTITY_FIELDS:
+        raise ValueError(f"Users cannot be looked up by {field!r}")
+
+
+def find_user_id(session, field, value):
+    """
+    Look up a user id by email or Telegram ID
+
+    Args:
+        session: Database session
+        field: 'email' or 'telegram_id'
+        value: Identifier to look up
+
+    Returns:
+        User id, or None if no such user
+    """
+    _check_field(field)
+    cache = _session_cache(session)
+    user_id = cache.get(field, value)
+    if user_id is not _MISSING:
+        return user_id
+
+    user_id = session.query(User.id).filter(getattr(User, field) == value).scalar()
+    cache.set(field, value, user_id)
+    return user_id
+
+
+def get_or_create_user_id(session, field, value):
+    """
+    Id of the user with this email or Telegram ID, creating the user if needed
+
+    Creating commits the session. Concurrent callers creating the same user
+    get the same id.
+
+    Args:
+        session: Database session
+        field: 'email' or 'telegram_id'
+        value: Identifier of the user
+
+    Returns:
+        User id
+    """
+    _check_field(field)
+    cache = _session_cache(session)
+    user_id = cache.get(field, value)
+    if user_id is not _MISSING and user_id is not None:
+        return user_id
+
+    result = session.execute(
+        sqlite_insert(User.__table__).values({field: value}).on_conflict_do_nothing(index_elements=[field])
+    )
+    user_id = session.query(User.id).filter(getattr(User, field) == value).scalar()
+    session.commit()
+    if result.rowcount:
+        # Core inserts bypass the ORM write tracking
+        invalidate('users')
+
+    cache.set(field, value, user_id)
+    return user_id
+
+
+def install_user_cache(session_factory):
+    """
+    Invalidate cached identities when a commit adds, changes or deletes a User
+
+    Args:
+        session_factory: sessionmaker of the main database
+    """
+    @event.listens_for(session_factory, 'after_flush')
+    def _collect(session, flush_context):
+        keys = session.info.setdefault('user_identity_keys', set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if not isinstance(obj, User):
+                continue
+            state = sa_inspect(obj)
+            for field in IDENTITY_FIELDS:
+                history = state.attrs[field].history
+                for value in list(history.added) + list(history.deleted) + list(history.unchanged):
+                    if value is not None:
+                        keys.add((field, value))
+
+    @event.listens_for(session_factory, 'after_commit')
+    def _invalidate(session):
+        keys = session.info.pop('user_identity_keys', None)
+        if keys:
+            _session_cache(session).invalidate(keys)
+
+    @event.listens_for(session_factory, 'after_rollback')
+    def _discard(session):
+        session.info.pop('user_identity_keys', None)
@@ -0,0 +1,139 @@
+"""
+Load test: payment path against a local Stripe stand-in.
+Starts the fake Stripe API (tests/fake_stripe.py) and the Flask API on
+local ports with a throwaway database, then measures requests/sec and
+latency percentiles for subscription and micro-payment checkout creation
+and for webhook bursts (ingest, then batch processing).
+
+Run with: python benchmarks/bench_payments.py [--requests N] [--concurrency C]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+import stripe
+
+from tests.fake_stripe import FakeStripeServer
+from tests.stripe_fixtures import LiveServer, load_event, sign_payload
+
+WEBHOOK_SECRET = 'whsec_bench'
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_load(name, requests_count, concurrency, make_request):
+    """Fire `requests_count` calls from `concurrency` threads and print stats"""
+    def call(i):
+        start = time.perf_counter()
+        response = make_request(i)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    latencies = [elapsed * 1000 for elapsed, _ in results]
+    errors = sum(1 for _, status in results if status >= 400)
+    print(
+        f"{name:<26}{requests_count / wall:>10.1f}{statistics.median(latencies):>10.2f}"
+        f"{percentile(latencies, 99):>10.2f}{errors:>8}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--users', type=int, default=50, help='Distinct subscription emails')
+    parser.add_argument('--stripe-latency', type=float, default=0.0, help='Seconds added per Stripe call')
+    args = parser.parse_args()
+
+    import backend.app as app_module
+    from backend.config import Config
+    from backend.database import Database, User
+    from billing.webhooks import process_all_pending
+
+    workdir = tempfile.mkdtemp(prefix='bench_payments_')
+    db = Database(os.path.join(workdir, 'robot.db')).initialize()
+    app_module.db = db
+    Config.STRIPE_WEBHOOK_SECRET = WEBHOOK_SECRET
+
+    session = db.get_session()
+    session.add(User(email='micro@example.com'))
+    session.commit()
+    micro_user_id = session.query(User.id).scalar()
+    session.close()
+
+    with FakeStripeServer(latency=args.stripe_latency) as fake, LiveServer(app_module.app) as api:
+        stripe.api_base = fake.url
+        stripe.api_key = 'sk_test_bench'
+        http = requests.Session()
+        http.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+        print(f"{'scenario':<26}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        print('-' * 64)
+
+        run_load('subscription checkout', args.requests, args.concurrency, lambda i: http.post(
+            f"{api.url}/api/payment/subscription",
+            json={'email': f"user{i % args.users}@example.com"}
+        ))
+        run_load('micro checkout', args.requests, args.concurrency, lambda i: http.post(
+            f"{api.url}/api/payment/micro",
+            json={'user_id': micro_user_id}
+        ))
+
+        def deliver(i):
+            # Every fifth delivery is a Stripe retry of the previous event
+            event_number = i - 1 if i % 5 == 4 else i
+            event = load_event(
+                'checkout_session_completed',
+                event_id=f"evt_bench_{event_number}",
+                id=f"cs_bench_{event_number}"
+            )
+            payload = json.dumps(event).encode('utf-8')
+            return http.post(
+                f"{api.url}/api/webhook/stripe",
+                data=payload,
+                headers={
+                    'Content-Type': 'application/json',
+                    'Stripe-Signature': sign_payload(payload, WEBHOOK_SECRET),
+                }
+            )
+
+        run_load('webhook burst (ingest)', args.requests, args.concurrency, deliver)
+
+        session = db.get_session()
+        started = time.perf_counter()
+        stats = process_all_pending(session)
+        elapsed = time.perf_counter() - started
+        session.close()
+        print(
+            f"{'webhook batch processing':<26}{stats['processed'] / elapsed:>10.1f}"
+            f"{'events/s':>10}  inserted={stats['inserted']}"
+        )
+
+        print()
+        print(f"Stripe API calls: {fake.requests} "
+              f"({args.users} distinct subscription customers expected)")
+
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: API response encoding.
+Compares bytes on the wire and serialization CPU for the Flask default
+encoder (stdlib json, ASCII-escaped) against the fast encoder, MessagePack
+and each negotiated compression codec.
+
+Run with: python benchmarks/bench_response_encoding.py
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.http_encoding import COMPRESSORS, dumps_bytes, msgpack, orjson
+
+ITERATIONS = 200
+
+
+def build_payloads():
+    """Representative bodies returned by the API"""
+    llm_output = (
+        "Искусственный интеллект (AI) — это область информатики, которая "
+        "занимается созданием систем, способных выполнять задачи, требующие "
+        "человеческого интеллекта. Artificial intelligence covers learning, "
+        "reasoning and perception.\n\n"
+    ) * 30
+    now = datetime(2025, 1, 15, 10, 30)
+
+    task = {
+        'id': 1024,
+        'status': 'completed',
+        'provider': 'openai',
+        'input': 'Explain artificial intelligence in detail, with examples.',
+        'output': llm_output,
+        'tokens_used': 1850,
+        'cost': 0.0028,
+        'created_at': now.isoformat(),
+        'completed_at': (now + timedelta(seconds=4)).isoformat(),
+    }
+    task_page = {
+        'tasks': [
+            {
+                'id': i,
+                'status': 'completed',
+                'provider': 'openai' if i % 3 else 'mistral',
+                'created_at': (now - timedelta(minutes=i)).isoformat(),
+            }
+            for i in range(500)
+        ],
+        'next_cursor': 'MjAyNS0wMS0xNVQxMDozMDowMHwx',
+    }
+    report = {
+        'success': True,
+        'report': "\n".join(
+            f"**openai/gpt-4o-{i}**\n- Запросов: {i * 7}\n- Затраты: ${i * 0.37:.2f}\n"
+            for i in range(120)
+        ),
+    }
+    return {'task_detail': task, 'task_page_500': task_page, 'optimizer_report': report}
+
+
+def timed(func, payload):
+    """Average microseconds per call and the last result"""
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        result = func(payload)
+    elapsed = (time.perf_counter() - start) / ITERATIONS * 1e6
+    return elapsed, result
+
+
+def flask_default(payload):
+    """Flask's default provider output in production (compact, ASCII, sorted)"""
+    return json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('ascii')
+
+
+def main():
+    print(f"JSON encoder: {'orjson' if orjson else 'stdlib'} | "
+          f"msgpack: {'yes' if msgpack else 'no'} | "
+          f"codecs: {', '.join(name for name, _ in COMPRESSORS)}")
+    print(f"{'payload':<18}{'variant':<22}{'bytes':>10}{'µs/op':>10}")
+    print('-' * 60)
+
+    for name, payload in build_payloads().items():
+        rows = []
+        before_us, before = timed(flask_default, payload)
+        rows.append(('before: stdlib json', len(before), before_us))
+
+        fast_us, fast = timed(dumps_bytes, payload)
+        rows.append(('fast json', len(fast), fast_us))
+
+        if msgpack is not None:
+            mp_us, packed = timed(msgpack.packb, payload)
+            rows.append(('msgpack', len(packed), mp_us))
+
+        for codec, compress in COMPRESSORS:
+            codec_us, compressed = timed(compress, fast)
+            rows.append((f"fast json + {codec}", len(compressed), fast_us + codec_us))
+
+        for variant, size, micros in rows:
+            print(f"{name:<18}{variant:<22}{size:>10}{micros:>10.1f}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Load test: simultaneous /ask updates through the Telegram bot.
+Runs the bot's python-telegram-bot application against a local Bot API
+stand-in (tests/fake_telegram.py) with a throwaway database and an AI
+manager that answers after a fixed delay, then pushes a burst of /ask
+updates from distinct users and reports wall time and answer latency
+percentiles. The sequential row (one update at a time) shows what the
+burst cost when each LLM call held up the event loop.
+
+Run with: python benchmarks/bench_telegram_ask.py [--updates N] [--latency S]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from telegram import Update
+
+from backend.config import Config
+from tests.fake_telegram import FakeTelegramServer, command_update
+
+TOKEN = '123:BENCH'
+
+
+class DelayedAI:
+    """AI manager stand-in: fixed latency, tracks peak concurrent calls"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def execute_task(self, prompt, provider='openai', max_tokens=500):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        return {'response': f"Answer to {prompt}", 'tokens_used': 42, 'cost': 0.0001}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def burst(bot, server, count):
+    """Deliver `count` /ask updates at once; returns (wall seconds, answer latencies)"""
+    application = bot.build_application(polling=False)
+    await application.initialize()
+    await application.start()
+    try:
+        first_edit = len(server.edits)
+        started = time.perf_counter()
+        for i in range(count):
+            data = command_update(i + 1, 10_000 + i, f"/ask question {i}")
+            await application.update_queue.put(Update.de_json(data, application.bot))
+
+        answered = {}
+        while len(answered) < count:
+            for edit in server.edits[first_edit:]:
+                answered.setdefault(edit['chat_id'], time.perf_counter() - started)
+            await asyncio.sleep(0.005)
+        return time.perf_counter() - started, list(answered.values())
+    finally:
+        await application.stop()
+        await application.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--updates', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds per AI call')
+    args = parser.parse_args()
+
+    from frontend.telegram_bot import TelegramBot
+    # One log line per Bot API call would drown the table
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix='bench_telegram_')
+    Config.TELEGRAM_BOT_TOKEN = TOKEN
+    Config.DATABASE_PATH = os.path.join(workdir, 'robot.db')
+
+    print(f"{'mode':<14}{'updates':>9}{'wall s':>9}{'p50 s':>9}{'p99 s':>9}{'peak AI':>9}")
+    print('-' * 59)
+
+    with FakeTelegramServer(TOKEN) as server:
+        Config.TELEGRAM_API_BASE = server.url
+        for mode, concurrency in (('sequential', 1), ('concurrent', Config.TELEGRAM_CONCURRENT_UPDATES)):
+            Config.TELEGRAM_CONCURRENT_UPDATES = concurrency
+            ai = DelayedAI(args.latency)
+            bot = TelegramBot(ai_manager=ai)
+            wall, latencies = asyncio.run(burst(bot, server, args.updates))
+            bot.executor.shutdown()
+            bot.db.close()
+            print(
+                f"{mode:<14}{args.updates:>9}{wall:>9.2f}{statistics.median(latencies):>9.2f}"
+                f"{percentile(latencies, 99):>9.2f}{ai.peak:>9}"
+            )
+
+
+if __name__ == '__main__':
+    main()
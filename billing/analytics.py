@@ -0,0 +1,283 @@
+"""
+Time-series financial analytics for the Earning Robot.
+Completed transactions are pre-aggregated per hour, type, category,
+payment provider and currency into `ledger_hourly_buckets` by SQLite
+triggers; hour/day/week/month series are rolled up from those buckets and
+converted into the reporting currency with the day's FX rate (billing.fx).
+"""
+from sqlalchemy import func, text
+from backend.config import Config
+from backend.database import FxRate, LedgerHourlyBucket
+from backend.money import to_float
+from billing.fx import converted_micros, missing_rate, rate_join
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ('hour', 'day', 'week', 'month')
+GROUP_BY_COLUMNS = {
+    'category': LedgerHourlyBucket.category,
+    'provider': LedgerHourlyBucket.provider,
+}
+
+# Largest series a single request may ask for (a year of hours fits)
+MAX_BUCKETS = 10000
+DEFAULT_RANGE = timedelta(days=30)
+
+# Same layout SQLAlchemy uses for DateTime values on SQLite, so bucket
+# hours compare correctly with bound datetime parameters
+_HOUR_FORMAT = '%Y-%m-%d %H:00:00.000000'
+
+# Contribution of one transaction row to its bucket
+_BUCKET_ROW = """
+    SELECT
+        strftime('{hour_format}', {row}.created_at),
+        {row}.transaction_type,
+        COALESCE({row}.category, ''),
+        COALESCE({row}.payment_provider, ''),
+        COALESCE({row}.currency, ''),
+        {sign} COALESCE({row}.amount_micros, 0),
+        {sign} 1
+    WHERE {row}.status = 'completed'
+      AND {row}.transaction_type IN ('income', 'expense')
+      AND {row}.created_at IS NOT NULL
+"""
+
+_UPSERT = """
+    INSERT INTO ledger_hourly_buckets
+        (hour, transaction_type, category, provider, currency, total_micros, count)
+    {select}
+    ON CONFLICT (hour, transaction_type, category, provider, currency)
+    DO UPDATE SET total_micros = total_micros + excluded.total_micros, count = count + excluded.count;
+"""
+
+
+def _apply(row, sign):
+    select = _BUCKET_ROW.format(hour_format=_HOUR_FORMAT, row=row, sign=sign)
+    return _UPSERT.format(select=select)
+
+
+_TRIGGERS = {
+    'insert': ('INSERT', _apply('NEW', '+')),
+    'update': ('UPDATE', _apply('OLD', '-') + _apply('NEW', '+')),
+    'delete': ('DELETE', _apply('OLD', '-')),
+}
+
+
+def install_buckets(engine):
+    """
+    Create the bucket maintenance triggers and seed buckets if missing
+
+    Args:
+        engine: SQLAlchemy engine of the robot database
+    """
+    with engine.begin() as conn:
+        for name, (event, body) in _TRIGGERS.items():
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS analytics_transactions_{name}\n"
+                f"AFTER {event} ON transactions\n"
+                f"BEGIN\n{body}\nEND"
+            ))
+
+        empty = conn.execute(text("SELECT 1 FROM ledger_hourly_buckets LIMIT 1")).first() is None
+        if empty:
+            _rebuild(conn)
+
+
+def _rebuild(conn):
+    """Recompute every bucket from the transactions table"""
+    conn.execute(text("DELETE FROM ledger_hourly_buckets"))
+    conn.execute(text(f"""
+        INSERT INTO ledger_hourly_buckets
+            (hour, transaction_type, category, provider, currency, total_micros, count)
+        SELECT
+            strftime('{_HOUR_FORMAT}', t.created_at),
+            t.transaction_type,
+            COALESCE(t.category, ''),
+            COALESCE(t.payment_provider, ''),
+            COALESCE(t.currency, ''),
+            SUM(COALESCE(t.amount_micros, 0)),
+            COUNT(*)
+        FROM transactions t
+        WHERE t.status = 'completed'
+          AND t.transaction_type IN ('income', 'expense')
+          AND t.created_at IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+    """))
+
+
+def rebuild_buckets(session):
+    """
+    Rebuild all hourly buckets from raw transactions
+
+    Args:
+        session: Database session
+    """
+    _rebuild(session.connection())
+    session.commit()
+    logger.info("Rebuilt hourly analytics buckets")
+
+
+def _bucket_key(bucket):
+    """SQL expression labelling a bucket hour with its series label"""
+    hour = LedgerHourlyBucket.hour
+    if bucket == 'hour':
+        return func.strftime('%Y-%m-%dT%H:00:00', hour)
+    if bucket == 'day':
+        return func.date(hour)
+    if bucket == 'week':
+        # Monday of the ISO week
+        return func.date(hour, 'weekday 0', '-6 days')
+    return func.strftime('%Y-%m', hour)
+
+
+def _floor(value, bucket):
+    """Start of the bucket containing `value`"""
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if bucket == 'hour':
+        return value
+    value = value.replace(hour=0)
+    if bucket == 'day':
+        return value
+    if bucket == 'week':
+        return value - timedelta(days=value.weekday())
+    return value.replace(day=1)
+
+
+def _next(value, bucket):
+    """Start of the bucket after the one starting at `value`"""
+    if bucket == 'hour':
+        return value + timedelta(hours=1)
+    if bucket == 'day':
+        return value + timedelta(days=1)
+    if bucket == 'week':
+        return value + timedelta(weeks=1)
+    if value.month == 12:
+        return value.replace(year=value.year + 1, month=1)
+    return value.replace(month=value.month + 1)
+
+
+def _label(value, bucket):
+    if bucket == 'hour':
+        return value.strftime('%Y-%m-%dT%H:00:00')
+    if bucket == 'month':
+        return value.strftime('%Y-%m')
+    return value.date().isoformat()
+
+
+def _series(labels, totals):
+    """Columnar income/expenses/profit arrays aligned with `labels` (from micros)"""
+    income = [totals.get((label, 'income'), 0) for label in labels]
+    expenses = [totals.get((label, 'expense'), 0) for label in labels]
+    return {
+        'income': [to_float(i, 2) for i in income],
+        'expenses': [to_float(e, 2) for e in expenses],
+        'profit': [to_float(i - e, 2) for i, e in zip(income, expenses)],
+    }
+
+
+def get_timeseries(session, bucket='day', start=None, end=None, group_by=None, currency=None):
+    """
+    Income, expenses and profit per time bucket
+
+    The range is widened to whole buckets; every bucket in it is present
+    in the output, with zeros where nothing happened. Amounts in other
+    currencies are converted with the rate of their day; amounts without a
+    rate are left out (and their currencies listed in `unconverted`).
+
+    Args:
+        session: Database session
+        bucket: hour, day, week or month
+        start: Range start (defaults to 30 days before `end`)
+        end: Range end, exclusive (defaults to now, UTC)
+        group_by: Optional 'category' or 'provider' for per-group series
+        currency: Currency of the series (defaults to REPORTING_CURRENCY)
+
+    Returns:
+        Columnar dictionary with a `buckets` label array and parallel
+        `income`, `expenses` and `profit` arrays (plus `groups` when grouped)
+
+    Raises:
+        ValueError: On unknown bucket/group_by, an empty range or too many buckets
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Invalid bucket: expected one of {', '.join(BUCKETS)}")
+    if group_by and group_by not in GROUP_BY_COLUMNS:
+        raise ValueError(f"Invalid group_by: expected one of {', '.join(GROUP_BY_COLUMNS)}")
+
+    end = end or datetime.utcnow()
+    start = start or end - DEFAULT_RANGE
+    if start >= end:
+        raise ValueError("start must be before end")
+
+    range_start = _floor(start, bucket)
+    range_end = _floor(end, bucket)
+    if range_end < end:
+        range_end = _next(range_end, bucket)
+
+    labels = []
+    cursor = range_start
+    while cursor < range_end:
+        labels.append(_label(cursor, bucket))
+        if len(labels) > MAX_BUCKETS:
+            raise ValueError(f"Range too large: more than {MAX_BUCKETS} {bucket} buckets")
+        cursor = _next(cursor, bucket)
+
+    base = currency or Config.REPORTING_CURRENCY
+    # Buckets store '' for transactions without a currency; those count as `base`
+    bucket_currency = func.nullif(LedgerHourlyBucket.currency, '')
+
+    key = _bucket_key(bucket).label('bucket')
+    columns = [key, LedgerHourlyBucket.transaction_type]
+    if group_by:
+        columns.append(GROUP_BY_COLUMNS[group_by].label('group'))
+
+    rows = session.query(
+        *columns,
+        bucket_currency.label('currency'),
+        func.sum(missing_rate(bucket_currency, base)),
+        func.sum(converted_micros(LedgerHourlyBucket.total_micros, bucket_currency, base))
+    ).outerjoin(
+        FxRate, rate_join(bucket_currency, func.date(LedgerHourlyBucket.hour), base)
+    ).filter(
+        LedgerHourlyBucket.hour >= range_start,
+        LedgerHourlyBucket.hour < range_end
+    ).group_by(*columns, bucket_currency).all()
+
+    totals = {}
+    groups = {}
+    unconverted = set()
+    for row in rows:
+        label, transaction_type, amount = row[0], row[1], row[-1] or 0
+        if row[-2]:
+            unconverted.add(row[-3])
+        totals[(label, transaction_type)] = totals.get((label, transaction_type), 0) + amount
+        if group_by:
+            group = groups.setdefault(row[2] or None, {})
+            group[(label, transaction_type)] = group.get((label, transaction_type), 0) + amount
+
+    if unconverted:
+        logger.warning(
+            f"No {base} FX rate for some {', '.join(sorted(unconverted))} amounts; "
+            f"they are left out of the time series"
+        )
+
+    result = {
+        'bucket': bucket,
+        'currency': base,
+        'start': range_start.isoformat(),
+        'end': range_end.isoformat(),
+        'buckets': labels,
+        **_series(labels, totals),
+        'unconverted': sorted(unconverted),
+    }
+
+    if group_by:
+        result['group_by'] = group_by
+        result['groups'] = [
+            {'key': group, **_series(labels, group_totals)}
+            for group, group_totals in sorted(groups.items(), key=lambda item: item[0] or '')
+        ]
+
+    return result
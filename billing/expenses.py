@@ -0,0 +1,115 @@
+"""
+AI API expense accumulation for the Earning Robot.
+Request handlers only store the cost on the Task row. A periodic job
+folds the costs of completed tasks into one `api_cost` expense
+transaction per AI provider and minute. `expense_task_links` maps every
+task to the transaction that includes it, for auditing.
+
+Tasks are the durable buffer: nothing is lost if a process stops between
+flushes, and a task is linked (so counted) exactly once.
+"""
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+from backend.database import Task, Transaction, ExpenseTaskLink
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of tasks folded per run; the rest wait for the next run
+ACCUMULATE_BATCH_SIZE = 20000
+
+
+def _minute(value):
+    return value.replace(second=0, microsecond=0)
+
+
+def mark_recorded_expenses(engine):
+    """
+    Link tasks whose cost was recorded as an individual expense
+
+    Called once when the link table is introduced to an existing
+    database, so those costs are not counted a second time.
+
+    Args:
+        engine: SQLAlchemy engine of the robot database
+    """
+    with engine.begin() as conn:
+        marked = conn.execute(text(
+            "INSERT OR IGNORE INTO expense_task_links (task_id, transaction_id) "
+            "SELECT id, NULL FROM tasks WHERE cost_micros > 0"
+        )).rowcount
+
+    if marked:
+        logger.info(f"Marked {marked} task(s) with per-request expenses as already recorded")
+
+
+def accumulate_expenses(session, include_current_minute=False, batch_size=ACCUMULATE_BATCH_SIZE):
+    """
+    Record aggregated expense transactions for unlinked task costs
+
+    Args:
+        session: Database session
+        include_current_minute: Also flush the minute still in progress
+            (for processes about to exit, e.g. the CLI)
+        batch_size: Maximum tasks folded in this run
+
+    Returns:
+        Number of expense transactions recorded
+    """
+    now = datetime.utcnow()
+    cutoff = now + timedelta(minutes=1) if include_current_minute else now
+    cutoff = _minute(cutoff)
+    finished_at = func.coalesce(Task.completed_at, Task.created_at)
+
+    tasks = session.query(
+        Task.id, Task.ai_provider, finished_at.label('finished_at'), Task.cost_micros, Task.tokens_used
+    ).outerjoin(
+        ExpenseTaskLink, ExpenseTaskLink.task_id == Task.id
+    ).filter(
+        ExpenseTaskLink.id.is_(None),
+        Task.status == 'completed',
+        Task.cost_micros > 0,
+        finished_at < cutoff
+    ).order_by(Task.id).limit(batch_size).all()
+
+    if not tasks:
+        return 0
+
+    groups = {}
+    for task in tasks:
+        key = (task.ai_provider or 'unknown', _minute(task.finished_at))
+        groups.setdefault(key, []).append(task)
+
+    transactions = []
+    for (provider, minute), group in sorted(groups.items(), key=lambda item: item[0][1]):
+        tokens = sum(task.tokens_used or 0 for task in group)
+        transactions.append((group, Transaction(
+            transaction_type='expense',
+            category='api_cost',
+            amount_micros=sum(task.cost_micros for task in group),
+            description=f"{provider.upper()} API - {len(group)} requests, {tokens} tokens",
+            payment_provider=provider,
+            status='completed',
+            created_at=minute
+        )))
+
+    session.add_all([transaction for _, transaction in transactions])
+    session.flush()
+
+    try:
+        session.execute(ExpenseTaskLink.__table__.insert(), [
+            {'task_id': task.id, 'transaction_id': transaction.id}
+            for group, transaction in transactions
+            for task in group
+        ])
+        session.commit()
+    except IntegrityError:
+        # Another process linked some of these tasks first; retry next run
+        session.rollback()
+        logger.warning("Expense accumulation raced with another writer, skipped")
+        return 0
+
+    logger.info(f"Recorded {len(transactions)} aggregated API expense(s) for {len(tasks)} task(s)")
+    return len(transactions)
+
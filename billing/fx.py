@@ -0,0 +1,233 @@
+"""
+Foreign exchange rates for the Earning Robot.
+Reports convert every transaction currency into the reporting currency
+(`REPORTING_CURRENCY`) inside the aggregation query, by joining daily
+rates from `fx_rates`. Rates come from a pluggable source (a local CSV
+file by default) and are forward-filled so every day has a rate: weekends
+and days not yet quoted carry the latest earlier quote.
+
+Rate file format (CSV with header; `rate` = reporting currency per unit):
+    date,currency,rate
+    2024-01-02,EUR,1.0945
+
+Usage:
+    python -m billing.fx load [--file PATH] [--through YYYY-MM-DD]
+"""
+from sqlalchemy import BigInteger, and_, case, cast, func, or_
+from sqlalchemy.dialects.sqlite import insert
+from backend.config import Config
+from backend.database import FxRate
+from backend.cache import invalidate
+from datetime import datetime, date, timedelta
+import argparse
+import csv
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Name -> zero-argument factory returning an object with `fetch(base)`
+RATE_SOURCES = {}
+
+
+def register_rate_source(name, factory):
+    """
+    Make a rate source selectable via `FX_RATE_SOURCE`
+
+    Args:
+        name: Source name
+        factory: Callable returning an object whose `fetch(base)` yields
+            (day, currency, rate) tuples, rate in `base` per unit
+    """
+    RATE_SOURCES[name] = factory
+
+
+class FileRateSource:
+    """Rates from a local CSV file with `date,currency,rate` columns"""
+
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self, base):
+        """Yield (day, currency, rate) tuples; a missing file yields nothing"""
+        if not os.path.exists(self.path):
+            logger.info(f"No FX rate file at {self.path}")
+            return
+
+        with open(self.path, newline='') as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    currency = row['currency'].strip().upper()
+                    rate = float(row['rate'])
+                    day = date.fromisoformat(row['date'].strip())
+                except (KeyError, AttributeError, ValueError) as e:
+                    raise ValueError(f"{self.path}:{line}: invalid FX rate row: {e}") from e
+                if rate <= 0:
+                    raise ValueError(f"{self.path}:{line}: FX rate must be positive")
+                if currency != base:
+                    yield day, currency, rate
+
+
+register_rate_source('file', lambda: FileRateSource(Config.FX_RATES_FILE))
+
+
+def get_rate_source(name=None):
+    """Instantiate the configured (or named) rate source"""
+    name = name or Config.FX_RATE_SOURCE
+    if name not in RATE_SOURCES:
+        raise ValueError(f"Unknown FX rate source: {name}")
+    return RATE_SOURCES[name]()
+
+
+def _upsert(session, rows):
+    statement = insert(FxRate.__table__)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=['day', 'base', 'currency'],
+        set_={
+            'rate': statement.excluded.rate,
+            'filled': statement.excluded.filled,
+            'source': statement.excluded.source,
+        }
+    ), rows)
+
+
+def forward_fill(session, base=None, through=None):
+    """
+    Give every day up to `through` a rate, carrying quotes forward
+
+    Filled rows are re-derived on every run, so a late quote replaces the
+    values carried over it.
+
+    Args:
+        session: Database session
+        base: Reporting currency (defaults to `REPORTING_CURRENCY`)
+        through: Last day to fill (defaults to today, UTC)
+
+    Returns:
+        Number of rows written
+    """
+    base = base or Config.REPORTING_CURRENCY
+    through = through or datetime.utcnow().date()
+
+    rows = session.query(FxRate.currency, FxRate.day, FxRate.rate, FxRate.filled).filter(
+        FxRate.base == base
+    ).order_by(FxRate.currency, FxRate.day).all()
+
+    by_currency = {}
+    for currency, day, rate, filled in rows:
+        by_currency.setdefault(currency, {})[day] = (rate, filled)
+
+    updates = []
+    for currency, days in by_currency.items():
+        quote = None
+        day = min(days)
+        while day <= through:
+            rate, filled = days.get(day, (None, True))
+            if not filled:
+                quote = rate
+            elif rate != quote:
+                updates.append({
+                    'day': day, 'base': base, 'currency': currency,
+                    'rate': quote, 'filled': True, 'source': 'forward_fill',
+                })
+            day += timedelta(days=1)
+
+    if updates:
+        _upsert(session, updates)
+    session.commit()
+    return len(updates)
+
+
+def load_rates(session, source=None, base=None, through=None):
+    """
+    Store quotes from a rate source and forward-fill the gaps
+
+    Args:
+        session: Database session
+        source: Rate source (defaults to the configured one)
+        base: Reporting currency (defaults to `REPORTING_CURRENCY`)
+        through: Last day to forward-fill (defaults to today, UTC)
+
+    Returns:
+        Number of quoted rates stored
+    """
+    base = base or Config.REPORTING_CURRENCY
+    source = source or get_rate_source()
+    name = getattr(source, 'name', type(source).__name__)
+
+    quotes = [
+        {'day': day, 'base': base, 'currency': currency, 'rate': rate, 'filled': False, 'source': name}
+        for day, currency, rate in source.fetch(base)
+    ]
+    if quotes:
+        _upsert(session, quotes)
+
+    filled = forward_fill(session, base, through)
+    invalidate('fx_rates')
+
+    logger.info(f"Loaded {len(quotes)} FX rate(s) into {base}, forward-filled {filled} day(s)")
+    return len(quotes)
+
+
+def rate_join(currency, day, base):
+    """Outer join condition matching `fx_rates` to a currency column and day expression"""
+    return and_(FxRate.base == base, FxRate.currency == currency, FxRate.day == day)
+
+
+def converted_micros(amount_micros, currency, base):
+    """
+    SQL expression: an amount in micros of `base`
+
+    Amounts already in `base` (or without a currency) stay exact integers;
+    others are multiplied by the joined rate and rounded to a micro-unit.
+    The result is NULL when no rate is joined.
+    """
+    return case(
+        (or_(currency == base, currency.is_(None)), amount_micros),
+        else_=cast(func.round(amount_micros * FxRate.rate), BigInteger)
+    )
+
+
+def missing_rate(currency, base):
+    """SQL expression: 1 for a row that needs a rate but has none joined"""
+    return case(
+        (and_(currency != base, currency.isnot(None), FxRate.rate.is_(None)), 1),
+        else_=0
+    )
+
+
+def _parse_day(value):
+    return date.fromisoformat(value)
+
+
+def main(argv=None):
+    """Command line entry point for loading rates"""
+    from backend.database import Database
+
+    parser = argparse.ArgumentParser(description='FX rate maintenance')
+    parser.add_argument('command', choices=['load'])
+    parser.add_argument('--file', help='CSV rate file (overrides FX_RATE_SOURCE)')
+    parser.add_argument('--through', type=_parse_day, help='Last day to forward-fill (YYYY-MM-DD)')
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help='Database path')
+    args = parser.parse_args(argv)
+
+    db = Database(args.db).initialize()
+    session = db.get_session()
+
+    try:
+        source = FileRateSource(args.file) if args.file else None
+        loaded = load_rates(session, source, through=args.through)
+        print(f"Loaded {loaded} rate(s)")
+        return 0
+
+    finally:
+        session.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
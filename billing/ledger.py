@@ -0,0 +1,336 @@
+"""
+Daily ledger snapshots for the Earning Robot.
+Once a day is over its completed transactions are summed per type,
+category and currency into `ledger_daily_snapshots`, so period reports
+read one row per closed day instead of every transaction.
+
+A day is only trusted while its `ledger_day_closures` row exists. SQLite
+triggers delete that row whenever a transaction of the day is inserted,
+changed or removed; the next close re-snapshots it.
+
+Usage:
+    python -m billing.ledger backfill [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+    python -m billing.ledger check [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+from sqlalchemy import func, text
+from backend.database import Transaction, LedgerDailySnapshot, LedgerDayClosure
+from backend.money import to_float
+from datetime import datetime, date, time, timedelta
+import argparse
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+_REOPEN_TRIGGERS = [
+    """
+CREATE TRIGGER IF NOT EXISTS ledger_reopen_transactions_insert
+AFTER INSERT ON transactions
+BEGIN
+    DELETE FROM ledger_day_closures WHERE day = date(NEW.created_at);
+END
+""",
+    """
+CREATE TRIGGER IF NOT EXISTS ledger_reopen_transactions_update
+AFTER UPDATE ON transactions
+BEGIN
+    DELETE FROM ledger_day_closures WHERE day IN (date(NEW.created_at), date(OLD.created_at));
+END
+""",
+    """
+CREATE TRIGGER IF NOT EXISTS ledger_reopen_transactions_delete
+AFTER DELETE ON transactions
+BEGIN
+    DELETE FROM ledger_day_closures WHERE day = date(OLD.created_at);
+END
+""",
+]
+
+
+def install_ledger(engine):
+    """
+    Install the triggers that reopen closed days on late writes
+
+    Args:
+        engine: SQLAlchemy engine of the main database
+    """
+    with engine.begin() as conn:
+        for statement in _REOPEN_TRIGGERS:
+            conn.execute(text(statement))
+
+
+def day_bounds(day):
+    """Half-open [start, next day start) datetimes of a day"""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def _ledger_query(session, start_time, end_time):
+    """Completed income/expense transactions in [start_time, end_time)"""
+    return session.query(Transaction).filter(
+        Transaction.transaction_type.in_(('income', 'expense')),
+        Transaction.status == 'completed',
+        Transaction.created_at >= start_time,
+        Transaction.created_at < end_time
+    )
+
+
+def close_day(session, day):
+    """
+    Write (or rewrite) the snapshot rows of one day and mark it closed
+
+    Args:
+        session: Database session
+        day: date to close
+
+    Returns:
+        Number of transactions summarized
+    """
+    start_time, end_time = day_bounds(day)
+
+    # Deleting first takes the write lock, so no transaction of the day
+    # can be committed between the aggregation and the closure
+    session.query(LedgerDailySnapshot).filter(LedgerDailySnapshot.day == day).delete()
+
+    rows = _ledger_query(session, start_time, end_time).with_entities(
+        Transaction.transaction_type,
+        Transaction.category,
+        Transaction.currency,
+        func.sum(Transaction.amount_micros),
+        func.count(Transaction.id)
+    ).group_by(
+        Transaction.transaction_type, Transaction.category, Transaction.currency
+    ).all()
+
+    session.add_all([
+        LedgerDailySnapshot(
+            day=day,
+            transaction_type=transaction_type,
+            category=category,
+            currency=currency,
+            total_micros=total or 0,
+            count=count
+        )
+        for transaction_type, category, currency, total, count in rows
+    ])
+
+    transaction_count = sum(row[4] for row in rows)
+    session.merge(LedgerDayClosure(day=day, closed_at=datetime.utcnow(), transaction_count=transaction_count))
+    session.commit()
+
+    return transaction_count
+
+
+def _first_transaction_day(session):
+    first = session.query(func.min(Transaction.created_at)).scalar()
+    return first.date() if first else None
+
+
+def _closed_days(session, start_day, end_day):
+    rows = session.query(LedgerDayClosure.day).filter(
+        LedgerDayClosure.day >= start_day,
+        LedgerDayClosure.day <= end_day
+    ).all()
+    return {row[0] for row in rows}
+
+
+def _days(start_day, end_day):
+    day = start_day
+    while day <= end_day:
+        yield day
+        day += timedelta(days=1)
+
+
+def close_pending_days(session, through=None):
+    """
+    Close every past day that has no valid snapshot yet
+
+    Args:
+        session: Database session
+        through: Last day to close (defaults to yesterday, UTC)
+
+    Returns:
+        List of days that were closed
+    """
+    through = through or datetime.utcnow().date() - timedelta(days=1)
+    first_day = _first_transaction_day(session)
+    if first_day is None or first_day > through:
+        return []
+
+    closed = _closed_days(session, first_day, through)
+    pending = [day for day in _days(first_day, through) if day not in closed]
+
+    for day in pending:
+        close_day(session, day)
+
+    if pending:
+        logger.info(f"Closed {len(pending)} ledger day(s) through {through.isoformat()}")
+    return pending
+
+
+def backfill(session, start=None, end=None):
+    """
+    Rebuild snapshots for a range of days, closed or not
+
+    Args:
+        session: Database session
+        start: First day (defaults to the first transaction's day)
+        end: Last day (defaults to yesterday, UTC)
+
+    Returns:
+        Number of days snapshotted
+    """
+    start = start or _first_transaction_day(session)
+    end = end or datetime.utcnow().date() - timedelta(days=1)
+    if start is None or start > end:
+        return 0
+
+    days = 0
+    for day in _days(start, end):
+        close_day(session, day)
+        days += 1
+
+    logger.info(f"Backfilled {days} ledger day(s) from {start.isoformat()} to {end.isoformat()}")
+    return days
+
+
+def check_consistency(session, start=None, end=None):
+    """
+    Compare closed-day snapshots with the raw transactions
+
+    Args:
+        session: Database session
+        start: First day to check (defaults to all closed days)
+        end: Last day to check
+
+    Returns:
+        List of mismatch dictionaries (empty when consistent)
+    """
+    query = session.query(LedgerDayClosure.day)
+    if start:
+        query = query.filter(LedgerDayClosure.day >= start)
+    if end:
+        query = query.filter(LedgerDayClosure.day <= end)
+    closed = sorted(row[0] for row in query.all())
+    if not closed:
+        return []
+
+    closed_set = set(closed)
+    range_start, _ = day_bounds(closed[0])
+    _, range_end = day_bounds(closed[-1])
+
+    snapshots = {}
+    for snapshot in session.query(LedgerDailySnapshot).filter(
+        LedgerDailySnapshot.day >= closed[0],
+        LedgerDailySnapshot.day <= closed[-1]
+    ):
+        if snapshot.day in closed_set:
+            key = (snapshot.day, snapshot.transaction_type, snapshot.category, snapshot.currency)
+            snapshots[key] = (snapshot.total_micros, snapshot.count)
+
+    live = {}
+    for day, transaction_type, category, currency, total, count in _ledger_query(
+        session, range_start, range_end
+    ).with_entities(
+        func.date(Transaction.created_at),
+        Transaction.transaction_type,
+        Transaction.category,
+        Transaction.currency,
+        func.sum(Transaction.amount_micros),
+        func.count(Transaction.id)
+    ).group_by(
+        func.date(Transaction.created_at),
+        Transaction.transaction_type, Transaction.category, Transaction.currency
+    ):
+        day = date.fromisoformat(day)
+        if day in closed_set:
+            live[(day, transaction_type, category, currency)] = (total or 0, count)
+
+    mismatches = []
+    for key in sorted(set(snapshots) | set(live), key=lambda k: tuple(str(part) for part in k)):
+        snapshot_total, snapshot_count = snapshots.get(key, (0, 0))
+        live_total, live_count = live.get(key, (0, 0))
+        if snapshot_count != live_count or snapshot_total != live_total:
+            day, transaction_type, category, currency = key
+            mismatches.append({
+                'day': day.isoformat(),
+                'transaction_type': transaction_type,
+                'category': category,
+                'currency': currency,
+                'snapshot_total': to_float(snapshot_total),
+                'live_total': to_float(live_total),
+                'snapshot_count': snapshot_count,
+                'live_count': live_count,
+            })
+
+    return mismatches
+
+
+def snapshot_coverage(session, start_day, end_day):
+    """
+    Contiguous run of closed days usable for a report range
+
+    Args:
+        session: Database session
+        start_day: First day of the report range
+        end_day: Last day of the report range
+
+    Returns:
+        (first_day, last_day) of the closed run ending at the latest closed
+        day in range, or None if no day in range is closed
+    """
+    closed = _closed_days(session, start_day, end_day)
+    if not closed:
+        return None
+
+    last_day = max(closed)
+    first_day = last_day
+    while first_day - timedelta(days=1) in closed:
+        first_day -= timedelta(days=1)
+
+    return first_day, last_day
+
+
+def _parse_day(value):
+    return date.fromisoformat(value)
+
+
+def main(argv=None):
+    """Command line entry point for backfill and consistency checks"""
+    from backend.config import Config
+    from backend.database import Database
+
+    parser = argparse.ArgumentParser(description='Ledger snapshot maintenance')
+    parser.add_argument('command', choices=['backfill', 'check'])
+    parser.add_argument('--start', type=_parse_day, help='First day (YYYY-MM-DD)')
+    parser.add_argument('--end', type=_parse_day, help='Last day (YYYY-MM-DD)')
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help='Database path')
+    args = parser.parse_args(argv)
+
+    db = Database(args.db).initialize()
+    session = db.get_session()
+
+    try:
+        if args.command == 'backfill':
+            days = backfill(session, args.start, args.end)
+            print(f"Snapshotted {days} day(s)")
+            return 0
+
+        mismatches = check_consistency(session, args.start, args.end)
+        for mismatch in mismatches:
+            print(
+                f"{mismatch['day']} {mismatch['transaction_type']}/{mismatch['category']} "
+                f"{mismatch['currency']}: snapshot {mismatch['snapshot_total']} "
+                f"({mismatch['snapshot_count']}) != live {mismatch['live_total']} ({mismatch['live_count']})"
+            )
+        print(f"{len(mismatches)} mismatch(es)")
+        return 1 if mismatches else 0
+
+    finally:
+        session.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -5,6 +5,7 @@ Integrates with Stripe for payment processing.
 import stripe
 from backend.config import Config
 from backend.database import Transaction
+from billing.webhooks import ingest_stripe_event
 from datetime import datetime, timedelta
 import logging
 
@@ -13,6 +14,8 @@ logger = logging.getLogger(__name__)
 # Initialize Stripe
 if Config.STRIPE_SECRET_KEY:
     stripe.api_key = Config.STRIPE_SECRET_KEY
+if Config.STRIPE_API_BASE:
+    stripe.api_base = Config.STRIPE_API_BASE
 
 
 class PaymentProcessor:
@@ -21,6 +24,32 @@ class PaymentProcessor:
     def __init__(self, db_session):
         self.db = db_session
     
+    def get_or_create_customer(self, user, email):
+        """
+        Get the user's Stripe customer, creating it on first use
+        
+        Args:
+            user: User object
+            email: Customer email
+            
+        Returns:
+            Stripe customer ID
+        """
+        if user.stripe_customer_id:
+            return user.stripe_customer_id
+        
+        # The idempotency key makes concurrent first checkouts share one customer
+        customer = stripe.Customer.create(
+            email=email,
+            metadata={'user_id': user.id},
+            idempotency_key=f"customer-user-{user.id}"
+        )
+        
+        user.stripe_customer_id = customer.id
+        self.db.commit()
+        
+        return customer.id
+    
     def create_subscription(self, user, email):
         """
         Create a monthly subscription for a user
@@ -33,15 +62,11 @@ class PaymentProcessor:
             Stripe checkout session URL
         """
         try:
-            # Create or retrieve customer
-            customer = stripe.Customer.create(
-                email=email,
-                metadata={'user_id': user.id}
-            )
+            customer_id = self.get_or_create_customer(user, email)
             
             # Create checkout session for subscription
             session = stripe.checkout.Session.create(
-                customer=customer.id,
+                customer=customer_id,
                 payment_method_types=['card'],
                 line_items=[{
                     'price_data': {
@@ -159,58 +184,17 @@ class PaymentProcessor:
         """
         Handle Stripe webhook events
         
+        The event is verified and stored; transactions are recorded later
+        in batches by billing.webhooks.process_pending_events.
+        
         Args:
             payload: Webhook payload
             sig_header: Stripe signature header
         """
         try:
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, Config.STRIPE_WEBHOOK_SECRET
-            )
-            
-            if event['type'] == 'checkout.session.completed':
-                session = event['data']['object']
-                self._handle_successful_payment(session)
-            
-            elif event['type'] == 'invoice.paid':
-                invoice = event['data']['object']
-                self._handle_subscription_payment(invoice)
-            
-            elif event['type'] == 'invoice.payment_failed':
-                invoice = event['data']['object']
-                self._handle_payment_failure(invoice)
-                
+            ingest_stripe_event(self.db, payload, sig_header)
             return True
             
         except Exception as e:
             logger.error(f"Webhook error: {e}")
             return False
-    
-    def _handle_successful_payment(self, session):
-        """Handle successful payment from checkout session"""
-        user_id = session.get('metadata', {}).get('user_id')
-        amount = session['amount_total'] / 100
-        
-        self.record_income(
-            amount=amount,
-            category='micro_payment',
-            description='One-time payment',
-            user_id=user_id,
-            external_id=session['id']
-        )
-    
-    def _handle_subscription_payment(self, invoice):
-        """Handle successful subscription payment"""
-        customer_id = invoice['customer']
-        amount = invoice['amount_paid'] / 100
-        
-        self.record_income(
-            amount=amount,
-            category='subscription',
-            description='Monthly subscription',
-            external_id=invoice['id']
-        )
-    
-    def _handle_payment_failure(self, invoice):
-        """Handle failed payment"""
-        logger.warning(f"Payment failed for invoice: {invoice['id']}")
@@ -1,20 +1,278 @@
 """
 Financial reporting module for the Earning Robot.
-Generates income/expense reports and analytics.
+Generates income/expense reports and analytics. Totals are converted into
+the reporting currency with daily FX rates (see billing.fx) inside the
+aggregation query; per-currency totals are kept alongside.
 """
-from sqlalchemy import func
-from backend.database import Transaction
-from datetime import datetime, timedelta
+from sqlalchemy import func, case, and_, or_, select, literal, union_all
+from backend.config import Config
+from backend.database import Transaction, LedgerDailySnapshot, FxRate
+from backend.cache import TTLCache, data_versions
+from backend.money import format_money, to_float, to_micros
+from billing.fx import converted_micros, missing_rate, rate_join
+from billing.ledger import day_bounds, snapshot_coverage
+from datetime import datetime, time, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Aggregates per (database, window, currency, data versions); any committed
+# transaction or rate write advances a version, the TTL bounds cross-process staleness
+_window_cache = TTLCache(ttl=60, max_entries=256)
+
+
+def day_window(start_date, end_date):
+    """Inclusive [start_date 00:00, end_date 23:59:59.999999] window"""
+    return (
+        datetime.combine(start_date, datetime.min.time()),
+        datetime.combine(end_date, datetime.max.time())
+    )
+
 
 class ReportGenerator:
     """Generates financial reports"""
     
-    def __init__(self, db_session):
+    def __init__(self, db_session, currency=None):
         self.db = db_session
+        self.currency = currency or Config.REPORTING_CURRENCY
+        # Rolling breakdown windows, fixed per generator so prefetch and reads agree
+        self._breakdown_windows = {}
+    
+    def aggregate(self, windows):
+        """
+        Income, expenses and per-category totals for several time windows
+        
+        Windows not already cached are computed together in one
+        conditional-aggregation query: closed days are read from the daily
+        ledger snapshots, the remaining (live) days from `transactions`.
+        Both are joined with the day's FX rate and converted in SQL.
+        
+        Args:
+            windows: Iterable of (start_time, end_time) tuples
+            
+        Returns:
+            Dictionary mapping each window to a dict with `income_micros`,
+            `expenses_micros`, `income_breakdown` and `expense_breakdown`
+            (integer micro-units of the reporting currency) and `currencies`,
+            mapping each transaction currency to its unconverted
+            `income_micros`/`expenses_micros`
+        """
+        windows = list(dict.fromkeys(windows))
+        version = data_versions.snapshot(('transactions', 'fx_rates'))
+        bind = self.db.get_bind()
+        
+        results = {}
+        missing = []
+        for window in windows:
+            cached = _window_cache.get((bind, window, self.currency, version))
+            if cached is not None:
+                results[window] = cached
+            else:
+                missing.append(window)
+        
+        if missing:
+            computed = self._aggregate_windows(missing)
+            for window, totals in computed.items():
+                _window_cache.set((bind, window, self.currency, version), totals)
+            results.update(computed)
+        
+        return results
+    
+    def _snapshot_days(self, window, coverage):
+        """Closed days fully inside a window, as (first_day, last_day) or None"""
+        if coverage is None:
+            return None
+        
+        start, end = window
+        first_full = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+        last_full = end.date() if end.time() == time.max else end.date() - timedelta(days=1)
+        
+        first_day = max(first_full, coverage[0])
+        last_day = min(last_full, coverage[1])
+        return (first_day, last_day) if first_day <= last_day else None
+    
+    def _live_ranges(self, window, snapshot_days):
+        """Parts of a window not covered by snapshots"""
+        start, end = window
+        in_window = [Transaction.created_at >= start, Transaction.created_at <= end]
+        if snapshot_days is None:
+            return [and_(*in_window)]
+        
+        snapshot_start, _ = day_bounds(snapshot_days[0])
+        _, snapshot_end = day_bounds(snapshot_days[1])
+        ranges = []
+        if start < snapshot_start:
+            ranges.append(and_(*in_window, Transaction.created_at < snapshot_start))
+        if end >= snapshot_end:
+            ranges.append(and_(*in_window, Transaction.created_at >= snapshot_end))
+        return ranges
+    
+    def _aggregate_windows(self, windows):
+        """Run the single grouped query (snapshots UNION ALL live rows) for the given windows"""
+        coverage = snapshot_coverage(
+            self.db,
+            min(start for start, _ in windows).date(),
+            max(end for _, end in windows).date()
+        )
+        snapshot_days = [self._snapshot_days(window, coverage) for window in windows]
+        live_ranges = [self._live_ranges(window, days) for window, days in zip(windows, snapshot_days)]
+        
+        parts = []
+        
+        all_live = [condition for ranges in live_ranges for condition in ranges]
+        if all_live:
+            currency = func.coalesce(Transaction.currency, self.currency)
+            amount = converted_micros(Transaction.amount_micros, Transaction.currency, self.currency)
+            parts.append(select(
+                Transaction.transaction_type,
+                Transaction.category,
+                currency,
+                func.sum(missing_rate(Transaction.currency, self.currency)),
+                *[
+                    column
+                    for i, ranges in enumerate(live_ranges)
+                    for column in (
+                        [
+                            func.sum(case((or_(*ranges), amount), else_=0)).label(f'w{i}'),
+                            func.sum(case((or_(*ranges), Transaction.amount_micros), else_=0)).label(f'r{i}'),
+                        ] if ranges else [literal(0).label(f'w{i}'), literal(0).label(f'r{i}')]
+                    )
+                ]
+            ).select_from(Transaction).outerjoin(
+                FxRate, rate_join(Transaction.currency, func.date(Transaction.created_at), self.currency)
+            ).where(
+                Transaction.transaction_type.in_(('income', 'expense')),
+                Transaction.status == 'completed',
+                or_(*all_live)
+            ).group_by(Transaction.transaction_type, Transaction.category, currency))
+        
+        used_days = [days for days in snapshot_days if days]
+        if used_days:
+            currency = func.coalesce(LedgerDailySnapshot.currency, self.currency)
+            amount = converted_micros(LedgerDailySnapshot.total_micros, LedgerDailySnapshot.currency, self.currency)
+            parts.append(select(
+                LedgerDailySnapshot.transaction_type,
+                LedgerDailySnapshot.category,
+                currency,
+                func.sum(missing_rate(LedgerDailySnapshot.currency, self.currency)),
+                *[
+                    column
+                    for i, days in enumerate(snapshot_days)
+                    for column in (
+                        [
+                            func.sum(case(
+                                (LedgerDailySnapshot.day.between(days[0], days[1]), amount), else_=0
+                            )).label(f'w{i}'),
+                            func.sum(case(
+                                (LedgerDailySnapshot.day.between(days[0], days[1]), LedgerDailySnapshot.total_micros),
+                                else_=0
+                            )).label(f'r{i}'),
+                        ] if days else [literal(0).label(f'w{i}'), literal(0).label(f'r{i}')]
+                    )
+                ]
+            ).select_from(LedgerDailySnapshot).outerjoin(
+                FxRate, rate_join(LedgerDailySnapshot.currency, LedgerDailySnapshot.day, self.currency)
+            ).where(
+                LedgerDailySnapshot.day >= min(days[0] for days in used_days),
+                LedgerDailySnapshot.day <= max(days[1] for days in used_days)
+            ).group_by(LedgerDailySnapshot.transaction_type, LedgerDailySnapshot.category, currency))
+        
+        rows = self.db.execute(union_all(*parts) if len(parts) > 1 else parts[0]).all()
+        
+        results = {
+            window: {
+                'income_micros': 0, 'expenses_micros': 0,
+                'income_breakdown': {}, 'expense_breakdown': {}, 'currencies': {}
+            }
+            for window in windows
+        }
+        
+        # The same (type, category, currency) can come from both the snapshot and live parts
+        unconverted = set()
+        for row in rows:
+            transaction_type, category, currency, missing_rates = row[0], row[1], row[2], row[3]
+            if missing_rates:
+                unconverted.add(currency)
+            for i, window in enumerate(windows):
+                total, raw = row[4 + 2 * i] or 0, row[5 + 2 * i] or 0
+                if not total and not raw:
+                    continue
+                totals = results[window]
+                by_currency = totals['currencies'].setdefault(currency, {'income_micros': 0, 'expenses_micros': 0})
+                if transaction_type == 'income':
+                    totals['income_micros'] += total
+                    totals['income_breakdown'][category] = totals['income_breakdown'].get(category, 0) + total
+                    by_currency['income_micros'] += raw
+                else:
+                    totals['expenses_micros'] += total
+                    totals['expense_breakdown'][category] = totals['expense_breakdown'].get(category, 0) + total
+                    by_currency['expenses_micros'] += raw
+        
+        if unconverted:
+            logger.warning(
+                f"No {self.currency} FX rate for some {', '.join(sorted(unconverted))} amounts; "
+                f"they are left out of converted totals"
+            )
+        
+        return results
+    
+    def _summary(self, window):
+        """Rounded income/expenses/profit for one window, plus per-currency totals"""
+        totals = self.aggregate([window])[window]
+        income, expenses = totals['income_micros'], totals['expenses_micros']
+        return {
+            'currency': self.currency,
+            'income': to_float(income, 2),
+            'expenses': to_float(expenses, 2),
+            'profit': to_float(income - expenses, 2),
+            'by_currency': {
+                currency: {
+                    'income': to_float(amounts['income_micros'], 2),
+                    'expenses': to_float(amounts['expenses_micros'], 2),
+                    'profit': to_float(amounts['income_micros'] - amounts['expenses_micros'], 2),
+                }
+                for currency, amounts in sorted(totals['currencies'].items())
+            }
+        }
+    
+    def _daily_window(self, date=None):
+        if not date:
+            date = datetime.utcnow().date()
+        return day_window(date, date)
+    
+    def _weekly_window(self):
+        today = datetime.utcnow().date()
+        return day_window(today - timedelta(days=7), today)
+    
+    def _monthly_window(self):
+        today = datetime.utcnow().date()
+        return day_window(today.replace(day=1), today)
+    
+    def _breakdown_window(self, days):
+        # The rolling start is rounded down to the minute so generators
+        # created within the same minute share `_window_cache` entries
+        if days not in self._breakdown_windows:
+            now = datetime.utcnow()
+            start = (now - timedelta(days=days)).replace(second=0, microsecond=0)
+            self._breakdown_windows[days] = (start, datetime.combine(now.date(), time.max))
+        return self._breakdown_windows[days]
+    
+    def prefetch(self, report_type, breakdown_days=None):
+        """
+        Compute a period summary and its category breakdown in one query
+        
+        Args:
+            report_type: daily, weekly or monthly
+            breakdown_days: Breakdown window to fetch alongside, if any
+        """
+        windows = [{
+            'daily': self._daily_window,
+            'weekly': self._weekly_window,
+            'monthly': self._monthly_window,
+        }[report_type]()]
+        if breakdown_days:
+            windows.append(self._breakdown_window(breakdown_days))
+        self.aggregate(windows)
     
     def get_daily_summary(self, date=None):
         """
@@ -29,92 +287,26 @@ class ReportGenerator:
         if not date:
             date = datetime.utcnow().date()
         
-        start_time = datetime.combine(date, datetime.min.time())
-        end_time = datetime.combine(date, datetime.max.time())
-        
-        # Calculate income
-        income = self.db.query(func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'income',
-            Transaction.status == 'completed',
-            Transaction.created_at >= start_time,
-            Transaction.created_at <= end_time
-        ).scalar() or 0.0
-        
-        # Calculate expenses
-        expenses = self.db.query(func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'expense',
-            Transaction.status == 'completed',
-            Transaction.created_at >= start_time,
-            Transaction.created_at <= end_time
-        ).scalar() or 0.0
-        
-        return {
-            'date': date.isoformat(),
-            'income': round(income, 2),
-            'expenses': round(expenses, 2),
-            'profit': round(income - expenses, 2)
-        }
+        return {'date': date.isoformat(), **self._summary(self._daily_window(date))}
     
     def get_weekly_summary(self):
         """Get weekly financial summary"""
-        today = datetime.utcnow().date()
-        week_ago = today - timedelta(days=7)
-        
-        start_time = datetime.combine(week_ago, datetime.min.time())
-        end_time = datetime.combine(today, datetime.max.time())
-        
-        income = self.db.query(func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'income',
-            Transaction.status == 'completed',
-            Transaction.created_at >= start_time,
-            Transaction.created_at <= end_time
-        ).scalar() or 0.0
-        
-        expenses = self.db.query(func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'expense',
-            Transaction.status == 'completed',
-            Transaction.created_at >= start_time,
-            Transaction.created_at <= end_time
-        ).scalar() or 0.0
-        
+        window = self._weekly_window()
         return {
             'period': 'last_7_days',
-            'start_date': week_ago.isoformat(),
-            'end_date': today.isoformat(),
-            'income': round(income, 2),
-            'expenses': round(expenses, 2),
-            'profit': round(income - expenses, 2)
+            'start_date': window[0].date().isoformat(),
+            'end_date': window[1].date().isoformat(),
+            **self._summary(window)
         }
     
     def get_monthly_summary(self):
         """Get monthly financial summary"""
-        today = datetime.utcnow().date()
-        month_start = today.replace(day=1)
-        
-        start_time = datetime.combine(month_start, datetime.min.time())
-        end_time = datetime.combine(today, datetime.max.time())
-        
-        income = self.db.query(func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'income',
-            Transaction.status == 'completed',
-            Transaction.created_at >= start_time,
-            Transaction.created_at <= end_time
-        ).scalar() or 0.0
-        
-        expenses = self.db.query(func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'expense',
-            Transaction.status == 'completed',
-            Transaction.created_at >= start_time,
-            Transaction.created_at <= end_time
-        ).scalar() or 0.0
-        
+        window = self._monthly_window()
         return {
             'period': 'current_month',
-            'start_date': month_start.isoformat(),
-            'end_date': today.isoformat(),
-            'income': round(income, 2),
-            'expenses': round(expenses, 2),
-            'profit': round(income - expenses, 2)
+            'start_date': window[0].date().isoformat(),
+            'end_date': window[1].date().isoformat(),
+            **self._summary(window)
         }
     
     def get_category_breakdown(self, days=30):
@@ -122,38 +314,24 @@ class ReportGenerator:
         Get breakdown by category
         
         Args:
-            days: Number of days to include
+            days: Number of days to include (rolling: the last `days` x 24
+                hours, starting on a whole minute)
             
         Returns:
             Dictionary with category breakdowns
         """
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Income by category
-        income_by_category = self.db.query(
-            Transaction.category,
-            func.sum(Transaction.amount).label('total')
-        ).filter(
-            Transaction.transaction_type == 'income',
-            Transaction.status == 'completed',
-            Transaction.created_at >= cutoff_date
-        ).group_by(Transaction.category).all()
-        
-        # Expenses by category
-        expense_by_category = self.db.query(
-            Transaction.category,
-            func.sum(Transaction.amount).label('total')
-        ).filter(
-            Transaction.transaction_type == 'expense',
-            Transaction.status == 'completed',
-            Transaction.created_at >= cutoff_date
-        ).group_by(Transaction.category).all()
+        window = self._breakdown_window(days)
+        totals = self.aggregate([window])[window]
         
         return {
-            'income_breakdown': {cat: round(total, 2) for cat, total in income_by_category},
-            'expense_breakdown': {cat: round(total, 2) for cat, total in expense_by_category}
+            'income_breakdown': {cat: to_float(total, 2) for cat, total in totals['income_breakdown'].items()},
+            'expense_breakdown': {cat: to_float(total, 2) for cat, total in totals['expense_breakdown'].items()}
         }
     
+    def _money(self, amount, currency=None):
+        """Format a rounded report amount with its currency symbol or code"""
+        return format_money(to_micros(amount), currency or self.currency)
+    
     def format_report(self, report_type='daily'):
         """
         Format a comprehensive report
@@ -164,6 +342,9 @@ class ReportGenerator:
         Returns:
             Formatted text report
         """
+        breakdown_days = {'weekly': 7, 'monthly': 30}.get(report_type)
+        self.prefetch(report_type if report_type in ('daily', 'weekly') else 'monthly', breakdown_days)
+        
         if report_type == 'daily':
             summary = self.get_daily_summary()
             title = f"📊 Daily Report - {summary['date']}"
@@ -177,23 +358,32 @@ class ReportGenerator:
         report = f"""
 {title}
 
-💰 Income: ${summary['income']:.2f}
-💸 Expenses: ${summary['expenses']:.2f}
-{'📈' if summary['profit'] >= 0 else '📉'} Profit: ${summary['profit']:.2f}
+💰 Income: {self._money(summary['income'])}
+💸 Expenses: {self._money(summary['expenses'])}
+{'📈' if summary['profit'] >= 0 else '📉'} Profit: {self._money(summary['profit'])}
 """
         
+        # Original amounts when more than one currency was involved
+        if set(summary['by_currency']) - {self.currency}:
+            report += "\n💱 By Currency:\n"
+            for currency, amounts in summary['by_currency'].items():
+                report += (
+                    f"  • {currency}: +{self._money(amounts['income'], currency)} "
+                    f"/ -{self._money(amounts['expenses'], currency)}\n"
+                )
+        
         # Add category breakdown for weekly/monthly reports
         if report_type in ['weekly', 'monthly']:
-            breakdown = self.get_category_breakdown(7 if report_type == 'weekly' else 30)
+            breakdown = self.get_category_breakdown(breakdown_days)
             
             if breakdown['income_breakdown']:
                 report += "\n💵 Income Sources:\n"
                 for category, amount in breakdown['income_breakdown'].items():
-                    report += f"  • {category}: ${amount:.2f}\n"
+                    report += f"  • {category}: {self._money(amount)}\n"
             
             if breakdown['expense_breakdown']:
                 report += "\n💳 Expenses:\n"
                 for category, amount in breakdown['expense_breakdown'].items():
-                    report += f"  • {category}: ${amount:.2f}\n"
+                    report += f"  • {category}: {self._money(amount)}\n"
         
         return report.strip()
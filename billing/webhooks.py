@@ -0,0 +1,309 @@
+"""
+Stripe webhook ingestion pipeline for the Earning Robot.
+The HTTP handler only verifies the signature and stores the raw event
+(deduplicated on the Stripe event ID), so Stripe gets a fast ack.
+Stored events are turned into transactions in batches by a scheduler
+job; a failed event is retried with exponential backoff, and events
+that keep failing move to a dead-letter table and can be replayed.
+
+Usage:
+    python -m billing.webhooks process
+    python -m billing.webhooks replay [--id DEAD_LETTER_ID ...]
+"""
+import stripe
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from backend.config import Config
+from backend.database import Transaction, WebhookEvent, WebhookDeadLetter
+from datetime import datetime, timedelta
+import argparse
+import json
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+def _user_id(metadata):
+    """User ID from Stripe metadata (values arrive as strings)"""
+    value = (metadata or {}).get('user_id')
+    return int(value) if value not in (None, '') else None
+
+
+def _checkout_completed(session):
+    """One-time payment from a completed checkout session"""
+    return {
+        'user_id': _user_id(session.get('metadata')),
+        'transaction_type': 'income',
+        'category': 'micro_payment',
+        'amount': session['amount_total'] / 100,
+        'description': 'One-time payment',
+        'payment_provider': 'stripe',
+        'external_id': session['id'],
+        'status': 'completed',
+    }
+
+
+def _invoice_paid(invoice):
+    """Subscription payment from a paid invoice"""
+    return {
+        'transaction_type': 'income',
+        'category': 'subscription',
+        'amount': invoice['amount_paid'] / 100,
+        'description': 'Monthly subscription',
+        'payment_provider': 'stripe',
+        'external_id': invoice['id'],
+        'status': 'completed',
+    }
+
+
+def _invoice_payment_failed(invoice):
+    """Failed payment: logged, nothing to record"""
+    logger.warning(f"Payment failed for invoice: {invoice['id']}")
+    return None
+
+
+# Event type -> function mapping the event object to Transaction fields (or None)
+EVENT_HANDLERS = {
+    'checkout.session.completed': _checkout_completed,
+    'invoice.paid': _invoice_paid,
+    'invoice.payment_failed': _invoice_payment_failed,
+}
+
+
+def ingest_stripe_event(session, payload, sig_header, secret=None):
+    """
+    Verify a Stripe webhook and store it for processing
+
+    Args:
+        session: Database session
+        payload: Raw request body
+        sig_header: Stripe-Signature header
+        secret: Webhook signing secret (defaults to STRIPE_WEBHOOK_SECRET)
+
+    Returns:
+        Tuple of (event_id, duplicate) where duplicate is True if the event
+        was already stored (a Stripe retry)
+
+    Raises:
+        ValueError / stripe.error.SignatureVerificationError: On invalid payloads
+    """
+    event = stripe.Webhook.construct_event(
+        payload, sig_header, secret or Config.STRIPE_WEBHOOK_SECRET
+    )
+    raw = payload.decode('utf-8') if isinstance(payload, bytes) else payload
+
+    result = session.execute(
+        sqlite_insert(WebhookEvent.__table__).values(
+            event_id=event['id'],
+            provider='stripe',
+            event_type=event['type'],
+            payload=raw,
+            status='pending',
+            attempts=0,
+            received_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=['event_id'])
+    )
+    session.commit()
+
+    duplicate = result.rowcount == 0
+    if duplicate:
+        logger.info(f"Duplicate webhook event ignored: {event['id']}")
+    return event['id'], duplicate
+
+
+def process_pending_events(session, batch_size=None, max_attempts=None, retry_backoff=None, exclude=None):
+    """
+    Turn one batch of stored events into transactions
+
+    Transactions are deduplicated on `external_id` (within the batch and
+    against the ledger) and inserted together with the event status
+    updates in a single commit. An event whose handler fails is retried
+    no sooner than `retry_backoff` seconds later, doubling per attempt.
+
+    Args:
+        session: Database session
+        batch_size: Events per batch (defaults to WEBHOOK_BATCH_SIZE)
+        max_attempts: Failures before an event is dead-lettered
+            (defaults to WEBHOOK_MAX_ATTEMPTS)
+        retry_backoff: Delay before the first retry in seconds
+            (defaults to WEBHOOK_RETRY_BACKOFF)
+        exclude: Set of event row IDs to skip; IDs of events that failed
+            and wait for a retry are added to it
+
+    Returns:
+        Dictionary with processed, ignored, failed, retrying, inserted and duplicates counts
+    """
+    batch_size = batch_size or Config.WEBHOOK_BATCH_SIZE
+    max_attempts = max_attempts or Config.WEBHOOK_MAX_ATTEMPTS
+    retry_backoff = Config.WEBHOOK_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+    stats = {'processed': 0, 'ignored': 0, 'failed': 0, 'retrying': 0, 'inserted': 0, 'duplicates': 0}
+
+    now = datetime.utcnow()
+    query = session.query(WebhookEvent).filter(
+        WebhookEvent.status == 'pending',
+        (WebhookEvent.next_attempt_at.is_(None)) | (WebhookEvent.next_attempt_at <= now)
+    )
+    if exclude:
+        query = query.filter(WebhookEvent.id.notin_(exclude))
+    events = query.order_by(WebhookEvent.id).limit(batch_size).all()
+
+    if not events:
+        return stats
+
+    rows = {}
+    retrying = []
+
+    for event in events:
+        event.attempts += 1
+        handler = EVENT_HANDLERS.get(event.event_type)
+
+        if handler is None:
+            event.status = 'ignored'
+            event.processed_at = now
+            stats['ignored'] += 1
+            continue
+
+        try:
+            row = handler(json.loads(event.payload)['data']['object'])
+        except Exception as e:
+            event.last_error = f"{type(e).__name__}: {e}"
+            if event.attempts >= max_attempts:
+                event.status = 'failed'
+                event.next_attempt_at = None
+                session.add(WebhookDeadLetter(
+                    webhook_event_id=event.id,
+                    event_id=event.event_id,
+                    event_type=event.event_type,
+                    error=event.last_error,
+                    attempts=event.attempts
+                ))
+                stats['failed'] += 1
+                logger.error(f"Webhook event {event.event_id} dead-lettered: {event.last_error}")
+            else:
+                event.next_attempt_at = now + timedelta(seconds=retry_backoff * 2 ** (event.attempts - 1))
+                retrying.append(event.id)
+                stats['retrying'] += 1
+                logger.warning(f"Webhook event {event.event_id} failed, retrying after {event.next_attempt_at}: {event.last_error}")
+            continue
+
+        if row:
+            if row['external_id'] in rows:
+                stats['duplicates'] += 1
+            rows.setdefault(row['external_id'], row)
+
+        event.status = 'processed'
+        event.processed_at = now
+        event.last_error = None
+        event.next_attempt_at = None
+        stats['processed'] += 1
+
+    if rows:
+        existing = {
+            external_id for (external_id,) in session.query(Transaction.external_id).filter(
+                Transaction.external_id.in_(list(rows))
+            )
+        }
+        new_rows = [row for external_id, row in rows.items() if external_id not in existing]
+        stats['duplicates'] += len(rows) - len(new_rows)
+        session.add_all([Transaction(**row) for row in new_rows])
+        stats['inserted'] = len(new_rows)
+
+    try:
+        session.commit()
+    except IntegrityError as e:
+        # Another writer recorded one of these payments first; the events
+        # stay pending and the retry skips the existing transactions
+        session.rollback()
+        logger.warning(f"Webhook batch conflicted, will retry: {e}")
+        return {key: 0 for key in stats}
+
+    if exclude is not None:
+        exclude.update(retrying)
+    if stats['inserted']:
+        logger.info(f"Webhook batch: {stats['inserted']} transaction(s) recorded from {len(events)} event(s)")
+    return stats
+
+
+def process_all_pending(session, batch_size=None, max_attempts=None, retry_backoff=None):
+    """
+    Process batches until no events are due
+
+    Events that fail are skipped for the rest of the run, so one run
+    spends at most one attempt on each of them.
+
+    Returns:
+        Summed batch statistics
+    """
+    totals = {'processed': 0, 'ignored': 0, 'failed': 0, 'retrying': 0, 'inserted': 0, 'duplicates': 0}
+    retrying = set()
+    while True:
+        stats = process_pending_events(session, batch_size, max_attempts, retry_backoff, exclude=retrying)
+        for key, value in stats.items():
+            totals[key] += value
+        if not any(stats[key] for key in ('processed', 'ignored', 'failed', 'retrying')):
+            # Nothing due, or the batch conflicted and is retried next run
+            return totals
+
+
+def replay_dead_letters(session, dead_letter_ids=None):
+    """
+    Requeue dead-lettered events for processing
+
+    Args:
+        session: Database session
+        dead_letter_ids: Dead letters to replay (defaults to all not yet replayed)
+
+    Returns:
+        Number of events requeued
+    """
+    query = session.query(WebhookDeadLetter).filter(WebhookDeadLetter.replayed_at.is_(None))
+    if dead_letter_ids:
+        query = query.filter(WebhookDeadLetter.id.in_(dead_letter_ids))
+
+    now = datetime.utcnow()
+    count = 0
+    for dead_letter in query.all():
+        event = session.get(WebhookEvent, dead_letter.webhook_event_id)
+        if event is not None:
+            event.status = 'pending'
+            event.attempts = 0
+            event.last_error = None
+            event.next_attempt_at = None
+            count += 1
+        dead_letter.replayed_at = now
+
+    session.commit()
+    logger.info(f"Requeued {count} dead-lettered webhook event(s)")
+    return count
+
+
+def main(argv=None):
+    """Command line entry point for processing and replaying events"""
+    from backend.database import Database
+
+    parser = argparse.ArgumentParser(description='Webhook event maintenance')
+    parser.add_argument('command', choices=['process', 'replay'])
+    parser.add_argument('--id', type=int, action='append', dest='ids', help='Dead letter ID (repeatable)')
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help='Database path')
+    args = parser.parse_args(argv)
+
+    db = Database(args.db).initialize()
+    session = db.get_session()
+
+    try:
+        if args.command == 'replay':
+            print(f"Requeued {replay_dead_letters(session, args.ids)} event(s)")
+
+        stats = process_all_pending(session)
+        print(', '.join(f"{key}={value}" for key, value in stats.items()))
+        return 0
+
+    finally:
+        session.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -6,8 +6,10 @@ from backend.database import Database, User, Task, Transaction
 from backend.ai_providers import AIManager
 from backend.config import Config
 from billing.reporting import ReportGenerator
-from billing.payment_processor import PaymentProcessor
+from billing.expenses import accumulate_expenses
 from backend.model_optimizer import ModelOptimizer
+from backend.stats import get_stats_snapshot
+from datetime import datetime
 import sys
 
 
@@ -51,18 +53,12 @@ def execute_ai_task(db, ai_manager):
             output_text=result['response'],
             tokens_used=result['tokens_used'],
             cost=result['cost'],
-            status='completed'
+            status='completed',
+            completed_at=datetime.utcnow()
         )
         session.add(task)
         
-        # Record expense
-        processor = PaymentProcessor(session)
-        processor.record_expense(
-            amount=result['cost'],
-            category='api_cost',
-            description=f"{provider.upper()} API - CLI"
-        )
-        
+        # The API cost is recorded by the expense accumulator (flushed on exit)
         session.commit()
         session.close()
         
@@ -83,9 +79,10 @@ def view_tasks(db):
         for task in tasks:
             print(f"\nTask #{task.id} - {task.status}")
             print(f"Provider: {task.ai_provider}")
-            print(f"Input: {task.input_text[:50]}...")
-            if task.output_text:
-                print(f"Output: {task.output_text[:50]}...")
+            # Previews avoid loading full prompts/outputs from the blob store
+            print(f"Input: {(task.input_preview or '')[:50]}...")
+            if task.output_preview:
+                print(f"Output: {task.output_preview[:50]}...")
             print(f"Cost: ${task.cost:.4f} | Tokens: {task.tokens_used}")
             print(f"Created: {task.created_at}")
     
@@ -116,19 +113,12 @@ def view_statistics(db):
     print("\n--- Statistics ---")
     session = db.get_session()
     
-    from sqlalchemy import func
-    
-    total_tasks = session.query(Task).count()
-    completed_tasks = session.query(Task).filter_by(status='completed').count()
-    total_cost = session.query(func.sum(Task.cost)).scalar() or 0.0
-    
-    total_income = session.query(func.sum(Transaction.amount)).filter_by(
-        transaction_type='income', status='completed'
-    ).scalar() or 0.0
-    
-    total_expenses = session.query(func.sum(Transaction.amount)).filter_by(
-        transaction_type='expense', status='completed'
-    ).scalar() or 0.0
+    stats = get_stats_snapshot(session)
+    total_tasks = stats['total_tasks']
+    completed_tasks = stats['completed_tasks']
+    total_cost = stats['total_task_cost']
+    total_income = stats['total_income']
+    total_expenses = stats['total_expenses']
     
     print(f"\n📊 Tasks:")
     print(f"  Total: {total_tasks}")
@@ -273,6 +263,20 @@ def main():
     
     print("✅ Ready!")
     
+    try:
+        run_menu(db, ai_manager, optimizer)
+    finally:
+        # Record API costs of this session's tasks before exiting
+        session = db.get_session()
+        try:
+            accumulate_expenses(session, include_current_minute=True)
+        finally:
+            session.close()
+        db.close()
+
+
+def run_menu(db, ai_manager, optimizer):
+    """Interactive menu loop"""
     while True:
         show_menu()
         choice = input("\nSelect option: ").strip()
@@ -300,8 +304,6 @@ def main():
             view_optimizer_report(optimizer)
         else:
             print("\n❌ Invalid option. Please try again.")
-    
-    db.close()
 
 
 if __name__ == '__main__':
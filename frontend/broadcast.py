@@ -0,0 +1,272 @@
+"""
+Owner broadcasts for the Earning Robot Telegram bot.
+A broadcast is a background job: recipients are read from the database in
+batches ordered by user ID, sent through a token bucket with a bounded
+number of sends in flight, and the job row is checkpointed after every
+batch. A job interrupted by a restart resumes after its last checkpoint
+(recipients of the unfinished batch may get the message twice). The owner
+gets a progress message that is updated while the job runs.
+"""
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from backend.config import Config
+from backend.database import BroadcastJob, User
+from backend.rate_limit import AsyncTokenBucket
+from datetime import datetime
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Attempts per recipient for network errors and flood waits
+MAX_ATTEMPTS = 3
+
+
+class BroadcastRunner:
+    """Create, run and resume broadcast jobs
+
+    Args:
+        db: Main Database
+        run_blocking: Coroutine function running a blocking call off the event loop
+        rate: Messages per second
+        concurrency: Sends in flight at once
+        batch_size: Recipients read (and checkpointed) per batch
+        progress_interval: Minimum seconds between progress updates
+    """
+
+    def __init__(self, db, run_blocking, rate=None, concurrency=None, batch_size=None, progress_interval=None):
+        self.db = db
+        self.run_blocking = run_blocking
+        self.rate = rate or Config.BROADCAST_RATE
+        self.concurrency = concurrency or Config.BROADCAST_CONCURRENCY
+        self.batch_size = batch_size or Config.BROADCAST_BATCH_SIZE
+        self.progress_interval = progress_interval if progress_interval is not None else Config.BROADCAST_PROGRESS_INTERVAL
+        self.bucket = AsyncTokenBucket(self.rate)
+        # Job IDs running in this process
+        self.active = set()
+        self._tasks = set()
+
+    # Database access (blocking; called through run_blocking)
+
+    def _recipients(self, session):
+        return session.query(User.id, User.telegram_id).filter(
+            User.telegram_id.isnot(None),
+            User.is_active.is_(True)
+        )
+
+    def create_job(self, text, owner_chat_id):
+        """Store a new job; returns (job_id, recipient count)"""
+        session = self.db.get_session()
+        try:
+            total = self._recipients(session).count()
+            job = BroadcastJob(text=text, owner_chat_id=str(owner_chat_id), total=total)
+            session.add(job)
+            session.commit()
+            return job.id, total
+        finally:
+            session.close()
+
+    def unfinished_jobs(self):
+        """IDs of jobs left running by a previous process"""
+        session = self.db.get_session()
+        try:
+            rows = session.query(BroadcastJob.id).filter_by(status='running').order_by(BroadcastJob.id).all()
+            return [row.id for row in rows]
+        finally:
+            session.close()
+
+    def _load_job(self, job_id):
+        session = self.db.get_session()
+        try:
+            job = session.get(BroadcastJob, job_id)
+            return {
+                'text': job.text,
+                'owner_chat_id': job.owner_chat_id,
+                'total': job.total,
+                'sent': job.sent,
+                'failed': job.failed,
+                'last_user_id': job.last_user_id,
+            }
+        finally:
+            session.close()
+
+    def _next_batch(self, after_user_id):
+        session = self.db.get_session()
+        try:
+            return self._recipients(session).filter(
+                User.id > after_user_id
+            ).order_by(User.id).limit(self.batch_size).all()
+        finally:
+            session.close()
+
+    def _checkpoint(self, job_id, last_user_id, sent, failed, status=None):
+        session = self.db.get_session()
+        try:
+            job = session.get(BroadcastJob, job_id)
+            job.last_user_id = last_user_id
+            job.sent = sent
+            job.failed = failed
+            job.updated_at = datetime.utcnow()
+            if status:
+                job.status = status
+                job.finished_at = datetime.utcnow()
+            session.commit()
+        finally:
+            session.close()
+
+    # Delivery
+
+    def start(self, bot, job_id):
+        """
+        Run a job in the background on the current event loop
+
+        Jobs are not awaited on shutdown: `cancel` stops them and the next
+        start resumes them from their checkpoint.
+
+        Returns:
+            asyncio.Task
+        """
+        task = asyncio.get_running_loop().create_task(self.run(bot, job_id), name=f"broadcast-{job_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def resume(self, bot):
+        """Restart jobs left running by a previous process; returns their IDs"""
+        job_ids = await self.run_blocking(self.unfinished_jobs)
+        for job_id in job_ids:
+            logger.info(f"Resuming broadcast #{job_id}")
+            self.start(bot, job_id)
+        return job_ids
+
+    async def cancel(self):
+        """Stop running jobs (they stay resumable)"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, bot, job_id):
+        """
+        Deliver a job to every remaining recipient
+
+        Args:
+            bot: telegram.Bot used for sending
+            job_id: BroadcastJob ID
+        """
+        if job_id in self.active:
+            return
+        self.active.add(job_id)
+        try:
+            await self._run(bot, job_id)
+        except Exception as e:
+            logger.error(f"Broadcast #{job_id} failed: {e}")
+            job = await self.run_blocking(self._load_job, job_id)
+            await self.run_blocking(
+                self._checkpoint, job_id, job['last_user_id'], job['sent'], job['failed'], 'failed'
+            )
+            await self._report(bot, job['owner_chat_id'], f"❌ Broadcast #{job_id} stopped: {e}")
+        finally:
+            self.active.discard(job_id)
+
+    async def _run(self, bot, job_id):
+        job = await self.run_blocking(self._load_job, job_id)
+        owner = job['owner_chat_id']
+        sent, failed, last_user_id = job['sent'], job['failed'], job['last_user_id']
+        resumed = sent + failed > 0
+
+        started = time.monotonic()
+        done_at_start = sent + failed
+        progress = await self._report(
+            bot, owner,
+            f"📣 Broadcast #{job_id} {'resumed' if resumed else 'started'}: "
+            f"{done_at_start}/{job['total']} done"
+        )
+        last_progress = time.monotonic()
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(chat_id):
+            async with semaphore:
+                return await self._send(bot, chat_id, job['text'])
+
+        while True:
+            batch = await self.run_blocking(self._next_batch, last_user_id)
+            if not batch:
+                break
+
+            results = await asyncio.gather(*(deliver(row.telegram_id) for row in batch))
+            delivered = sum(1 for ok in results if ok)
+            sent += delivered
+            failed += len(results) - delivered
+            last_user_id = batch[-1].id
+            await self.run_blocking(self._checkpoint, job_id, last_user_id, sent, failed)
+
+            if time.monotonic() - last_progress >= self.progress_interval:
+                last_progress = time.monotonic()
+                await self._edit(progress, self._progress_text(
+                    job_id, sent, failed, job['total'], sent + failed - done_at_start, started
+                ))
+
+        await self.run_blocking(self._checkpoint, job_id, last_user_id, sent, failed, 'completed')
+        elapsed = time.monotonic() - started
+        throughput = (sent + failed - done_at_start) / elapsed if elapsed > 0 else 0.0
+        summary = (
+            f"✅ Broadcast #{job_id} finished\n"
+            f"• Sent: {sent}\n"
+            f"• Failed: {failed}\n"
+            f"• Time: {elapsed:.1f}s ({throughput:.1f} msg/s)"
+        )
+        if not await self._edit(progress, summary):
+            await self._report(bot, owner, summary)
+        logger.info(f"Broadcast #{job_id} finished: {sent} sent, {failed} failed in {elapsed:.1f}s")
+
+    async def _send(self, bot, chat_id, text):
+        """Send to one recipient; returns True if delivered"""
+        for attempt in range(MAX_ATTEMPTS):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text)
+                return True
+            except RetryAfter as e:
+                # Flood limit hit anyway: wait as told and retry
+                await asyncio.sleep(float(e.retry_after))
+            except (Forbidden, BadRequest) as e:
+                # Blocked the bot, deleted account, unknown chat
+                logger.info(f"Broadcast to {chat_id} rejected: {e}")
+                return False
+            except TelegramError as e:
+                logger.warning(f"Broadcast to {chat_id} failed: {e}")
+                await asyncio.sleep(attempt + 1)
+        return False
+
+    @staticmethod
+    def _progress_text(job_id, sent, failed, total, processed, started):
+        elapsed = time.monotonic() - started
+        throughput = processed / elapsed if elapsed > 0 else 0.0
+        done = sent + failed
+        percent = done / total * 100 if total else 100.0
+        return (
+            f"📣 Broadcast #{job_id}: {done}/{total} ({percent:.0f}%)\n"
+            f"• Sent: {sent} • Failed: {failed}\n"
+            f"• {throughput:.1f} msg/s"
+        )
+
+    async def _report(self, bot, chat_id, text):
+        """Message the owner; returns the sent message or None"""
+        try:
+            return await bot.send_message(chat_id=chat_id, text=text)
+        except TelegramError as e:
+            logger.warning(f"Broadcast progress report failed: {e}")
+            return None
+
+    async def _edit(self, message, text):
+        """Update the progress message; returns True on success"""
+        if message is None:
+            return False
+        try:
+            await message.edit_text(text)
+            return True
+        except TelegramError as e:
+            logger.warning(f"Broadcast progress update failed: {e}")
+            return False
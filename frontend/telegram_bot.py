@@ -1,6 +1,10 @@
 """
 Telegram Bot interface for the Earning Robot.
 Provides owner control and user interaction.
+
+Updates are handled concurrently; blocking work (LLM calls, database
+queries) runs in a bounded thread pool so the event loop keeps serving
+other users while a question is being answered.
 """
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -14,9 +18,15 @@ from telegram.ext import (
 from backend.config import Config
 from backend.database import Database, User, Task
 from backend.ai_providers import AIManager
-from billing.payment_processor import PaymentProcessor
 from billing.reporting import ReportGenerator
+from backend.stats import get_stats_snapshot
+from backend.user_cache import get_or_create_user_id
+from frontend.broadcast import BroadcastRunner
+from frontend.telegram_webhook import WebhookDispatcher
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import asyncio
+import functools
 import logging
 
 logging.basicConfig(
@@ -29,15 +39,37 @@ logger = logging.getLogger(__name__)
 class TelegramBot:
     """Telegram bot for robot control"""
     
-    def __init__(self):
+    def __init__(self, ai_manager=None):
         self.db = Database(Config.DATABASE_PATH).initialize()
-        self.ai_manager = AIManager()
+        self.ai_manager = ai_manager or AIManager()
         self.owner_id = Config.TELEGRAM_OWNER_ID
+        self.executor = ThreadPoolExecutor(
+            max_workers=Config.TELEGRAM_WORKERS,
+            thread_name_prefix='telegram-bot'
+        )
+        self.max_inflight_per_user = Config.TELEGRAM_MAX_INFLIGHT_PER_USER
+        # Unanswered /ask questions per Telegram user (touched only on the event loop)
+        self._inflight = {}
+        self._selfbot_data = None
+        self.broadcasts = BroadcastRunner(self.db, self.run_blocking)
     
     def is_owner(self, user_id):
         """Check if user is the owner"""
         return str(user_id) == str(self.owner_id)
     
+    @property
+    def selfbot_data(self):
+        """SelfBot data service shared by the /selfbot_* commands (created on first use)"""
+        if self._selfbot_data is None:
+            from selfbot.finance import SelfBotDataService
+            self._selfbot_data = SelfBotDataService()
+        return self._selfbot_data
+    
+    async def run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call in the bot's worker pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
         user = update.effective_user
@@ -98,22 +130,61 @@ Let's get started! What would you like to do?
             return
         
         question = ' '.join(context.args)
+        user_key = str(user.id)
         
-        # Send "thinking" message
-        thinking_msg = await update.message.reply_text("🤔 Processing your request...")
+        # Check and take the slot before any await so concurrent updates can't overshoot
+        if self._inflight.get(user_key, 0) >= self.max_inflight_per_user:
+            await update.message.reply_text(
+                "⏳ Your previous questions are still being answered. Please wait a moment."
+            )
+            return
+        self._inflight[user_key] = self._inflight.get(user_key, 0) + 1
         
+        try:
+            # Send "thinking" message
+            thinking_msg = await update.message.reply_text("🤔 Processing your request...")
+            
+            try:
+                result = await self.run_blocking(self._answer_question, user_key, question)
+                
+                # Send response
+                response_text = f"🤖 AI Response:\n\n{result['response']}\n\n"
+                response_text += f"📊 Tokens used: {result['tokens_used']} | Cost: ${result['cost']:.4f}"
+                
+                await thinking_msg.edit_text(response_text)
+                
+            except Exception as e:
+                logger.error(f"Error processing AI request: {e}")
+                await thinking_msg.edit_text(
+                    f"❌ Sorry, an error occurred: {str(e)}"
+                )
+        finally:
+            remaining = self._inflight[user_key] - 1
+            if remaining:
+                self._inflight[user_key] = remaining
+            else:
+                del self._inflight[user_key]
+    
+    def _answer_question(self, telegram_id, question):
+        """
+        Record the task, query the AI provider and store the result
+        (blocking; runs in the worker pool)
+        
+        Args:
+            telegram_id: Asking user's Telegram ID
+            question: Question text
+            
+        Returns:
+            AI provider result dictionary
+        """
+        session = self.db.get_session()
         try:
             # Get or create user
-            session = self.db.get_session()
-            db_user = session.query(User).filter_by(telegram_id=str(user.id)).first()
-            if not db_user:
-                db_user = User(telegram_id=str(user.id))
-                session.add(db_user)
-                session.commit()
+            user_id = get_or_create_user_id(session, 'telegram_id', telegram_id)
             
             # Create task record
             task = Task(
-                user_id=db_user.id,
+                user_id=user_id,
                 task_type='chat',
                 ai_provider='openai',
                 input_text=question,
@@ -131,62 +202,40 @@ Let's get started! What would you like to do?
             task.cost = result['cost']
             task.status = 'completed'
             task.completed_at = datetime.utcnow()
+            # The API cost reaches the ledger via the expense accumulator job
             session.commit()
             
-            # Record expense
-            payment_processor = PaymentProcessor(session)
-            payment_processor.record_expense(
-                amount=result['cost'],
-                category='api_cost',
-                description=f"OpenAI API - {result['tokens_used']} tokens"
-            )
-            
-            # Send response
-            response_text = f"🤖 AI Response:\n\n{result['response']}\n\n"
-            response_text += f"📊 Tokens used: {result['tokens_used']} | Cost: ${result['cost']:.4f}"
-            
-            await thinking_msg.edit_text(response_text)
-            
+            return result
+        finally:
             session.close()
-            
-        except Exception as e:
-            logger.error(f"Error processing AI request: {e}")
-            await thinking_msg.edit_text(
-                f"❌ Sorry, an error occurred: {str(e)}"
-            )
     
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /status command"""
-        session = self.db.get_session()
+        stats = await self.run_blocking(self._stats_snapshot)
         
-        try:
-            # Get task statistics
-            total_tasks = session.query(Task).count()
-            completed_tasks = session.query(Task).filter_by(status='completed').count()
-            failed_tasks = session.query(Task).filter_by(status='failed').count()
-            
-            # Get user count
-            total_users = session.query(User).count()
-            active_users = session.query(User).filter_by(is_active=True).count()
-            
-            status_text = f"""
+        status_text = f"""
 🤖 Robot Status
 
 📊 Tasks:
-• Total: {total_tasks}
-• Completed: {completed_tasks}
-• Failed: {failed_tasks}
+• Total: {stats['total_tasks']}
+• Completed: {stats['completed_tasks']}
+• Failed: {stats['failed_tasks']}
 
 👥 Users:
-• Total: {total_users}
-• Active: {active_users}
+• Total: {stats['total_users']}
+• Active: {stats['active_users']}
 
 ✅ System: Online
 🕒 Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
 """
-            
-            await update.message.reply_text(status_text)
-            
+        
+        await update.message.reply_text(status_text)
+    
+    def _stats_snapshot(self):
+        """Dashboard counters (blocking; runs in the worker pool)"""
+        session = self.db.get_session()
+        try:
+            return get_stats_snapshot(session)
         finally:
             session.close()
     
@@ -206,11 +255,14 @@ Let's get started! What would you like to do?
             )
             return
         
+        report = await self.run_blocking(self._format_report, report_type)
+        await update.message.reply_text(report)
+    
+    def _format_report(self, report_type):
+        """Formatted financial report (blocking; runs in the worker pool)"""
         session = self.db.get_session()
         try:
-            generator = ReportGenerator(session)
-            report = generator.format_report(report_type)
-            await update.message.reply_text(report)
+            return ReportGenerator(session).format_report(report_type)
         finally:
             session.close()
     
@@ -297,15 +349,9 @@ Available commands:
             return
         
         try:
-            from selfbot.database import SelfBotDatabase
-            from selfbot.finance import SelfBotReports
             from selfbot.config import SelfBotConfig
             
-            db = SelfBotDatabase(SelfBotConfig.DATABASE_PATH).initialize()
-            session = db.get_session()
-            reports = SelfBotReports(session)
-            
-            stats = reports.generate_summary_stats()
+            stats = await self.run_blocking(self.selfbot_data.summary_stats)
             
             status_text = f"""
 📊 SelfBot Status
@@ -328,8 +374,6 @@ Available commands:
 """
             
             await update.message.reply_text(status_text)
-            session.close()
-            db.close()
             
         except Exception as e:
             await update.message.reply_text(f"❌ Error getting status: {e}")
@@ -343,16 +387,8 @@ Available commands:
             return
         
         try:
-            from selfbot.database import SelfBotDatabase
-            from selfbot.finance import SelfBotReports
-            from selfbot.config import SelfBotConfig
-            
-            db = SelfBotDatabase(SelfBotConfig.DATABASE_PATH).initialize()
-            session = db.get_session()
-            reports = SelfBotReports(session)
-            
             # Get top performing content types
-            top_types = reports.get_top_performing_content_types(limit=3)
+            top_types = await self.run_blocking(self.selfbot_data.top_content_types, 3)
             
             stats_text = "📊 SelfBot Performance Stats\n\n"
             stats_text += "🏆 Top Content Types:\n"
@@ -361,8 +397,6 @@ Available commands:
                 stats_text += f"{i}. {ctype}: ${avg_profit:.2f} avg profit\n"
             
             await update.message.reply_text(stats_text)
-            session.close()
-            db.close()
             
         except Exception as e:
             await update.message.reply_text(f"❌ Error getting stats: {e}")
@@ -376,23 +410,41 @@ Available commands:
             return
         
         try:
-            from selfbot.database import SelfBotDatabase
-            from selfbot.finance import SelfBotReports
-            from selfbot.config import SelfBotConfig
-            
-            db = SelfBotDatabase(SelfBotConfig.DATABASE_PATH).initialize()
-            session = db.get_session()
-            reports = SelfBotReports(session)
-            
-            report = reports.generate_cycle_report()
+            report = await self.run_blocking(self.selfbot_data.cycle_report)
             
             await update.message.reply_text(f"```\n{report}\n```", parse_mode='Markdown')
-            session.close()
-            db.close()
             
         except Exception as e:
             await update.message.reply_text(f"❌ Error generating report: {e}")
     
+    async def broadcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /broadcast command - owner only, sends a message to all users"""
+        user = update.effective_user
+        
+        if not self.is_owner(user.id):
+            await update.message.reply_text("⛔ This command is only available to the owner.")
+            return
+        
+        # Keep the message's own line breaks
+        parts = update.message.text.split(None, 1)
+        text = parts[1].strip() if len(parts) > 1 else ''
+        if not text:
+            await update.message.reply_text("Usage: /broadcast <message>")
+            return
+        
+        job_id, total = await self.run_blocking(self.broadcasts.create_job, text, update.effective_chat.id)
+        logger.info(f"Broadcast #{job_id} created for {total} users")
+        # Progress is reported by the job itself
+        self.broadcasts.start(context.bot, job_id)
+    
+    async def _post_init(self, application):
+        """Resume broadcasts interrupted by a restart"""
+        await self.broadcasts.resume(application.bot)
+    
+    async def _post_stop(self, application):
+        """Stop running broadcasts at their last checkpoint"""
+        await self.broadcasts.cancel()
+    
     async def message_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle regular messages"""
         # Treat regular messages as AI queries
@@ -402,16 +454,27 @@ Available commands:
         context.args = question.split()
         await self.ask_command(update, context)
     
-    def run(self):
-        """Run the Telegram bot"""
-        try:
-            Config.validate()
-        except ValueError as e:
-            logger.error(f"Configuration error: {e}")
-            return
+    def build_application(self, polling=True):
+        """
+        Create the python-telegram-bot application with all handlers
         
-        # Create application
-        application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        Args:
+            polling: Attach an updater for long polling
+            
+        Returns:
+            telegram.ext.Application
+        """
+        builder = (
+            Application.builder()
+            .token(Config.TELEGRAM_BOT_TOKEN)
+            .base_url(f"{Config.TELEGRAM_API_BASE.rstrip('/')}/bot")
+            .concurrent_updates(Config.TELEGRAM_CONCURRENT_UPDATES)
+            .post_init(self._post_init)
+            .post_stop(self._post_stop)
+        )
+        if not polling:
+            builder = builder.updater(None)
+        application = builder.build()
         
         # Add handlers
         application.add_handler(CommandHandler("start", self.start_command))
@@ -420,6 +483,7 @@ Available commands:
         application.add_handler(CommandHandler("status", self.status_command))
         application.add_handler(CommandHandler("report", self.report_command))
         application.add_handler(CommandHandler("settings", self.settings_command))
+        application.add_handler(CommandHandler("broadcast", self.broadcast_command))
         
         # SelfBot handlers
         application.add_handler(CommandHandler("selfbot", self.selfbot_command))
@@ -433,9 +497,45 @@ Available commands:
             self.message_handler
         ))
         
-        logger.info("🤖 Telegram bot starting...")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
-
+        return application
+    
+    def run_webhook(self):
+        """Process updates posted to the API's webhook route (blocks until stopped)"""
+        if not Config.TELEGRAM_WEBHOOK_SECRET:
+            logger.error("TELEGRAM_WEBHOOK_SECRET is required in webhook mode")
+            return
+        
+        dispatcher = WebhookDispatcher(
+            self.build_application(polling=False),
+            workers=Config.TELEGRAM_WEBHOOK_WORKERS,
+            max_pending=Config.TELEGRAM_WEBHOOK_MAX_PENDING
+        )
+        logger.info("🤖 Telegram bot starting in webhook mode...")
+        dispatcher.start(Config.TELEGRAM_WEBHOOK_URL or None, Config.TELEGRAM_WEBHOOK_SECRET)
+        try:
+            dispatcher.wait()
+        finally:
+            dispatcher.stop()
+    
+    def run(self):
+        """Run the Telegram bot (long polling or webhook, per TELEGRAM_MODE)"""
+        try:
+            Config.validate()
+        except ValueError as e:
+            logger.error(f"Configuration error: {e}")
+            return
+        
+        try:
+            if Config.TELEGRAM_MODE == 'webhook':
+                self.run_webhook()
+            else:
+                application = self.build_application()
+                logger.info("🤖 Telegram bot starting...")
+                application.run_polling(allowed_updates=Update.ALL_TYPES)
+        finally:
+            self.executor.shutdown(wait=False)
+            if self._selfbot_data is not None:
+                self._selfbot_data.close()
 
 if __name__ == '__main__':
     bot = TelegramBot()
@@ -0,0 +1,206 @@
+"""
+Telegram webhook ingestion for the Earning Robot.
+Telegram POSTs updates to the Flask API (`/api/telegram/webhook`); the
+dispatcher hands them to a private asyncio loop where N workers run the
+bot's handlers. Updates are sharded by chat ID, so each chat's updates are
+processed in arrival order by one worker while different chats proceed in
+parallel. The application's `post_init`/`post_stop` hooks run as they
+would with long polling.
+"""
+from telegram import Update
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+_active_dispatcher = None
+
+
+def get_webhook_dispatcher():
+    """The dispatcher running in this process, or None"""
+    return _active_dispatcher
+
+
+def shard_key(data):
+    """
+    Chat ID an update belongs to (used for ordering)
+
+    Args:
+        data: Update JSON from Telegram
+
+    Returns:
+        Chat ID, else the sender ID, else the update ID
+    """
+    for field in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        message = data.get(field)
+        if message and message.get('chat'):
+            return message['chat']['id']
+    callback = data.get('callback_query')
+    if callback:
+        message = callback.get('message') or {}
+        if message.get('chat'):
+            return message['chat']['id']
+        return callback['from']['id']
+    for value in data.values():
+        if isinstance(value, dict) and isinstance(value.get('from'), dict):
+            return value['from']['id']
+    return data.get('update_id', 0)
+
+
+class WebhookDispatcher:
+    """Process webhook updates on a background event loop
+
+    Args:
+        application: python-telegram-bot Application built without an updater
+        workers: Number of worker coroutines (shards)
+        max_pending: Updates accepted but not yet processed before `submit` refuses more
+    """
+
+    def __init__(self, application, workers=4, max_pending=1000):
+        self.application = application
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.stats = {'received': 0, 'processed': 0, 'failed': 0, 'rejected': 0}
+
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._loop = None
+        self._queues = []
+        self._thread = None
+        self._ready = threading.Event()
+        self._startup_error = None
+
+    def start(self, webhook_url=None, secret_token=None, timeout=30):
+        """
+        Start the worker loop and register the dispatcher for this process
+
+        Args:
+            webhook_url: If given, register it with Telegram (`setWebhook`)
+            secret_token: Secret Telegram sends back in `X-Telegram-Bot-Api-Secret-Token`
+            timeout: Seconds to wait for the application to initialize
+        """
+        global _active_dispatcher
+        self._thread = threading.Thread(
+            target=self._run, args=(webhook_url, secret_token),
+            name='telegram-webhook', daemon=True
+        )
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self._startup_error:
+            raise self._startup_error
+        _active_dispatcher = self
+        logger.info(f"🤖 Telegram webhook dispatcher started with {self.workers} workers")
+        return self
+
+    def submit(self, data):
+        """
+        Queue one update (thread-safe; called from request handlers)
+
+        Args:
+            data: Update JSON from Telegram
+
+        Returns:
+            True if queued, False if the dispatcher is stopped or full
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats['rejected'] += 1
+                return False
+            self._pending += 1
+            self.stats['received'] += 1
+
+        queue = self._queues[hash(shard_key(data)) % self.workers]
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, data)
+        except RuntimeError:
+            # Loop closed between the check and the call
+            self._done()
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every queued update was processed; returns True if drained"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def wait(self):
+        """Block until the dispatcher stops"""
+        while self._thread.is_alive():
+            self._thread.join(1)
+
+    def stop(self, timeout=30):
+        """Finish queued updates, then stop the workers and the application"""
+        global _active_dispatcher
+        if _active_dispatcher is self:
+            _active_dispatcher = None
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        for queue in self._queues:
+            loop.call_soon_threadsafe(queue.put_nowait, _STOP)
+        self._thread.join(timeout)
+
+    def _done(self):
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
+
+    def _run(self, webhook_url, secret_token):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._main(webhook_url, secret_token))
+        except Exception as e:
+            self._startup_error = self._startup_error or e
+            logger.error(f"Telegram webhook dispatcher failed: {e}")
+        finally:
+            self._ready.set()
+            loop.close()
+
+    async def _main(self, webhook_url, secret_token):
+        await self.application.initialize()
+        if self.application.post_init:
+            await self.application.post_init(self.application)
+        await self.application.start()
+        try:
+            if webhook_url:
+                await self.application.bot.set_webhook(
+                    url=webhook_url,
+                    secret_token=secret_token or None,
+                    allowed_updates=Update.ALL_TYPES
+                )
+                logger.info(f"Telegram webhook set to {webhook_url}")
+
+            self._queues = [asyncio.Queue() for _ in range(self.workers)]
+            self._loop = asyncio.get_running_loop()
+            self._ready.set()
+            await asyncio.gather(*(self._worker(queue) for queue in self._queues))
+        finally:
+            self._loop = None
+            await self.application.stop()
+            if self.application.post_stop:
+                await self.application.post_stop(self.application)
+            await self.application.shutdown()
+
+    async def _worker(self, queue):
+        """Process one shard's updates in order until told to stop"""
+        while True:
+            data = await queue.get()
+            if data is _STOP:
+                return
+            try:
+                update = Update.de_json(data, self.application.bot)
+                await self.application.process_update(update)
+                self.stats['processed'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"Error processing Telegram update {data.get('update_id')}: {e}")
+            finally:
+                self._done()
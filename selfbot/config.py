@@ -13,6 +13,9 @@ class SelfBotConfig:
     # Scanner settings
     SCAN_INTERVAL = int(os.getenv('SELFBOT_SCAN_INTERVAL', '300'))  # 5 minutes
     RSS_FEEDS = [f for f in os.getenv('SELFBOT_RSS_FEEDS', '').split(',') if f.strip()] or []
+    SCAN_WORKERS = int(os.getenv('SELFBOT_SCAN_WORKERS', '8'))  # sources scanned at once
+    SCAN_TIMEOUT = float(os.getenv('SELFBOT_SCAN_TIMEOUT', '20'))  # seconds per source
+    SCAN_CYCLE_TIMEOUT = float(os.getenv('SELFBOT_SCAN_CYCLE_TIMEOUT', '60'))  # seconds for the whole scan stage
     
     # Finance settings
     INITIAL_BUDGET = float(os.getenv('SELFBOT_INITIAL_BUDGET', '10.00'))
@@ -34,6 +37,7 @@ class SelfBotConfig:
     
     # Database
     DATABASE_PATH = os.getenv('SELFBOT_DATABASE_PATH', 'data/selfbot.db')
+    STATS_CACHE_TTL = float(os.getenv('SELFBOT_STATS_CACHE_TTL', '15'))  # seconds, owner command stats
     
     # Learning
     ENABLE_LEARNING = os.getenv('SELFBOT_ENABLE_LEARNING', 'true').lower() == 'true'
@@ -6,7 +6,8 @@ from .models import (
     Opportunity,
     GeneratedContent,
     PublishResult,
-    LearningRecord
+    LearningRecord,
+    FeedState
 )
 
 __all__ = [
@@ -14,5 +15,6 @@ __all__ = [
     'Opportunity',
     'GeneratedContent',
     'PublishResult',
-    'LearningRecord'
+    'LearningRecord',
+    'FeedState'
 ]
@@ -1,16 +1,25 @@
 """
 Database models for SelfEarnBot.
-Stores opportunities, generated content, publish results, and learning data.
+Stores opportunities, generated content, publish results, learning data,
+and per-feed scanner state.
 """
 from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from backend.blob_store import PREVIEW_LENGTH, BlobText, define_blob_table, install_blob_store, migrate_inline_text, sweep_blobs
+from backend.money import money_column, money_property
 from datetime import datetime
 import os
 import json
 
 Base = declarative_base()
 
+# Generated articles/code are stored once, compressed, keyed by hash
+content_blobs = define_blob_table(Base.metadata)
+
+# Columns holding content_blobs hashes
+BLOB_REFERENCES = [('selfbot_generated_content', 'content_hash')]
+
 
 class Opportunity(Base):
     """Opportunity found by scanners"""
@@ -56,7 +65,10 @@ class GeneratedContent(Base):
     opportunity_id = Column(Integer, nullable=True)
     content_type = Column(String(50))
     title = Column(String(500))
-    content = Column(Text)
+    content_hash = Column(String(64), nullable=True, index=True)
+    content_size = Column(Integer, nullable=True)  # Bytes before compression
+    content_preview = Column(String(PREVIEW_LENGTH), nullable=True)
+    content = BlobText('content', content_blobs)
     ai_provider = Column(String(20))
     tokens_used = Column(Integer, default=0)
     generation_cost = Column(Float, default=0.0)
@@ -88,9 +100,12 @@ class PublishResult(Base):
     platform = Column(String(100))
     platform_url = Column(String(500), nullable=True)
     status = Column(String(20))  # submitted, accepted, rejected, earning
-    actual_revenue = Column(Float, default=0.0)
-    actual_cost = Column(Float, default=0.0)
-    actual_profit = Column(Float, default=0.0)
+    actual_revenue_micros = money_column()  # USD micro-units
+    actual_cost_micros = money_column()
+    actual_profit_micros = money_column()
+    actual_revenue = money_property('actual_revenue_micros')
+    actual_cost = money_property('actual_cost_micros')
+    actual_profit = money_property('actual_profit_micros')
     roi = Column(Float, default=0.0)  # Return on Investment
     feedback = Column(Text, nullable=True)
     published_at = Column(DateTime, default=datetime.utcnow)
@@ -136,6 +151,20 @@ class LearningRecord(Base):
         }
 
 
+class FeedState(Base):
+    """What RSSScanner last saw in a feed (for conditional, incremental fetches)"""
+    __tablename__ = 'selfbot_feed_state'
+    
+    id = Column(Integer, primary_key=True)
+    feed_url = Column(String(500), unique=True, index=True)
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(100), nullable=True)
+    seen_ids = Column(JSON, nullable=True)  # Most recent entry IDs, newest first
+    last_entry_at = Column(DateTime, nullable=True)  # Newest entry timestamp seen
+    last_fetched_at = Column(DateTime, nullable=True)  # Last full (200) fetch
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class SelfBotDatabase:
     """Database connection manager for SelfBot"""
     
@@ -156,8 +185,21 @@ class SelfBotDatabase:
         # Create tables
         Base.metadata.create_all(self.engine)
         
+        # Upgrade tables created by older versions
+        from backend.migrations import upgrade_schema, migrate_money_columns
+        upgrade_schema(self.engine, Base.metadata)
+        migrate_money_columns(self.engine, {
+            'selfbot_publish_results': {
+                'actual_revenue': 'actual_revenue_micros',
+                'actual_cost': 'actual_cost_micros',
+                'actual_profit': 'actual_profit_micros',
+            },
+        })
+        migrate_inline_text(self.engine, 'selfbot_generated_content', {'content': 'content'}, content_blobs)
+        
         # Create session factory
         self.Session = sessionmaker(bind=self.engine)
+        install_blob_store(self.Session)
         
         return self
     
@@ -167,6 +209,10 @@ class SelfBotDatabase:
             self.initialize()
         return self.Session()
     
+    def sweep_blobs(self):
+        """Delete stored content no longer referenced; returns the count"""
+        return sweep_blobs(self.engine, content_blobs, BLOB_REFERENCES)
+    
     def close(self):
         """Close database connection"""
         if self.engine:
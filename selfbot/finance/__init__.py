@@ -4,9 +4,11 @@ Finance module for SelfEarnBot.
 from .tracker import FinanceTracker
 from .reinvestor import AutoReinvestor
 from .reports import SelfBotReports
+from .service import SelfBotDataService
 
 __all__ = [
     'FinanceTracker',
     'AutoReinvestor',
-    'SelfBotReports'
+    'SelfBotReports',
+    'SelfBotDataService'
 ]
@@ -1,13 +1,25 @@
 """
 SelfBot-specific financial reports.
+Counts and money totals are aggregated in SQL, so report cost does not
+grow with the number of stored rows.
 """
 from typing import Dict
 from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from backend.money import to_float
 from selfbot.database.models import PublishResult, GeneratedContent, Opportunity
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Publish statuses counted as a successful operation
+SUCCESS_STATUSES = ('accepted', 'earning', 'published')
+
+
+def _count_where(condition):
+    """SQL expression counting rows that match `condition`"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
 
 class SelfBotReports:
     """Generates financial and performance reports for SelfBot"""
@@ -26,24 +38,32 @@ class SelfBotReports:
         # Get recent data (last 24 hours)
         since = datetime.utcnow() - timedelta(hours=24)
         
-        opportunities = self.session.query(Opportunity).filter(
-            Opportunity.created_at >= since
-        ).all()
-        
-        content = self.session.query(GeneratedContent).filter(
-            GeneratedContent.created_at >= since
-        ).all()
-        
-        results = self.session.query(PublishResult).filter(
-            PublishResult.published_at >= since
-        ).all()
+        opportunities, evaluated, selected = self.session.query(
+            func.count(Opportunity.id),
+            _count_where(Opportunity.status == 'evaluated'),
+            _count_where(Opportunity.status == 'selected')
+        ).filter(Opportunity.created_at >= since).one()
+        
+        content, approved, avg_quality, total_tokens = self.session.query(
+            func.count(GeneratedContent.id),
+            _count_where(GeneratedContent.status == 'approved'),
+            func.avg(func.coalesce(GeneratedContent.quality_score, 0.0)),
+            func.coalesce(func.sum(GeneratedContent.tokens_used), 0)
+        ).filter(GeneratedContent.created_at >= since).one()
+        
+        submitted, successful, revenue_micros, cost_micros = self.session.query(
+            func.count(PublishResult.id),
+            _count_where(PublishResult.status.in_(SUCCESS_STATUSES)),
+            func.coalesce(func.sum(PublishResult.actual_revenue_micros), 0),
+            func.coalesce(func.sum(PublishResult.actual_cost_micros), 0)
+        ).filter(PublishResult.published_at >= since).one()
         
         # Calculate metrics
-        total_revenue = sum(r.actual_revenue for r in results)
-        total_cost = sum(r.actual_cost for r in results)
-        total_profit = total_revenue - total_cost
-        
-        successful = [r for r in results if r.status in ['accepted', 'earning', 'published']]
+        total_revenue = to_float(revenue_micros)
+        total_cost = to_float(cost_micros)
+        total_profit = to_float(revenue_micros - cost_micros)
+        success_rate = f"{successful / submitted * 100:.1f}%" if submitted else "0.0%"
+        roi = f"{(revenue_micros - cost_micros) / cost_micros * 100:.1f}%" if cost_micros > 0 else 'N/A'
         
         report = f"""
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -51,26 +71,26 @@ class SelfBotReports:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 📊 OPPORTUNITIES
-├─ Discovered: {len(opportunities)}
-├─ Evaluated: {sum(1 for o in opportunities if o.status == 'evaluated')}
-└─ Selected: {sum(1 for o in opportunities if o.status == 'selected')}
+├─ Discovered: {opportunities}
+├─ Evaluated: {evaluated}
+└─ Selected: {selected}
 
 ✍️ CONTENT GENERATION
-├─ Generated: {len(content)}
-├─ Approved: {sum(1 for c in content if c.status == 'approved')}
-├─ Average Quality: {(sum(c.quality_score or 0 for c in content) / len(content)):.2f if content else 0.00}
-└─ Total Tokens: {sum(c.tokens_used for c in content)}
+├─ Generated: {content}
+├─ Approved: {approved}
+├─ Average Quality: {avg_quality or 0.0:.2f}
+└─ Total Tokens: {total_tokens}
 
 📤 PUBLISHING
-├─ Submitted: {len(results)}
-├─ Successful: {len(successful)}
-└─ Success Rate: {(len(successful) / len(results) * 100):.1f}% if results else 0.0%
+├─ Submitted: {submitted}
+├─ Successful: {successful}
+└─ Success Rate: {success_rate}
 
 💰 FINANCIALS
 ├─ Revenue: ${total_revenue:.2f}
 ├─ Costs: ${total_cost:.2f}
 ├─ Profit: ${total_profit:.2f}
-└─ ROI: {(total_profit / total_cost * 100):.1f}% if total_cost > 0 else 'N/A'
+└─ ROI: {roi}
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 """
@@ -83,24 +103,27 @@ class SelfBotReports:
         Returns:
             Dictionary with key metrics
         """
-        # All-time stats
-        all_results = self.session.query(PublishResult).all()
-        all_content = self.session.query(GeneratedContent).all()
-        all_opps = self.session.query(Opportunity).all()
+        # All-time stats, aggregated in SQL
+        published, revenue_micros, cost_micros = self.session.query(
+            func.count(PublishResult.id),
+            func.coalesce(func.sum(PublishResult.actual_revenue_micros), 0),
+            func.coalesce(func.sum(PublishResult.actual_cost_micros), 0)
+        ).one()
+        content_count = self.session.query(func.count(GeneratedContent.id)).scalar()
+        opportunity_count = self.session.query(func.count(Opportunity.id)).scalar()
         
-        total_revenue = sum(r.actual_revenue for r in all_results)
-        total_cost = sum(r.actual_cost for r in all_results)
+        profit_micros = revenue_micros - cost_micros
         
         return {
-            'total_opportunities': len(all_opps),
-            'total_content_generated': len(all_content),
-            'total_published': len(all_results),
-            'total_revenue': round(total_revenue, 2),
-            'total_cost': round(total_cost, 2),
-            'total_profit': round(total_revenue - total_cost, 2),
+            'total_opportunities': opportunity_count,
+            'total_content_generated': content_count,
+            'total_published': published,
+            'total_revenue': to_float(revenue_micros, 2),
+            'total_cost': to_float(cost_micros, 2),
+            'total_profit': to_float(profit_micros, 2),
             'average_profit_per_operation': round(
-                (total_revenue - total_cost) / len(all_results), 2
-            ) if all_results else 0
+                to_float(profit_micros) / published, 2
+            ) if published else 0
         }
     
     def get_top_performing_content_types(self, limit: int = 3) -> list:
@@ -113,29 +136,15 @@ class SelfBotReports:
         Returns:
             List of (content_type, avg_profit) tuples
         """
-        results = self.session.query(PublishResult).all()
-        
-        # Group by content type
-        type_profits = {}
-        type_counts = {}
-        
-        for result in results:
-            content = self.session.query(GeneratedContent).filter_by(
-                id=result.content_id
-            ).first()
-            
-            if content:
-                ctype = content.content_type
-                type_profits[ctype] = type_profits.get(ctype, 0) + result.actual_profit
-                type_counts[ctype] = type_counts.get(ctype, 0) + 1
-        
-        # Calculate averages
-        avg_profits = [
-            (ctype, type_profits[ctype] / type_counts[ctype])
-            for ctype in type_profits
-        ]
-        
-        # Sort and limit
-        top = sorted(avg_profits, key=lambda x: x[1], reverse=True)[:limit]
-        
-        return top
+        avg_profit = func.avg(PublishResult.actual_profit_micros)
+        rows = self.session.query(
+            GeneratedContent.content_type, avg_profit
+        ).join(
+            GeneratedContent, GeneratedContent.id == PublishResult.content_id
+        ).group_by(
+            GeneratedContent.content_type
+        ).order_by(
+            avg_profit.desc()
+        ).limit(limit).all()
+        
+        return [(ctype, to_float(micros)) for ctype, micros in rows]
@@ -0,0 +1,77 @@
+"""
+Long-lived SelfBot data access for the Telegram owner commands.
+Keeps one SelfBot database engine for the life of the bot and serves the
+report aggregates from a short-TTL cache, so repeated /selfbot_* commands
+neither rebuild the engine nor re-query the database.
+"""
+import threading
+from typing import Dict, List, Optional
+from backend.cache import TTLCache
+from selfbot.config import SelfBotConfig
+from selfbot.database import SelfBotDatabase
+from selfbot.finance.reports import SelfBotReports
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SelfBotDataService:
+    """Cached read access to SelfBot statistics
+    
+    Args:
+        db_path: SelfBot database path (defaults to SelfBotConfig.DATABASE_PATH)
+        ttl: Seconds an aggregate stays cached (defaults to SelfBotConfig.STATS_CACHE_TTL)
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[float] = None):
+        self.db_path = db_path or SelfBotConfig.DATABASE_PATH
+        self.cache = TTLCache(ttl=ttl if ttl is not None else SelfBotConfig.STATS_CACHE_TTL, max_entries=64)
+        self._db = None
+        self._lock = threading.Lock()
+    
+    @property
+    def db(self) -> SelfBotDatabase:
+        """SelfBot database, initialized on first use"""
+        with self._lock:
+            if self._db is None:
+                self._db = SelfBotDatabase(self.db_path).initialize()
+            return self._db
+    
+    def summary_stats(self) -> Dict:
+        """All-time totals (see SelfBotReports.generate_summary_stats)"""
+        return self._cached(('summary',), lambda reports: reports.generate_summary_stats())
+    
+    def top_content_types(self, limit: int = 3) -> List:
+        """Best content types by average profit"""
+        return self._cached(
+            ('top_content_types', limit),
+            lambda reports: reports.get_top_performing_content_types(limit=limit)
+        )
+    
+    def cycle_report(self) -> str:
+        """Formatted report for the last 24 hours"""
+        return self._cached(('cycle_report',), lambda reports: reports.generate_cycle_report())
+    
+    def invalidate(self):
+        """Drop every cached aggregate"""
+        self.cache.clear()
+    
+    def close(self):
+        """Release the database engine"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        self.cache.clear()
+    
+    def _cached(self, key, compute):
+        """Return the cached value for `key`, computing it in a fresh session on a miss"""
+        value = self.cache.get(key)
+        if value is None:
+            session = self.db.get_session()
+            try:
+                value = compute(SelfBotReports(session))
+            finally:
+                session.close()
+            self.cache.set(key, value)
+        return value
@@ -4,7 +4,10 @@ Tracks all revenue, costs, and profits.
 """
 from typing import Dict, Optional
 from datetime import datetime
+from sqlalchemy import case, func
+from backend.money import to_float
 from selfbot.database.models import PublishResult
+from selfbot.finance.reports import SUCCESS_STATUSES
 import logging
 
 logger = logging.getLogger(__name__)
@@ -76,27 +79,29 @@ class FinanceTracker:
         Returns:
             Summary dictionary
         """
-        query = self.session.query(PublishResult)
+        successful = PublishResult.status.in_(SUCCESS_STATUSES)
+        query = self.session.query(
+            func.count(PublishResult.id),
+            func.coalesce(func.sum(PublishResult.actual_revenue_micros), 0),
+            func.coalesce(func.sum(PublishResult.actual_cost_micros), 0),
+            func.coalesce(func.sum(PublishResult.actual_profit_micros), 0),
+            func.coalesce(func.sum(case((successful, 1), else_=0)), 0),
+            func.avg(case((successful, PublishResult.roi)))
+        )
         
         if since:
             query = query.filter(PublishResult.published_at >= since)
         
-        results = query.all()
-        
-        total_revenue = sum(r.actual_revenue for r in results)
-        total_cost = sum(r.actual_cost for r in results)
-        total_profit = sum(r.actual_profit for r in results)
-        
-        successful = [r for r in results if r.status in ['accepted', 'earning', 'published']]
+        total, revenue_micros, cost_micros, profit_micros, successful_count, average_roi = query.one()
         
         return {
-            'total_revenue': round(total_revenue, 2),
-            'total_cost': round(total_cost, 2),
-            'total_profit': round(total_profit, 2),
-            'total_operations': len(results),
-            'successful_operations': len(successful),
-            'success_rate': round(len(successful) / len(results), 2) if results else 0,
-            'average_roi': round(sum(r.roi for r in successful) / len(successful), 2) if successful else 0,
+            'total_revenue': to_float(revenue_micros, 2),
+            'total_cost': to_float(cost_micros, 2),
+            'total_profit': to_float(profit_micros, 2),
+            'total_operations': total,
+            'successful_operations': successful_count,
+            'success_rate': round(successful_count / total, 2) if total else 0,
+            'average_roi': round(average_roi or 0, 2) if successful_count else 0,
             'current_budget': round(self.current_budget, 2)
         }
     
@@ -9,7 +9,7 @@ from typing import Dict, List
 
 from selfbot.config import SelfBotConfig
 from selfbot.database import SelfBotDatabase, Opportunity, GeneratedContent, PublishResult
-from selfbot.scanner import RSSScanner, FreelanceScanner, ContentMarketScanner
+from selfbot.scanner import RSSScanner, FreelanceScanner, ContentMarketScanner, ScanRunner, ScanBatch, FeedStateStore
 from selfbot.generator import ArticleGenerator, CodeGenerator
 from selfbot.publisher import FreelancePublisher, PlatformPublisher
 from selfbot.brain import DecisionEngine
@@ -48,13 +48,16 @@ class SelfEarnBot:
         # Initialize database
         self.db = SelfBotDatabase(SelfBotConfig.DATABASE_PATH).initialize()
         self.session = self.db.get_session()
+        # Content of deleted or regenerated items
+        self.db.sweep_blobs()
         
         # Initialize scanners
         self.scanners = [
-            RSSScanner(SelfBotConfig.RSS_FEEDS),
+            RSSScanner(SelfBotConfig.RSS_FEEDS, FeedStateStore(self.db)),
             FreelanceScanner(),
             ContentMarketScanner()
         ]
+        self.scan_runner = ScanRunner()
         
         # Initialize AI manager and generators
         self.ai_manager = AIManager()
@@ -168,31 +171,36 @@ class SelfEarnBot:
     def _scan_opportunities(self) -> List[Dict]:
         """Scan all sources for opportunities"""
         all_opportunities = []
+        batches = []
         
-        for scanner in self.scanners:
-            if scanner.is_enabled():
-                try:
-                    opps = scanner.scan()
-                    all_opportunities.extend(opps)
-                    logger.info(f"  {scanner.name}: found {len(opps)} opportunities")
-                except Exception as e:
-                    logger.error(f"Error in {scanner.name}: {e}")
-        
-        # Save to database
-        for opp_data in all_opportunities:
-            opp = Opportunity(
-                source=opp_data['source'],
-                source_url=opp_data.get('source_url'),
-                title=opp_data['title'],
-                description=opp_data['description'],
-                content_type=opp_data['content_type'],
-                estimated_revenue=opp_data.get('estimated_revenue', 0),
-                requirements=opp_data.get('requirements', {})
-            )
-            self.session.add(opp)
+        # Sources run concurrently; results are saved as each one finishes
+        for source, opps in self.scan_runner.run(self.scanners):
+            logger.info(f"  {source}: found {len(opps)} opportunities")
+            all_opportunities.extend(opps)
+            if isinstance(opps, ScanBatch):
+                batches.append(opps)
+            
+            for opp_data in opps:
+                opp = Opportunity(
+                    source=opp_data['source'],
+                    source_url=opp_data.get('source_url'),
+                    title=opp_data['title'],
+                    description=opp_data['description'],
+                    content_type=opp_data['content_type'],
+                    estimated_revenue=opp_data.get('estimated_revenue', 0),
+                    requirements=opp_data.get('requirements', {})
+                )
+                self.session.add(opp)
         
         self.session.commit()
         
+        # Only now may scanners mark what they emitted as seen
+        for batch in batches:
+            try:
+                batch.saved()
+            except Exception as e:
+                logger.error(f"Error recording scanner state: {e}")
+        
         return all_opportunities
     
     def _process_opportunity(self, opportunity: Dict) -> Dict:
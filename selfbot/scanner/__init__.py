@@ -1,14 +1,19 @@
 """
 Opportunity Scanner module for SelfEarnBot.
 """
-from .base import BaseScanner
+from .base import BaseScanner, ScanBatch
 from .rss_monitor import RSSScanner
 from .freelance import FreelanceScanner
 from .content_markets import ContentMarketScanner
+from .runner import ScanRunner
+from .feed_state import FeedStateStore
 
 __all__ = [
     'BaseScanner',
+    'ScanBatch',
     'RSSScanner',
     'FreelanceScanner',
-    'ContentMarketScanner'
+    'ContentMarketScanner',
+    'ScanRunner',
+    'FeedStateStore'
 ]
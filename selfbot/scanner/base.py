@@ -3,12 +3,31 @@ Base scanner class for opportunity detection.
 All scanners should inherit from this class.
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class ScanBatch(list):
+    """Opportunities from one source, with a callback for once they are saved
+    
+    Scanners that remember what they have emitted (e.g. RSS feed state)
+    return a ScanBatch and record their progress in `on_saved`; the cycle
+    calls `saved()` only after the opportunities are committed, so a
+    failed commit or an abandoned source leaves nothing marked as seen.
+    """
+    
+    def __init__(self, opportunities=(), on_saved: Optional[Callable[[], None]] = None):
+        super().__init__(opportunities)
+        self.on_saved = on_saved
+    
+    def saved(self):
+        """Record that the opportunities were persisted"""
+        if self.on_saved:
+            self.on_saved()
+
+
 class BaseScanner(ABC):
     """Base class for all opportunity scanners"""
     
@@ -34,6 +53,19 @@ class BaseScanner(ABC):
         """
         pass
     
+    def sources(self) -> List[Tuple[str, Callable[[], List[Dict]]]]:
+        """
+        Independent units of scanning work.
+        
+        The ScanRunner runs every source on its own worker with its own
+        timeout. Scanners that query several endpoints can return one
+        source per endpoint so a slow endpoint only costs its own results.
+        
+        Returns:
+            List of (source name, callable returning opportunities)
+        """
+        return [(self.name, self.scan)]
+    
     def is_enabled(self) -> bool:
         """Check if scanner is enabled"""
         return self.enabled
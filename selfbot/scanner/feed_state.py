@@ -0,0 +1,110 @@
+"""
+Per-feed state for incremental RSS scanning.
+Remembers each feed's validators (ETag, Last-Modified), the IDs of its most
+recent entries and the newest entry timestamp, persisted in the SelfBot
+database. RSSScanner sends the validators with every fetch and only emits
+entries it has not seen, so an unchanged feed costs one 304 response.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from selfbot.database import FeedState
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Entry IDs remembered per feed (feeds rarely carry more than 50 entries)
+MAX_SEEN_IDS = 200
+
+
+class FeedStateStore:
+    """Thread-safe read/write access to FeedState rows, cached in memory"""
+    
+    def __init__(self, db, max_seen_ids: int = MAX_SEEN_IDS):
+        """
+        Initialize the store.
+        
+        Args:
+            db: Initialized SelfBotDatabase (file-backed when used from worker threads)
+            max_seen_ids: Entry IDs kept per feed
+        """
+        self.db = db
+        self.max_seen_ids = max_seen_ids
+        self._states = {}
+        self._lock = threading.Lock()
+    
+    def get(self, feed_url: str) -> Dict:
+        """
+        State of a feed.
+        
+        Args:
+            feed_url: Feed URL
+            
+        Returns:
+            Dict with etag, last_modified, seen_ids (list, newest first) and
+            last_entry_at; empty values for a feed never fetched
+        """
+        with self._lock:
+            state = self._states.get(feed_url)
+        if state is not None:
+            return state
+        
+        session = self.db.get_session()
+        try:
+            row = session.query(FeedState).filter_by(feed_url=feed_url).first()
+            state = {
+                'etag': row.etag if row else None,
+                'last_modified': row.last_modified if row else None,
+                'seen_ids': list(row.seen_ids or []) if row else [],
+                'last_entry_at': row.last_entry_at if row else None,
+            }
+        finally:
+            session.close()
+        
+        with self._lock:
+            return self._states.setdefault(feed_url, state)
+    
+    def save(self, feed_url: str, etag: Optional[str], last_modified: Optional[str],
+             new_ids: Iterable[str], last_entry_at: Optional[datetime] = None) -> Dict:
+        """
+        Record a full fetch of a feed.
+        
+        Args:
+            feed_url: Feed URL
+            etag: ETag response header
+            last_modified: Last-Modified response header
+            new_ids: IDs of entries seen for the first time, newest first
+            last_entry_at: Newest entry timestamp in the fetch
+            
+        Returns:
+            The updated state
+        """
+        previous = self.get(feed_url)
+        seen_ids = list(dict.fromkeys(list(new_ids) + previous['seen_ids']))[:self.max_seen_ids]
+        if previous['last_entry_at'] and (last_entry_at is None or last_entry_at < previous['last_entry_at']):
+            last_entry_at = previous['last_entry_at']
+        state = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'seen_ids': seen_ids,
+            'last_entry_at': last_entry_at,
+        }
+        
+        session = self.db.get_session()
+        try:
+            row = session.query(FeedState).filter_by(feed_url=feed_url).first()
+            if row is None:
+                row = FeedState(feed_url=feed_url)
+                session.add(row)
+            row.etag = etag
+            row.last_modified = last_modified
+            row.seen_ids = seen_ids
+            row.last_entry_at = last_entry_at
+            row.last_fetched_at = datetime.utcnow()
+            session.commit()
+        finally:
+            session.close()
+        
+        with self._lock:
+            self._states[feed_url] = state
+        return state
@@ -1,54 +1,168 @@
 """
 RSS Feed Monitor for finding content opportunities.
-Monitors RSS feeds for content requests and opportunities.
+Monitors RSS feeds for content requests and opportunities. With a
+FeedStateStore, fetches are conditional and only unseen entries are emitted;
+feed state advances once the emitted opportunities are saved.
 """
-from .base import BaseScanner
-from typing import List, Dict
+from .base import BaseScanner, ScanBatch
+from typing import Callable, List, Dict, Optional, Tuple
+from datetime import datetime
 import feedparser
 import logging
 import random
+import requests
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) timeouts in seconds; feedparser.parse(url) has none
+FETCH_TIMEOUT = (5, 15)
+
+# New entries emitted per feed fetch
+MAX_ENTRIES_PER_FEED = 10
+
+_http = requests.Session()
+
 
 class RSSScanner(BaseScanner):
     """Scans RSS feeds for content opportunities"""
     
-    def __init__(self, feed_urls: List[str] = None):
+    def __init__(self, feed_urls: List[str] = None, state_store=None):
+        """
+        Initialize the scanner.
+        
+        Args:
+            feed_urls: RSS/Atom feed URLs (none = demo mode)
+            state_store: FeedStateStore; without one every fetch is full and
+                every entry is emitted
+        """
         super().__init__("RSSScanner")
         self.feed_urls = feed_urls or []
+        self.state_store = state_store
         logger.info(f"RSS Scanner initialized with {len(self.feed_urls)} feeds")
     
     def scan(self) -> List[Dict]:
         """
         Scan RSS feeds for opportunities.
         
+        Feeds are fetched one after another; the ScanRunner fetches them
+        in parallel through `sources()`.
+        
         Returns:
-            List of opportunities found in feeds
+            List of opportunities found in feeds (a ScanBatch whose
+            `saved()` records every feed's state)
         """
-        opportunities = []
-        
         if not self.feed_urls:
             # Demo mode: Generate mock opportunities
             logger.info("No RSS feeds configured, generating demo opportunities")
             return self._generate_demo_opportunities()
         
+        batches = []
         for feed_url in self.feed_urls:
             try:
-                logger.info(f"Scanning RSS feed: {feed_url}")
-                feed = feedparser.parse(feed_url)
-                
-                for entry in feed.entries[:10]:  # Limit to 10 entries per feed
-                    opportunity = self._parse_entry(entry, feed_url)
-                    if opportunity:
-                        opportunities.append(opportunity)
-                        
+                batches.append(self.scan_feed(feed_url))
             except Exception as e:
                 logger.error(f"Error scanning RSS feed {feed_url}: {e}")
         
+        opportunities = ScanBatch(
+            [opp for batch in batches for opp in batch],
+            on_saved=lambda: [batch.saved() for batch in batches]
+        )
         logger.info(f"Found {len(opportunities)} opportunities from RSS feeds")
         return opportunities
     
+    def sources(self) -> List[Tuple[str, Callable[[], List[Dict]]]]:
+        """One source per feed, so feeds are fetched concurrently"""
+        if not self.feed_urls:
+            return super().sources()
+        return [
+            (f"{self.name}:{feed_url}", lambda feed_url=feed_url: self.scan_feed(feed_url))
+            for feed_url in self.feed_urls
+        ]
+    
+    def scan_feed(self, feed_url: str) -> ScanBatch:
+        """
+        Fetch and parse one feed.
+        
+        With a state store the request carries the feed's validators, a 304
+        returns nothing, and entries seen in earlier fetches are skipped.
+        At most MAX_ENTRIES_PER_FEED entries are emitted per fetch; the rest
+        stay unseen and the next fetch is unconditional so they follow.
+        The new validators and entry IDs are stored only when the caller
+        calls `saved()` on the result, after persisting the opportunities;
+        until then the same entries are emitted again.
+        
+        Args:
+            feed_url: RSS/Atom feed URL
+            
+        Returns:
+            ScanBatch of opportunities from the feed's new entries
+            
+        Raises:
+            requests.RequestException: If the feed cannot be fetched
+        """
+        logger.info(f"Scanning RSS feed: {feed_url}")
+        state = self.state_store.get(feed_url) if self.state_store else None
+        headers = {}
+        if state and state['etag']:
+            headers['If-None-Match'] = state['etag']
+        if state and state['last_modified']:
+            headers['If-Modified-Since'] = state['last_modified']
+        
+        resp = _http.get(feed_url, timeout=FETCH_TIMEOUT, headers=headers)
+        if resp.status_code == 304:
+            logger.info(f"RSS feed not modified: {feed_url}")
+            return ScanBatch()
+        resp.raise_for_status()
+        feed = feedparser.parse(resp.content)
+        
+        seen = set(state['seen_ids']) if state else set()
+        last_entry_at = state['last_entry_at'] if state else None
+        new_ids = []
+        newest = None
+        deferred = []
+        opportunities = []
+        for entry in feed.entries:
+            entry_id = self._entry_id(entry)
+            published = self._entry_time(entry)
+            if entry_id not in seen:
+                if len(opportunities) >= MAX_ENTRIES_PER_FEED:
+                    # Over the cap: left unseen for the next cycle
+                    deferred.append(published)
+                    continue
+                new_ids.append(entry_id)
+                # Unseen but older than anything seen before: rotated out of seen_ids
+                if not (published and last_entry_at and published < last_entry_at):
+                    opportunity = self._parse_entry(entry, feed_url)
+                    if opportunity:
+                        opportunities.append(opportunity)
+            if published and (newest is None or published > newest):
+                newest = published
+        
+        on_saved = None
+        if self.state_store:
+            etag, last_modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+            if deferred:
+                # Refetch in full next cycle and keep deferred entries newer than last_entry_at
+                etag = last_modified = None
+                oldest = min((published for published in deferred if published), default=None)
+                if newest and oldest and oldest < newest:
+                    newest = oldest
+            on_saved = lambda: self.state_store.save(feed_url, etag, last_modified, new_ids, newest)
+        if state:
+            logger.info(f"RSS feed {feed_url}: {len(new_ids)} new of {len(feed.entries)} entries")
+        return ScanBatch(opportunities, on_saved)
+    
+    @staticmethod
+    def _entry_id(entry) -> str:
+        """Stable identifier of a feed entry"""
+        return entry.get('id') or entry.get('link') or entry.get('title', '')
+    
+    @staticmethod
+    def _entry_time(entry) -> Optional[datetime]:
+        """Published (or updated) time of a feed entry, if given"""
+        parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+        return datetime(*parsed[:6]) if parsed else None
+    
     def _parse_entry(self, entry, feed_url: str) -> Dict:
         """Parse RSS entry into opportunity"""
         # Extract relevant information
@@ -0,0 +1,120 @@
+"""
+Concurrent scanning stage for SelfEarnBot.
+Runs every enabled scanner's sources on a bounded thread pool and yields
+results as each source finishes. A source running longer than its timeout
+is abandoned (its thread finishes in the background), and the whole stage
+stops waiting at the cycle timeout, so one slow feed cannot stall a cycle.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterator, List, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for queued sources that have started
+QUEUED_POLL_INTERVAL = 0.5
+
+
+class ScanRunner:
+    """Run scanner sources concurrently with per-source timeouts"""
+    
+    def __init__(self, workers: int = None, timeout: float = None, cycle_timeout: float = None):
+        """
+        Initialize the runner.
+        
+        Args:
+            workers: Maximum sources scanned at once
+            timeout: Seconds a source may run once started
+            cycle_timeout: Seconds the whole stage may take
+        """
+        from selfbot.config import SelfBotConfig
+        
+        self.workers = max(1, workers or SelfBotConfig.SCAN_WORKERS)
+        self.timeout = timeout or SelfBotConfig.SCAN_TIMEOUT
+        self.cycle_timeout = cycle_timeout or SelfBotConfig.SCAN_CYCLE_TIMEOUT
+        self.stats = {'completed': 0, 'failed': 0, 'timed_out': 0}
+    
+    def run(self, scanners) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Scan all enabled scanners.
+        
+        Args:
+            scanners: Scanner instances
+            
+        Yields:
+            (source name, opportunities) in completion order; failed and
+            timed-out sources yield nothing
+        """
+        sources = []
+        for scanner in scanners:
+            if scanner.is_enabled():
+                sources.extend(scanner.sources())
+        if not sources:
+            return
+        
+        started = {}
+        started_lock = threading.Lock()
+        
+        def call(index, func):
+            with started_lock:
+                started[index] = time.monotonic()
+            return func()
+        
+        pool = ThreadPoolExecutor(
+            max_workers=min(self.workers, len(sources)),
+            thread_name_prefix='selfbot-scan'
+        )
+        try:
+            futures = {
+                pool.submit(call, index, func): (index, name)
+                for index, (name, func) in enumerate(sources)
+            }
+            pending = set(futures)
+            deadline = time.monotonic() + self.cycle_timeout
+            
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    for future in pending:
+                        self._abandon(futures[future][1], 'scan cycle timeout')
+                    break
+                
+                # Drop sources that have run past their own timeout
+                wake_at = deadline
+                with started_lock:
+                    for future in list(pending):
+                        index, name = futures[future]
+                        if future.done():
+                            continue
+                        if index not in started:
+                            # Queued: may start when an abandoned source's thread frees up
+                            wake_at = min(wake_at, now + QUEUED_POLL_INTERVAL)
+                            continue
+                        expires_at = started[index] + self.timeout
+                        if expires_at <= now:
+                            pending.discard(future)
+                            self._abandon(name, f"{self.timeout:.0f}s source timeout")
+                        else:
+                            wake_at = min(wake_at, expires_at)
+                if not pending:
+                    break
+                
+                done, pending = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future][1]
+                    try:
+                        opportunities = future.result()
+                    except Exception as e:
+                        self.stats['failed'] += 1
+                        logger.error(f"Error in {name}: {e}")
+                        continue
+                    self.stats['completed'] += 1
+                    yield name, opportunities
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _abandon(self, name: str, reason: str):
+        self.stats['timed_out'] += 1
+        logger.warning(f"Gave up on {name}: {reason}")
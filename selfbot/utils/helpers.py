@@ -2,6 +2,7 @@
 Helper utilities for SelfEarnBot.
 """
 from typing import Optional
+from backend.money import format_money, to_micros
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,13 +14,12 @@ def format_currency(amount: float, currency: str = 'USD') -> str:
     
     Args:
         amount: Amount to format
-        currency: Currency code
+        currency: Currency code (shown as a code when it has no symbol)
         
     Returns:
         Formatted string
     """
-    symbol = {'USD': '$', 'EUR': '€', 'GBP': '£'}.get(currency, '$')
-    return f"{symbol}{amount:.2f}"
+    return format_money(to_micros(amount), currency)
 
 
 def format_percentage(value: float, decimals: int = 1) -> str:
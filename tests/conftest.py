@@ -0,0 +1,21 @@
+"""
+Shared pytest setup for the Earning Robot tests.
+
+backend.app opens its databases at import time, so the paths are pointed
+at a throwaway directory here, before any test module imports it.
+"""
+import os
+import shutil
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix='robot-tests-')
+
+os.environ['DATABASE_PATH'] = os.path.join(_DATA_DIR, 'robot.db')
+os.environ['OPTIMIZER_DB_PATH'] = os.path.join(_DATA_DIR, 'optimizer.db')
+os.environ['SCHEDULER_DB_PATH'] = os.path.join(_DATA_DIR, 'scheduler.db')
+os.environ['SELFBOT_DATABASE_PATH'] = os.path.join(_DATA_DIR, 'selfbot.db')
+
+
+def pytest_unconfigure(config):
+    """Remove the throwaway databases"""
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
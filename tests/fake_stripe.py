@@ -0,0 +1,142 @@
+"""
+Local stand-in for the Stripe API.
+Serves recorded responses from tests/fixtures/stripe/api for the calls the
+robot makes (customers and checkout sessions), so the payment path can be
+tested and load-tested offline. Point the client at it with
+`STRIPE_API_BASE` (or `stripe.api_base`).
+"""
+import copy
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'stripe', 'api')
+
+
+def _load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, f'{name}.json')) as f:
+        return json.load(f)
+
+
+def _metadata(form):
+    """Collect `metadata[key]=value` form fields into a dict"""
+    return {
+        key[len('metadata['):-1]: value
+        for key, value in form.items()
+        if key.startswith('metadata[')
+    }
+
+
+class FakeStripeServer:
+    """Threaded HTTP server answering Stripe API calls from fixtures
+
+    Honours `Idempotency-Key` like Stripe (same key -> same response) and
+    counts requests per path so tests can assert on API usage.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = {}
+        self._ids = itertools.count(1)
+        self._idempotent = {}
+        self._lock = threading.Lock()
+        self._customer = _load_fixture('customer')
+        self._checkout_session = _load_fixture('checkout_session')
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                form = dict(parse_qsl(self.rfile.read(length).decode('utf-8')))
+                status, body = server.handle(
+                    self.path, form, self.headers.get('Idempotency-Key')
+                )
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('Request-Id', f"req_fake_{next(server._ids)}")
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, path, form, idempotency_key=None):
+        """Build the (status, body) response for one API call"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            if idempotency_key and (path, idempotency_key) in self._idempotent:
+                return self._idempotent[(path, idempotency_key)]
+
+            if path == '/v1/customers':
+                response = 200, self._create_customer(form)
+            elif path == '/v1/checkout/sessions':
+                response = 200, self._create_checkout_session(form)
+            else:
+                response = 404, {'error': {
+                    'type': 'invalid_request_error',
+                    'message': f"Unrecognized request URL (POST: {path})",
+                }}
+
+            if idempotency_key:
+                self._idempotent[(path, idempotency_key)] = response
+            return response
+
+    def _create_customer(self, form):
+        customer = copy.deepcopy(self._customer)
+        customer['id'] = f"cus_fake{next(self._ids):08d}"
+        customer['email'] = form.get('email')
+        customer['metadata'] = _metadata(form)
+        customer['created'] = int(time.time())
+        return customer
+
+    def _create_checkout_session(self, form):
+        session = copy.deepcopy(self._checkout_session)
+        session_id = f"cs_test_fake{next(self._ids):08d}"
+        amount = int(form.get('line_items[0][price_data][unit_amount]', 0)) * int(
+            form.get('line_items[0][quantity]', 1)
+        )
+        session.update({
+            'id': session_id,
+            'url': f"https://checkout.stripe.com/c/pay/{session_id}",
+            'mode': form.get('mode', 'payment'),
+            'customer': form.get('customer'),
+            'amount_subtotal': amount,
+            'amount_total': amount,
+            'metadata': _metadata(form),
+            'success_url': form.get('success_url'),
+            'cancel_url': form.get('cancel_url'),
+            'created': int(time.time()),
+        })
+        return session
@@ -0,0 +1,160 @@
+"""
+Local stand-in for the Telegram Bot API.
+Accepts `getMe`, `sendMessage` and `editMessageText` calls (JSON or form
+encoded, as sent by python-telegram-bot), records the delivered messages,
+edits and the client connections used, and can be scripted to answer with
+errors (e.g. 429 with `retry_after`) before succeeding. Point clients at it
+with `TELEGRAM_API_BASE`.
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+class FakeTelegramServer:
+    """Threaded HTTP server answering Bot API `sendMessage` calls
+
+    Queue scripted failures with `fail_next(status, body)`; each one
+    answers a single request; chats in `blocked_chats` always get 403.
+    Delivered messages are kept in `messages`, message edits in `edits` and
+    the client ports of all requests in `connections`.
+    """
+
+    def __init__(self, token='123:TEST'):
+        self.token = token
+        self.messages = []
+        self.edits = []
+        self.blocked_chats = set()
+        self.requests = []
+        self.connections = set()
+        self._failures = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length)
+                if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                    body = dict(parse_qsl(raw.decode('utf-8')))
+                else:
+                    body = json.loads(raw or b'{}')
+                status, response = server.handle(self.path, body, self.client_address)
+                payload = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def fail_next(self, status, body=None):
+        """Answer the next request with `status` and a Bot API error body"""
+        self._failures.append((status, body or {
+            'ok': False, 'error_code': status, 'description': 'Scripted failure'
+        }))
+
+    def rate_limit_next(self, retry_after):
+        """Answer the next request with 429 Too Many Requests"""
+        self.fail_next(429, {
+            'ok': False,
+            'error_code': 429,
+            'description': f'Too Many Requests: retry after {retry_after}',
+            'parameters': {'retry_after': retry_after},
+        })
+
+    def handle(self, path, body, client_address):
+        """Build the (status, body) response for one API call"""
+        with self._lock:
+            self.requests.append((time.monotonic(), path, body))
+            self.connections.add(client_address[1])
+
+            prefix = f'/bot{self.token}/'
+            method = path[len(prefix):] if path.startswith(prefix) else None
+            if method == 'getMe':
+                return 200, {'ok': True, 'result': {
+                    'id': int(self.token.split(':')[0]), 'is_bot': True,
+                    'first_name': 'Robot', 'username': 'earning_robot_bot',
+                }}
+            if method not in ('sendMessage', 'editMessageText'):
+                return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+            if self._failures:
+                return self._failures.pop(0)
+            if not body.get('chat_id') or not body.get('text'):
+                return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message text is empty'}
+
+            if str(body['chat_id']) in self.blocked_chats:
+                return 403, {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'}
+
+            if method == 'editMessageText':
+                self.edits.append(body)
+                message_id = int(body.get('message_id') or 0)
+            else:
+                self.messages.append(body)
+                message_id = next(self._ids)
+            return 200, {'ok': True, 'result': {
+                'message_id': message_id,
+                'chat': {'id': int(body['chat_id']), 'type': 'private'},
+                'date': int(time.time()),
+                'text': body['text'],
+            }}
+
+
+def command_update(update_id, user_id, text):
+    """Bot API `Update` payload for a private message from `user_id`
+
+    Commands (text starting with '/') get a `bot_command` entity so
+    python-telegram-bot's CommandHandler matches them.
+    """
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+def generate_updates(chat_ids, per_chat, text='/ask question {n}', first_update_id=1):
+    """Interleaved command updates from several chats, as a burst would arrive
+
+    Yields `per_chat` updates for every chat in round-robin order; `{n}` in
+    `text` is replaced by the update's sequence number within its chat.
+    """
+    update_id = first_update_id
+    for n in range(per_chat):
+        for chat_id in chat_ids:
+            yield command_update(update_id, chat_id, text.format(n=n))
+            update_id += 1
@@ -0,0 +1,79 @@
+"""
+Stripe webhook fixtures for tests.
+Loads recorded event payloads from tests/fixtures/stripe, signs them the
+way Stripe does and delivers them to a running webhook endpoint over HTTP.
+"""
+import copy
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'stripe')
+
+
+def load_event(name, event_id=None, **object_overrides):
+    """
+    Load a fixture event
+
+    Args:
+        name: Fixture file name without `.json`
+        event_id: Replace the event ID (a new delivery of the same object)
+        object_overrides: Fields to override in `data.object`
+    """
+    with open(os.path.join(FIXTURES_DIR, f'{name}.json')) as f:
+        event = json.load(f)
+
+    event = copy.deepcopy(event)
+    if event_id:
+        event['id'] = event_id
+    event['data']['object'].update(object_overrides)
+    return event
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Build a Stripe-Signature header (v1 HMAC-SHA256 scheme)"""
+    timestamp = int(timestamp or time.time())
+    signed = f"{timestamp}.{payload.decode('utf-8')}".encode('utf-8')
+    signature = hmac.new(secret.encode('utf-8'), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class LiveServer:
+    """Serve a WSGI app on a free local port in a background thread"""
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+
+class StripeEventSender:
+    """Deliver signed fixture events to a webhook URL like Stripe does"""
+
+    def __init__(self, url, secret):
+        self.url = url
+        self.secret = secret
+        self.http = requests.Session()
+
+    def deliver(self, event, signature=None):
+        """POST one event; returns the HTTP response"""
+        payload = json.dumps(event).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            'Stripe-Signature': signature or sign_payload(payload, self.secret),
+        }
+        return self.http.post(self.url, data=payload, headers=headers, timeout=5)
@@ -0,0 +1,364 @@
+"""
+REST API tests for the Earning Robot.
+Run with: pytest tests/test_api.py
+"""
+import pytest
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import backend.app as app_module
+from backend.database import Database, Task, Transaction
+from backend.response_cache import clear_response_cache
+
+
+@pytest.fixture
+def test_db(monkeypatch):
+    """Point the API at an in-memory database"""
+    db = Database(':memory:').initialize()
+    monkeypatch.setattr(app_module, 'db', db)
+    clear_response_cache()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def client(test_db):
+    """Flask test client"""
+    app_module.app.config['TESTING'] = True
+    return app_module.app.test_client()
+
+
+def _add_tasks(db, count, provider='openai', start=None):
+    """Insert `count` tasks one minute apart, oldest first"""
+    session = db.get_session()
+    start = start or datetime(2025, 1, 1, 12, 0, 0)
+    for i in range(count):
+        session.add(Task(
+            task_type='completion',
+            ai_provider=provider,
+            input_text=f'Question {i}',
+            output_text='Answer',
+            status='completed' if i % 2 == 0 else 'failed',
+            created_at=start + timedelta(minutes=i)
+        ))
+    session.commit()
+    session.close()
+
+
+def test_list_tasks_keyset_pagination(client, test_db):
+    """Test walking all pages with next_cursor returns every task once"""
+    _add_tasks(test_db, 7)
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/tasks?limit=3' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        seen.extend(t['id'] for t in data['tasks'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_list_tasks_filters_and_projection(client, test_db):
+    """Test provider/status/date filters and field projection"""
+    _add_tasks(test_db, 4, provider='openai')
+    _add_tasks(test_db, 4, provider='mistral', start=datetime(2025, 2, 1))
+
+    data = client.get(
+        '/api/tasks?provider=mistral&status=completed&fields=id,cost'
+    ).get_json()
+
+    assert len(data['tasks']) == 2
+    assert set(data['tasks'][0].keys()) == {'id', 'cost'}
+
+    data = client.get('/api/tasks?since=2025-01-01T12:02:00&until=2025-01-31').get_json()
+    assert len(data['tasks']) == 2
+
+
+def test_list_tasks_rejects_bad_input(client, test_db):
+    """Test malformed cursor, fields and dates return 400"""
+    assert client.get('/api/tasks?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/tasks?fields=input_text').status_code == 400
+    assert client.get('/api/tasks?since=yesterday').status_code == 400
+
+
+def test_export_tasks_ndjson(client, test_db):
+    """Test NDJSON export streams every matching row"""
+    _add_tasks(test_db, 5)
+
+    response = client.get('/api/tasks/export?status=completed')
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [row['id'] for row in lines] == [5, 3, 1]
+    assert 'tokens_used' in lines[0]
+
+
+def test_iter_keyset_batches(test_db):
+    """Test keyset iteration crosses batch boundaries without gaps"""
+    from backend.pagination import iter_keyset
+    _add_tasks(test_db, 5)
+
+    session = test_db.get_session()
+    query = session.query(Task.id.label('id'), Task.created_at.label('created_at'))
+    ids = [row.id for row in iter_keyset(query, Task.created_at, Task.id, batch_size=2)]
+    session.close()
+
+    assert ids == [5, 4, 3, 2, 1]
+
+
+def test_tasks_without_created_at_do_not_break_paging(client, test_db, tmp_path):
+    """Test rows with a NULL created_at (legacy or raw SQL) are skipped, then backfilled on startup"""
+    from sqlalchemy import text
+    _add_tasks(test_db, 5)
+    with test_db.engine.begin() as conn:
+        conn.execute(text('UPDATE tasks SET created_at = NULL WHERE id IN (2, 4)'))
+
+    response = client.get('/api/tasks?limit=2')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [t['id'] for t in data['tasks']] == [5, 3]
+    assert [t['id'] for t in client.get(f"/api/tasks?cursor={data['next_cursor']}").get_json()['tasks']] == [1]
+    export = client.get('/api/tasks/export').data.decode().splitlines()
+    assert [json.loads(line)['id'] for line in export] == [5, 3, 1]
+
+    path = str(tmp_path / 'robot.db')
+    legacy = Database(path).initialize()
+    _add_tasks(legacy, 3)
+    with legacy.engine.begin() as conn:
+        conn.execute(text('UPDATE tasks SET created_at = NULL WHERE id IN (1, 3)'))
+    legacy.close()
+
+    upgraded = Database(path).initialize()
+    session = upgraded.get_session()
+    tasks = {task.id: task.created_at for task in session.query(Task)}
+    session.close()
+    upgraded.close()
+    assert all(tasks.values())
+    assert tasks[1] == tasks[2] and tasks[3] == tasks[2]  # the oldest known creation time
+
+
+def test_stats_etag_revalidation(client, test_db):
+    """Test If-None-Match yields 304 until a write changes the data"""
+    first = client.get('/api/stats')
+    etag = first.headers['ETag']
+
+    repeat = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+
+    session = test_db.get_session()
+    session.add(Transaction(transaction_type='income', category='subscription',
+                            amount=10.0, status='completed'))
+    session.commit()
+    session.close()
+
+    changed = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['financials']['total_income'] == 10.0
+
+
+def test_stats_etag_changes_on_untracked_writes(client, test_db):
+    """Test raw SQL writes (as made by the CLI or other processes) change the ETag"""
+    from sqlalchemy import text
+    etag = client.get('/api/stats').headers['ETag']
+
+    with test_db.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO transactions (transaction_type, category, amount_micros, currency, status, created_at) "
+            "VALUES ('income', 'subscription', 5000000, 'USD', 'completed', :now)"
+        ), {'now': datetime.utcnow()})
+
+    changed = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['financials']['total_income'] == 5.0
+
+
+def test_cached_response_skips_recompute(client, test_db, monkeypatch):
+    """Test repeated polling is served from the in-process cache"""
+    calls = []
+    original = app_module.get_stats_snapshot
+
+    def counting_snapshot(session):
+        calls.append(1)
+        return original(session)
+
+    monkeypatch.setattr(app_module, 'get_stats_snapshot', counting_snapshot)
+
+    for _ in range(3):
+        assert client.get('/api/stats').status_code == 200
+
+    assert len(calls) == 1
+
+
+def test_response_compression_negotiation(client, test_db):
+    """Test large bodies are gzip-compressed when the client accepts it"""
+    import gzip
+    _add_tasks(test_db, 40)
+
+    plain = client.get('/api/tasks?limit=40')
+    assert 'Content-Encoding' not in plain.headers
+
+    compressed = client.get('/api/tasks?limit=40', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert len(compressed.data) < len(plain.data)
+    assert json.loads(gzip.decompress(compressed.data)) == plain.get_json()
+
+
+def test_small_responses_not_compressed(client, test_db):
+    """Test tiny bodies skip compression"""
+    response = client.get('/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_msgpack_content_negotiation(client, test_db):
+    """Test machine clients can request MessagePack"""
+    msgpack = pytest.importorskip('msgpack')
+    _add_tasks(test_db, 3)
+
+    response = client.get('/api/tasks', headers={'Accept': 'application/msgpack'})
+
+    assert response.mimetype == 'application/msgpack'
+    payload = msgpack.unpackb(response.data)
+    assert [t['id'] for t in payload['tasks']] == [3, 2, 1]
+
+
+def test_json_encoders_agree_on_dates(monkeypatch):
+    """Test orjson and the stdlib fallback write dates and times identically"""
+    pytest.importorskip('orjson')
+    from datetime import date, timezone
+    from decimal import Decimal
+    import backend.http_encoding as encoding
+
+    payload = {
+        'created_at': datetime(2025, 1, 2, 3, 4, 5, 678901),
+        'closed_at': datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        'day': date(2025, 1, 2),
+        'amount': Decimal('1.50'),
+    }
+    fast = encoding.dumps_bytes(payload)
+    with app_module.app.app_context():
+        provider_fast = app_module.app.json.dumps(payload)
+        monkeypatch.setattr(encoding, 'orjson', None)
+        stdlib = encoding.dumps_bytes(payload)
+        provider_stdlib = app_module.app.json.dumps(payload)
+
+    assert fast == stdlib
+    assert json.loads(provider_fast) == json.loads(provider_stdlib) == json.loads(fast)
+    assert json.loads(fast)['created_at'] == '2025-01-02T03:04:05.678901'
+    assert json.loads(fast)['closed_at'] == '2025-01-02T03:04:05+00:00'
+
+
+def _add_transactions(db, rows):
+    """Insert (created_at, type, category, amount, status) transactions"""
+    session = db.get_session()
+    for created_at, transaction_type, category, amount, status in rows:
+        session.add(Transaction(
+            transaction_type=transaction_type,
+            category=category,
+            amount=amount,
+            status=status,
+            created_at=created_at
+        ))
+    session.commit()
+    session.close()
+
+
+def test_analytics_timeseries_columnar(client, test_db):
+    """Test bucketed series are dense, columnar and grouped on request"""
+    _add_transactions(test_db, [
+        (datetime(2025, 3, 1, 9, 30), 'income', 'subscription', 30.0, 'completed'),
+        (datetime(2025, 3, 1, 18, 0), 'expense', 'api_cost', 5.0, 'completed'),
+        (datetime(2025, 3, 3, 8, 0), 'income', 'micro_payment', 2.5, 'completed'),
+        (datetime(2025, 3, 3, 9, 0), 'income', 'subscription', 99.0, 'pending'),
+    ])
+    
+    data = client.get(
+        '/api/analytics/timeseries?bucket=day&start=2025-03-01&end=2025-03-04&group_by=category'
+    ).get_json()
+    
+    assert data['buckets'] == ['2025-03-01', '2025-03-02', '2025-03-03']
+    assert data['income'] == [30.0, 0.0, 2.5]
+    assert data['expenses'] == [5.0, 0.0, 0.0]
+    assert data['profit'] == [25.0, 0.0, 2.5]
+    groups = {g['key']: g for g in data['groups']}
+    assert groups['subscription']['income'] == [30.0, 0.0, 0.0]
+    assert groups['api_cost']['expenses'] == [5.0, 0.0, 0.0]
+    
+    weekly = client.get(
+        '/api/analytics/timeseries?bucket=week&start=2025-02-24&end=2025-03-10'
+    ).get_json()
+    assert weekly['buckets'] == ['2025-02-24', '2025-03-03']
+    assert weekly['income'] == [30.0, 2.5]
+
+
+def test_analytics_timeseries_follows_updates(client, test_db):
+    """Test buckets track status changes and deletions"""
+    _add_transactions(test_db, [
+        (datetime(2025, 3, 1, 9, 30), 'income', 'subscription', 40.0, 'pending'),
+    ])
+    url = '/api/analytics/timeseries?bucket=hour&start=2025-03-01T09:00&end=2025-03-01T11:00'
+    assert client.get(url).get_json()['income'] == [0.0, 0.0]
+    
+    session = test_db.get_session()
+    transaction = session.query(Transaction).first()
+    transaction.status = 'completed'
+    session.commit()
+    assert client.get(url).get_json()['income'] == [40.0, 0.0]
+    
+    session.delete(transaction)
+    session.commit()
+    session.close()
+    assert client.get(url).get_json()['income'] == [0.0, 0.0]
+
+
+def test_analytics_timeseries_converts_currencies(client, test_db, tmp_path):
+    """Test mixed-currency buckets are converted with the day's rate, not summed raw"""
+    from datetime import date
+    from billing.fx import FileRateSource, load_rates
+    rates_file = tmp_path / 'fx_rates.csv'
+    rates_file.write_text("date,currency,rate\n2025-03-01,EUR,1.1\n2025-03-02,EUR,1.2\n")
+    session = test_db.get_session()
+    load_rates(session, FileRateSource(str(rates_file)), base='USD', through=date(2025, 3, 2))
+    session.add_all([
+        Transaction(transaction_type='income', category='subscription', amount=10.0, currency='USD',
+                    status='completed', created_at=datetime(2025, 3, 1, 9)),
+        Transaction(transaction_type='income', category='subscription', amount=10.0, currency='EUR',
+                    status='completed', created_at=datetime(2025, 3, 1, 10)),
+        Transaction(transaction_type='expense', category='api_cost', amount=5.0, currency='EUR',
+                    status='completed', created_at=datetime(2025, 3, 2, 10)),
+        Transaction(transaction_type='income', category='one_time', amount=7.0, currency='GBP',
+                    status='completed', created_at=datetime(2025, 3, 2, 11)),
+    ])
+    session.commit()
+    session.close()
+    
+    data = client.get('/api/analytics/timeseries?bucket=day&start=2025-03-01&end=2025-03-03').get_json()
+    
+    assert data['currency'] == 'USD'
+    assert data['income'] == [21.0, 0.0]  # GBP has no rate and is left out
+    assert data['expenses'] == [0.0, 6.0]
+    assert data['profit'] == [21.0, -6.0]
+    assert data['unconverted'] == ['GBP']
+
+
+def test_analytics_timeseries_rejects_bad_input(client, test_db):
+    """Test unknown buckets, groups and oversized ranges return 400"""
+    base = '/api/analytics/timeseries'
+    assert client.get(f'{base}?bucket=minute').status_code == 400
+    assert client.get(f'{base}?group_by=user').status_code == 400
+    assert client.get(f'{base}?start=2025-03-02&end=2025-03-01').status_code == 400
+    assert client.get(f'{base}?bucket=hour&start=2020-01-01&end=2025-01-01').status_code == 400
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
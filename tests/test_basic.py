@@ -12,6 +12,10 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from backend.database import Database, User, Task, Transaction
 from backend.config import Config
 from billing.reporting import ReportGenerator
+from backend.stats import get_stats_snapshot, reconcile_stats
+from backend.user_cache import find_user_id, get_or_create_user_id, get_user_cache
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
 from datetime import datetime
 
 
@@ -129,6 +133,60 @@ def test_report_generator(test_db):
     session.close()
 
 
+def test_report_aggregation_single_pass(test_db):
+    """Test several windows are aggregated in one query and cached"""
+    from sqlalchemy import event
+    from datetime import timedelta
+    session = test_db.get_session()
+    
+    now = datetime.utcnow()
+    session.add_all([
+        Transaction(transaction_type='income', category='subscription', amount=50.0, status='completed'),
+        Transaction(transaction_type='income', category='one_time', amount=20.0, status='completed',
+                    created_at=now - timedelta(days=3)),
+        # First day of the weekly summary, but outside the rolling 7 x 24h breakdown
+        Transaction(transaction_type='income', category='resale', amount=9.0, status='completed',
+                    created_at=datetime.combine((now - timedelta(days=7)).date(), datetime.min.time())),
+        Transaction(transaction_type='expense', category='api_cost', amount=5.0, status='completed'),
+        Transaction(transaction_type='expense', category='api_cost', amount=7.0, status='pending'),
+    ])
+    session.commit()
+    
+    statements = []
+    engine = session.get_bind()
+    # Count aggregation queries (the closed-day lookup is a separate key scan)
+    listener = lambda *args: 'sum(' in args[2] and statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    
+    generator = ReportGenerator(session)
+    generator.prefetch('weekly', 7)
+    weekly = generator.get_weekly_summary()
+    daily_window = generator._daily_window()
+    breakdown = generator.get_category_breakdown(7)
+    
+    assert len(statements) == 1
+    assert weekly['income'] == 79.0
+    assert weekly['expenses'] == 5.0
+    assert breakdown['income_breakdown'] == {'subscription': 50.0, 'one_time': 20.0}
+    
+    # Daily window was not prefetched: one more query, then cached
+    assert generator.aggregate([daily_window])[daily_window]['income_micros'] == 50_000_000
+    generator.get_daily_summary()
+    assert len(statements) == 2
+    
+    # Rolling breakdowns start on a whole minute, so other generators share the cached window
+    start = generator._breakdown_window(7)[0]
+    assert (start.second, start.microsecond) == (0, 0)
+    
+    # A committed write invalidates the cached aggregates
+    session.add(Transaction(transaction_type='income', category='subscription', amount=1.0, status='completed'))
+    session.commit()
+    assert generator.get_daily_summary()['income'] == 51.0
+    
+    event.remove(engine, 'before_cursor_execute', listener)
+    session.close()
+
+
 def test_config_validation():
     """Test configuration validation"""
     # This will fail if required config is missing, which is expected
@@ -190,5 +248,232 @@ def test_user_subscription(test_db):
     session.close()
 
 
+def test_stats_counters_track_writes(test_db):
+    """Test materialized counters follow inserts, updates and deletes"""
+    session = test_db.get_session()
+    
+    task = Task(task_type='test', ai_provider='openai', input_text='Q', status='processing')
+    session.add(task)
+    session.add(User(email='stats@example.com', subscription_type='monthly'))
+    session.add(Transaction(transaction_type='income', category='subscription',
+                            amount=29.99, status='completed'))
+    session.add(Transaction(transaction_type='expense', category='api_cost',
+                            amount=0.25, status='completed'))
+    session.commit()
+    
+    task.status = 'completed'
+    task.tokens_used = 120
+    task.cost = 0.5
+    session.commit()
+    
+    stats = get_stats_snapshot(session)
+    assert stats['total_tasks'] == 1
+    assert stats['completed_tasks'] == 1
+    assert stats['total_tokens'] == 120
+    assert stats['total_users'] == 1
+    assert stats['active_subscriptions'] == 1
+    assert stats['total_income'] == pytest.approx(29.99)
+    assert stats['total_expenses'] == pytest.approx(0.25)
+    
+    session.delete(task)
+    session.commit()
+    
+    stats = get_stats_snapshot(session)
+    assert stats['total_tasks'] == 0
+    assert stats['completed_tasks'] == 0
+    assert stats['total_tokens'] == 0
+    
+    session.close()
+
+
+def test_stats_reconcile_repairs_drift(test_db):
+    """Test reconciliation recomputes counters from the source tables"""
+    session = test_db.get_session()
+    
+    session.add(Task(task_type='test', ai_provider='openai', input_text='Q', status='failed'))
+    session.commit()
+    
+    # Simulate drift
+    from sqlalchemy import text
+    session.execute(text("UPDATE stats_counters SET total_tasks = 42, failed_tasks = 0"))
+    session.commit()
+    
+    drift = reconcile_stats(session)
+    
+    assert drift['total_tasks'] == 1 - 42
+    stats = get_stats_snapshot(session)
+    assert stats['total_tasks'] == 1
+    assert stats['failed_tasks'] == 1
+    assert stats['reconciled_at'] is not None
+    
+    session.close()
+
+
+def test_task_text_blob_dedup_and_lazy_load(test_db):
+    """Test prompts/outputs are stored once and loaded lazily"""
+    from sqlalchemy import text
+    session = test_db.get_session()
+    
+    prompt = 'Explain keyset pagination. ' * 50
+    for _ in range(3):
+        session.add(Task(task_type='test', ai_provider='openai', input_text=prompt, output_text='Done'))
+    session.commit()
+    
+    blob_count = session.execute(text("SELECT COUNT(*) FROM content_blobs")).scalar()
+    assert blob_count == 2
+    
+    task_id = session.query(Task.id).first()[0]
+    session.close()
+    
+    session = test_db.get_session()
+    task = session.get(Task, task_id)
+    assert task.input_size == len(prompt)
+    assert task.input_preview == prompt[:200]
+    assert task.input_text == prompt
+    assert task.output_text == 'Done'
+    session.close()
+
+
+def test_blob_text_reloads_after_expire(test_db):
+    """Test expiring or refreshing a task drops its loaded text"""
+    session = test_db.get_session()
+    task = Task(task_type='test', ai_provider='openai', output_text='First answer')
+    session.add(task)
+    session.commit()
+    assert task.output_text == 'First answer'
+    
+    # Another session rewrites the output
+    other = test_db.get_session()
+    other.get(Task, task.id).output_text = 'Second answer'
+    other.commit()
+    other.close()
+    
+    session.expire(task)
+    assert task.output_text == 'Second answer'
+    
+    other = test_db.get_session()
+    other.get(Task, task.id).output_text = 'Third answer'
+    other.commit()
+    other.close()
+    
+    session.refresh(task)
+    assert task.output_text == 'Third answer'
+    session.close()
+
+
+def test_sweep_blobs_removes_unreferenced_text(test_db):
+    """Test blobs of rewritten and deleted tasks are collected, shared ones kept"""
+    from sqlalchemy import text
+    from backend.blob_store import sweep_blobs
+    from backend.database import BLOB_REFERENCES, content_blobs
+    session = test_db.get_session()
+    kept = Task(task_type='test', ai_provider='openai', input_text='Shared prompt', output_text='Old answer')
+    deleted = Task(task_type='test', ai_provider='openai', input_text='Shared prompt', output_text='Gone answer')
+    session.add_all([kept, deleted])
+    session.commit()
+    
+    kept.output_text = 'New answer'
+    session.delete(deleted)
+    session.commit()
+    
+    assert sweep_blobs(test_db.engine, content_blobs, BLOB_REFERENCES, batch_size=1) == 2
+    assert session.execute(text("SELECT COUNT(*) FROM content_blobs")).scalar() == 2
+    assert kept.input_text == 'Shared prompt'
+    assert kept.output_text == 'New answer'
+    session.close()
+
+
+def test_legacy_inline_text_migration(tmp_path):
+    """Test inline text from older databases is moved into the blob store"""
+    from sqlalchemy import create_engine, text
+    db_path = str(tmp_path / 'legacy.db')
+    
+    engine = create_engine(f'sqlite:///{db_path}')
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE tasks (id INTEGER PRIMARY KEY, user_id INTEGER, task_type VARCHAR(50), "
+            "ai_provider VARCHAR(20), input_text TEXT, output_text TEXT, tokens_used INTEGER, "
+            "cost FLOAT, status VARCHAR(20), created_at DATETIME, completed_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO tasks (task_type, ai_provider, input_text, output_text, status) "
+            "VALUES ('test', 'openai', 'Old prompt', 'Old answer', 'completed')"
+        ))
+    engine.dispose()
+    
+    db = Database(db_path).initialize()
+    session = db.get_session()
+    task = session.query(Task).first()
+    
+    assert task.input_text == 'Old prompt'
+    assert task.output_text == 'Old answer'
+    columns = {row.name for row in session.execute(text("PRAGMA table_info(tasks)"))}
+    assert 'input_text' not in columns and 'output_text' not in columns
+    
+    session.close()
+    db.close()
+
+
+def test_user_id_cache_skips_queries(test_db):
+    """Test get-or-create hits the database once, then serves the id from cache"""
+    statements = []
+    event.listen(test_db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    
+    session = test_db.get_session()
+    user_id = get_or_create_user_id(session, 'telegram_id', '555')
+    created_with = len(statements)
+    
+    assert get_or_create_user_id(session, 'telegram_id', '555') == user_id
+    assert find_user_id(session, 'telegram_id', '555') == user_id
+    assert len(statements) == created_with
+    assert get_stats_snapshot(session)['total_users'] == 1
+    
+    session.close()
+
+
+def test_user_id_cache_negative_entries_and_invalidation(test_db):
+    """Test cached misses and renamed users are dropped when a commit changes users"""
+    session = test_db.get_session()
+    assert find_user_id(session, 'email', 'new@example.com') is None
+    
+    user = User(email='new@example.com')
+    session.add(user)
+    session.commit()
+    assert find_user_id(session, 'email', 'new@example.com') == user.id
+    
+    user.email = 'renamed@example.com'
+    session.commit()
+    assert find_user_id(session, 'email', 'new@example.com') is None
+    assert find_user_id(session, 'email', 'renamed@example.com') == user.id
+    
+    with pytest.raises(ValueError):
+        find_user_id(session, 'stripe_customer_id', 'cus_1')
+    
+    session.close()
+
+
+def test_concurrent_get_or_create_user(tmp_path):
+    """Test concurrent creators of the same user get one row and one id"""
+    db = Database(str(tmp_path / 'robot.db')).initialize()
+    
+    def create(_):
+        session = db.get_session()
+        try:
+            return get_or_create_user_id(session, 'email', 'race@example.com')
+        finally:
+            session.close()
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = set(pool.map(create, range(16)))
+    
+    session = db.get_session()
+    assert len(ids) == 1
+    assert session.query(User).filter_by(email='race@example.com').count() == 1
+    assert len(get_user_cache(db.engine)) == 1
+    session.close()
+    db.close()
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,468 @@
+"""
+Billing tests for the Earning Robot (ledger snapshots and reporting).
+Run with: pytest tests/test_billing.py
+"""
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import inspect
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.database import (
+    Database, Transaction, LedgerDailySnapshot, LedgerDayClosure, WebhookEvent, WebhookDeadLetter
+)
+from backend.config import Config
+from billing.ledger import close_pending_days, backfill, check_consistency
+from billing.reporting import ReportGenerator
+from billing.analytics import get_timeseries, rebuild_buckets
+from billing import webhooks
+from billing.expenses import accumulate_expenses
+from tests.stripe_fixtures import LiveServer, StripeEventSender, load_event
+from tests.fake_stripe import FakeStripeServer
+
+WEBHOOK_SECRET = 'whsec_test_secret'
+
+
+@pytest.fixture
+def test_db():
+    """Create a test database"""
+    db = Database(':memory:').initialize()
+    yield db
+    db.close()
+
+
+def _add_transaction(session, days_ago, amount, transaction_type='income', category='subscription'):
+    """Add a completed transaction at noon `days_ago` days back"""
+    day = datetime.utcnow().date() - timedelta(days=days_ago)
+    session.add(Transaction(
+        transaction_type=transaction_type,
+        category=category,
+        amount=amount,
+        status='completed',
+        created_at=datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+    ))
+    session.commit()
+
+
+def test_close_pending_days_snapshots_past_days(test_db):
+    """Test past days are snapshotted and reports combine them with live rows"""
+    session = test_db.get_session()
+    _add_transaction(session, 3, 30.0)
+    _add_transaction(session, 3, 4.0, 'expense', 'api_cost')
+    _add_transaction(session, 1, 20.0)
+    _add_transaction(session, 0, 10.0)
+
+    closed = close_pending_days(session)
+
+    assert len(closed) == 3  # days -3, -2 (empty) and -1; today stays live
+    assert session.query(LedgerDayClosure).count() == 3
+    assert session.query(LedgerDailySnapshot).count() == 3
+    assert close_pending_days(session) == []
+
+    summary = ReportGenerator(session).get_weekly_summary()
+    assert summary['income'] == 60.0
+    assert summary['expenses'] == 4.0
+    assert check_consistency(session) == []
+
+    session.close()
+
+
+def test_late_write_reopens_closed_day(test_db):
+    """Test a backdated transaction reopens its day and is still reported"""
+    session = test_db.get_session()
+    _add_transaction(session, 2, 15.0)
+    close_pending_days(session)
+
+    _add_transaction(session, 2, 5.0)
+
+    day = datetime.utcnow().date() - timedelta(days=2)
+    assert session.get(LedgerDayClosure, day) is None
+    assert ReportGenerator(session).get_weekly_summary()['income'] == 20.0
+
+    assert close_pending_days(session) == [day]
+    assert ReportGenerator(session).get_weekly_summary()['income'] == 20.0
+
+    session.close()
+
+
+def test_backfill_and_consistency_check(test_db):
+    """Test backfill rebuilds snapshots and the checker finds drift"""
+    session = test_db.get_session()
+    _add_transaction(session, 5, 12.0)
+    _add_transaction(session, 4, 8.0, 'expense', 'api_cost')
+
+    assert backfill(session) == 5
+    assert check_consistency(session) == []
+
+    session.query(LedgerDailySnapshot).filter(
+        LedgerDailySnapshot.transaction_type == 'income'
+    ).update({'total_micros': 99_000_000})
+    session.commit()
+
+    mismatches = check_consistency(session)
+    assert len(mismatches) == 1
+    assert mismatches[0]['live_total'] == 12.0
+    assert mismatches[0]['snapshot_total'] == 99.0
+
+    backfill(session)
+    assert check_consistency(session) == []
+
+    session.close()
+
+
+def test_hourly_buckets_match_rebuild(test_db):
+    """Test trigger-maintained buckets equal a full rebuild"""
+    session = test_db.get_session()
+    _add_transaction(session, 2, 10.0)
+    _add_transaction(session, 2, 3.0, 'expense', 'api_cost')
+    _add_transaction(session, 1, 7.5)
+
+    before = get_timeseries(session, 'day', group_by='category')
+    rebuild_buckets(session)
+    after = get_timeseries(session, 'day', group_by='category')
+
+    assert before == after
+    assert sum(after['income']) == 17.5
+    assert sum(after['expenses']) == 3.0
+
+    session.close()
+
+
+@pytest.fixture
+def webhook_server(tmp_path, monkeypatch):
+    """Run the API on a local port against a file database"""
+    import backend.app as app_module
+    db = Database(str(tmp_path / 'robot.db')).initialize()
+    monkeypatch.setattr(app_module, 'db', db)
+    monkeypatch.setattr(Config, 'STRIPE_WEBHOOK_SECRET', WEBHOOK_SECRET)
+
+    with LiveServer(app_module.app) as server:
+        sender = StripeEventSender(f"{server.url}/api/webhook/stripe", WEBHOOK_SECRET)
+        yield db, sender
+
+    db.close()
+
+
+def test_webhook_ingestion_is_idempotent(webhook_server):
+    """Test retries and redeliveries record each payment once"""
+    db, sender = webhook_server
+
+    checkout = load_event('checkout_session_completed')
+    for _ in range(3):  # Stripe retries the same event
+        assert sender.deliver(checkout).status_code == 200
+    assert sender.deliver(load_event('invoice_paid')).status_code == 200
+    assert sender.deliver(load_event('invoice_payment_failed')).status_code == 200
+    assert sender.deliver(load_event('customer_created')).status_code == 200
+
+    session = db.get_session()
+    assert session.query(WebhookEvent).count() == 4
+    assert session.query(Transaction).count() == 0  # acked before processing
+
+    stats = webhooks.process_all_pending(session)
+    assert stats['inserted'] == 2
+    assert stats['ignored'] == 1
+
+    checkout_tx = session.query(Transaction).filter_by(external_id='cs_test_a1B2c3D4e5').one()
+    assert checkout_tx.amount == 0.5
+    assert checkout_tx.user_id == 7
+    assert session.query(Transaction).filter_by(category='subscription').one().amount == 29.99
+
+    # A different event for an already recorded payment
+    sender.deliver(load_event('invoice_paid', event_id='evt_1QinvoicePaidAgain'))
+    stats = webhooks.process_all_pending(session)
+    assert stats['processed'] == 1
+    assert stats['duplicates'] == 1
+    assert session.query(Transaction).count() == 2
+
+    session.close()
+
+
+def test_webhook_rejects_bad_signature(webhook_server):
+    """Test unsigned deliveries are refused and not stored"""
+    db, sender = webhook_server
+
+    response = sender.deliver(load_event('invoice_paid'), signature='t=1,v1=deadbeef')
+
+    assert response.status_code == 400
+    session = db.get_session()
+    assert session.query(WebhookEvent).count() == 0
+    session.close()
+
+
+def test_webhook_dead_letter_replay(webhook_server, monkeypatch):
+    """Test failing events are dead-lettered and can be replayed"""
+    db, sender = webhook_server
+    sender.deliver(load_event('invoice_paid'))
+    session = db.get_session()
+
+    def broken_handler(invoice):
+        raise RuntimeError('ledger unavailable')
+
+    monkeypatch.setitem(webhooks.EVENT_HANDLERS, 'invoice.paid', broken_handler)
+    for _ in range(2):
+        webhooks.process_pending_events(session, max_attempts=2, retry_backoff=0)
+
+    event = session.query(WebhookEvent).one()
+    dead_letter = session.query(WebhookDeadLetter).one()
+    assert event.status == 'failed'
+    assert 'ledger unavailable' in dead_letter.error
+
+    monkeypatch.undo()
+    assert webhooks.replay_dead_letters(session) == 1
+    stats = webhooks.process_all_pending(session)
+
+    assert stats['inserted'] == 1
+    assert session.query(WebhookEvent).one().status == 'processed'
+    assert session.query(WebhookDeadLetter).one().replayed_at is not None
+
+    session.close()
+
+
+def test_webhook_failures_back_off(webhook_server, monkeypatch):
+    """Test a failing event is retried later without holding up newer events"""
+    db, sender = webhook_server
+    sender.deliver(load_event('invoice_paid'))
+    sender.deliver(load_event('checkout_session_completed'))
+    session = db.get_session()
+
+    def broken_handler(invoice):
+        raise RuntimeError('ledger unavailable')
+
+    monkeypatch.setitem(webhooks.EVENT_HANDLERS, 'invoice.paid', broken_handler)
+    stats = webhooks.process_all_pending(session, batch_size=1, max_attempts=3)
+
+    assert stats['retrying'] == 1
+    assert stats['inserted'] == 1  # the newer event is not stuck behind the failing one
+    failing = session.query(WebhookEvent).filter_by(event_type='invoice.paid').one()
+    assert failing.status == 'pending'
+    assert failing.attempts == 1
+    assert failing.next_attempt_at > datetime.utcnow()
+
+    # Not due yet: a second run leaves it alone
+    assert webhooks.process_all_pending(session, max_attempts=3)['retrying'] == 0
+    assert failing.attempts == 1
+    assert session.query(WebhookDeadLetter).count() == 0
+
+    monkeypatch.undo()
+    failing.next_attempt_at = datetime.utcnow()
+    session.commit()
+    stats = webhooks.process_all_pending(session)
+
+    assert stats['inserted'] == 1
+    assert failing.status == 'processed'
+
+    session.close()
+
+
+@pytest.fixture
+def fake_stripe(monkeypatch):
+    """Route the Stripe client to the local stand-in"""
+    import stripe
+    with FakeStripeServer() as server:
+        monkeypatch.setattr(stripe, 'api_base', server.url)
+        monkeypatch.setattr(stripe, 'api_key', 'sk_test_fake')
+        yield server
+
+
+@pytest.fixture
+def api_client(monkeypatch):
+    """Flask test client on an in-memory database"""
+    import backend.app as app_module
+    db = Database(':memory:').initialize()
+    monkeypatch.setattr(app_module, 'db', db)
+    app_module.app.config['TESTING'] = True
+    yield db, app_module.app.test_client()
+    db.close()
+
+
+def test_subscription_checkout_reuses_customer(fake_stripe, api_client):
+    """Test repeated subscription checkouts create one Stripe customer"""
+    from backend.database import User
+    db, client = api_client
+
+    for _ in range(3):
+        response = client.post('/api/payment/subscription', json={'email': 'buyer@example.com'})
+        assert response.status_code == 200
+        assert response.get_json()['checkout_url'].startswith('https://checkout.stripe.com/')
+
+    assert fake_stripe.requests['/v1/customers'] == 1
+    assert fake_stripe.requests['/v1/checkout/sessions'] == 3
+
+    session = db.get_session()
+    user = session.query(User).filter_by(email='buyer@example.com').one()
+    assert user.stripe_customer_id.startswith('cus_fake')
+    session.close()
+
+
+def test_micro_payment_checkout(fake_stripe, api_client):
+    """Test micro-payment checkout goes through the configured API base"""
+    from backend.database import User
+    db, client = api_client
+    session = db.get_session()
+    session.add(User(email='micro@example.com'))
+    session.commit()
+    user_id = session.query(User.id).scalar()
+    session.close()
+
+    response = client.post('/api/payment/micro', json={'user_id': user_id})
+
+    assert response.status_code == 200
+    assert fake_stripe.requests == {'/v1/checkout/sessions': 1}
+
+
+def test_expense_accumulator_aggregates_per_provider_minute(test_db):
+    """Test task costs become one linked expense per provider and minute"""
+    from backend.database import Task, ExpenseTaskLink
+    session = test_db.get_session()
+    minute = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(minutes=5)
+
+    for i, (provider, cost) in enumerate([('openai', 0.001), ('openai', 0.002), ('mistral', 0.0005)]):
+        session.add(Task(task_type='chat', ai_provider=provider, input_text='Q', status='completed',
+                         cost=cost, tokens_used=100, completed_at=minute + timedelta(seconds=10 * i)))
+    session.add(Task(task_type='chat', ai_provider='openai', input_text='Q', status='completed',
+                     cost=0.004, tokens_used=100, completed_at=datetime.utcnow()))
+    session.commit()
+
+    assert accumulate_expenses(session) == 2
+    assert accumulate_expenses(session) == 0
+
+    expenses = {t.payment_provider: t for t in session.query(Transaction).filter_by(category='api_cost')}
+    assert set(expenses) == {'openai', 'mistral'}
+    assert expenses['openai'].amount == pytest.approx(0.003)
+    assert expenses['openai'].created_at == minute
+    assert session.query(ExpenseTaskLink).filter_by(transaction_id=expenses['openai'].id).count() == 2
+
+    # The minute in progress is flushed only on request (e.g. CLI exit)
+    assert accumulate_expenses(session, include_current_minute=True) == 1
+    assert session.query(ExpenseTaskLink).count() == 4
+
+    session.close()
+
+
+def test_expense_accumulator_skips_legacy_recorded_costs(tmp_path):
+    """Test tasks from before aggregation are not expensed twice"""
+    from backend.database import Task
+    db_path = str(tmp_path / 'legacy.db')
+
+    db = Database(db_path).initialize()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE expense_task_links")
+    session = db.get_session()
+    session.add(Task(task_type='chat', ai_provider='openai', input_text='Q', status='completed',
+                     cost=0.01, completed_at=datetime.utcnow() - timedelta(hours=1)))
+    session.commit()
+    session.close()
+    db.close()
+
+    db = Database(db_path).initialize()
+    session = db.get_session()
+    assert accumulate_expenses(session) == 0
+    session.close()
+    db.close()
+
+
+def test_money_sums_are_exact(test_db):
+    """Test many sub-cent amounts add up exactly in reports, buckets and stats"""
+    from backend.database import Task
+    from backend.stats import get_stats_snapshot
+    session = test_db.get_session()
+    for _ in range(10):
+        _add_transaction(session, 0, 0.1)
+    finished = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(minutes=5)
+    session.add_all([
+        Task(task_type='chat', ai_provider='openai', input_text='Q', status='completed',
+             cost=0.0001, completed_at=finished)
+        for _ in range(1000)
+    ])
+    session.commit()
+
+    assert accumulate_expenses(session) == 1
+    expense = session.query(Transaction).filter_by(category='api_cost').one()
+    assert expense.amount_micros == 100_000
+
+    stats = get_stats_snapshot(session)
+    assert stats['total_income_micros'] == 1_000_000
+    assert stats['total_task_cost_micros'] == 100_000
+    assert ReportGenerator(session).get_daily_summary()['income'] == 1.0
+    series = get_timeseries(session, bucket='day', start=datetime.utcnow() - timedelta(days=1))
+    assert series['income'][-1] == 1.0
+    session.close()
+
+
+def test_legacy_float_money_migration(tmp_path):
+    """Test float amounts of an older database move to integer micros"""
+    from backend.database import Task
+    from backend.stats import get_stats_snapshot
+    db_path = str(tmp_path / 'legacy.db')
+
+    db = Database(db_path).initialize()
+    with db.engine.begin() as conn:
+        for (trigger,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").all():
+            conn.exec_driver_sql(f"DROP TRIGGER {trigger}")
+        conn.exec_driver_sql("ALTER TABLE transactions DROP COLUMN amount_micros")
+        conn.exec_driver_sql("ALTER TABLE transactions ADD COLUMN amount FLOAT")
+        conn.exec_driver_sql("ALTER TABLE tasks DROP COLUMN cost_micros")
+        conn.exec_driver_sql("ALTER TABLE tasks ADD COLUMN cost FLOAT")
+        conn.exec_driver_sql("ALTER TABLE ledger_hourly_buckets RENAME COLUMN total_micros TO total")
+        conn.exec_driver_sql("ALTER TABLE stats_counters RENAME COLUMN total_income_micros TO total_income")
+        conn.exec_driver_sql(
+            "INSERT INTO transactions (transaction_type, category, amount, currency, status, created_at) "
+            "VALUES ('income', 'subscription', 29.99, 'USD', 'completed', '2024-01-02 12:00:00.000000')"
+        )
+        conn.exec_driver_sql("INSERT INTO tasks (task_type, status, cost) VALUES ('chat', 'completed', 0.0123)")
+    db.close()
+
+    db = Database(db_path).initialize()
+    session = db.get_session()
+    assert session.query(Transaction).one().amount_micros == 29_990_000
+    assert session.query(Task).one().cost_micros == 12_300
+    columns = {c['name'] for c in inspect(db.engine).get_columns('transactions')}
+    assert 'amount' not in columns
+
+    stats = get_stats_snapshot(session)
+    assert stats['total_income_micros'] == 29_990_000
+    series = get_timeseries(session, bucket='month', start=datetime(2024, 1, 1), end=datetime(2024, 2, 1))
+    assert series['income'] == [29.99]
+
+    # Triggers were reinstalled against the micros columns
+    _add_transaction(session, 0, 0.01)
+    assert get_stats_snapshot(session)['total_income_micros'] == 30_000_000
+    session.close()
+    db.close()
+
+
+def test_multi_currency_report_converts_in_sql(test_db, tmp_path):
+    """Test reports convert with forward-filled daily rates and keep per-currency totals"""
+    from billing.fx import FileRateSource, load_rates
+    session = test_db.get_session()
+    quoted = datetime.utcnow().date() - timedelta(days=4)
+    rates_file = tmp_path / 'fx_rates.csv'
+    rates_file.write_text(f"date,currency,rate\n{quoted.isoformat()},EUR,1.1\n")
+    assert load_rates(session, FileRateSource(str(rates_file)), base='USD') == 1
+
+    _add_transaction(session, 2, 10.0)
+    for days_ago in (2, 0):
+        session.add(Transaction(
+            transaction_type='income', category='one_time', amount=10.0, currency='EUR',
+            status='completed',
+            created_at=datetime.combine(datetime.utcnow().date() - timedelta(days=days_ago), datetime.min.time())
+        ))
+    session.add(Transaction(transaction_type='income', category='one_time', amount=5.0, currency='GBP',
+                            status='completed', created_at=datetime.utcnow()))
+    session.commit()
+    close_pending_days(session)
+
+    summary = ReportGenerator(session, currency='USD').get_weekly_summary()
+    assert summary['currency'] == 'USD'
+    assert summary['income'] == 32.0  # GBP has no rate and is left out
+    assert summary['by_currency']['EUR']['income'] == 20.0
+    assert summary['by_currency']['GBP']['income'] == 5.0
+    assert '€20.00' in ReportGenerator(session).format_report('weekly')
+    session.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
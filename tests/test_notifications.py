@@ -0,0 +1,96 @@
+"""
+Telegram notification tests for the Earning Robot.
+Run with: pytest tests/test_notifications.py
+"""
+import pytest
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.notifications import MAX_MESSAGE_LENGTH, TelegramNotifier, merge_messages
+from backend.rate_limit import TokenBucket
+from tests.fake_telegram import FakeTelegramServer
+
+TOKEN = '123:TEST'
+
+
+@pytest.fixture
+def telegram():
+    """Running fake Bot API server"""
+    with FakeTelegramServer(TOKEN) as server:
+        yield server
+
+
+@pytest.fixture
+def notifier(telegram):
+    """Notifier pointed at the fake server, with short waits"""
+    notifier = TelegramNotifier(TOKEN, default_chat_id='42', api_base=telegram.url,
+                                merge_window=0.2, backoff=0.01, timeout=5)
+    yield notifier
+    notifier.close()
+
+
+def test_burst_is_merged_into_one_message(telegram, notifier):
+    """Test messages queued together arrive as one message over one connection"""
+    for i in range(5):
+        notifier.notify(f"Alert {i}")
+    assert notifier.flush(timeout=5)
+
+    notifier.notify("Later report")
+    assert notifier.flush(timeout=5)
+
+    assert [m['text'] for m in telegram.messages] == [
+        "Alert 0\n\nAlert 1\n\nAlert 2\n\nAlert 3\n\nAlert 4",
+        "Later report",
+    ]
+    assert len(telegram.connections) == 1
+    assert notifier.stats['merged'] == 4
+
+
+def test_rate_limit_and_server_errors_are_retried(telegram, notifier):
+    """Test 429 waits `retry_after` and 5xx backs off before delivering"""
+    telegram.rate_limit_next(1)
+    telegram.fail_next(502)
+
+    started = time.monotonic()
+    notifier.notify("Daily report")
+    assert notifier.flush(timeout=10)
+
+    assert [m['text'] for m in telegram.messages] == ["Daily report"]
+    assert time.monotonic() - started >= 1.0
+    assert notifier.stats['retries'] == 2
+
+
+def test_bad_request_is_dropped(telegram, notifier):
+    """Test a 400 is not retried"""
+    telegram.fail_next(400)
+    notifier.notify("Broken <b>markup")
+    assert notifier.flush(timeout=5)
+
+    assert telegram.messages == []
+    assert len(telegram.requests) == 1
+    assert notifier.stats['dropped'] == 1
+
+
+def test_merge_respects_length_limit():
+    """Test merged messages never exceed Telegram's limit"""
+    texts = ['a' * 3000, 'b' * 3000, 'c' * (MAX_MESSAGE_LENGTH + 10)]
+    messages = merge_messages(texts)
+    assert all(len(message) <= MAX_MESSAGE_LENGTH for message in messages)
+    assert ''.join(messages).replace('\n', '') == ''.join(texts)
+
+
+def test_token_bucket_paces_calls():
+    """Test a bucket without burst allowance spaces acquisitions by 1/rate"""
+    bucket = TokenBucket(rate=20, capacity=1)
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.19
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,89 @@
+"""
+Provider selector tests for the Earning Robot.
+Run with: pytest tests/test_provider_selector.py
+"""
+import pytest
+import sys
+import os
+import json
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend import provider_selector
+from backend.provider_selector import DynamicProviderSelector
+from backend.trend_store import TrendScoreStore
+
+MODELS = ['gpt-4o', 'claude sonnet', 'mistral large', 'llama 3']
+COST = [0.005, 0.003, 0.002, 0.0]
+QUALITY = [0.9, 0.95, 0.7, 0.6]
+LATENCY = [800.0, 600.0, 400.0, 300.0]
+
+
+@pytest.fixture
+def selector(tmp_path):
+    """Selector whose trend store knows two models"""
+    path = tmp_path / 'trending_models.json'
+    path.write_text(json.dumps({'items': [
+        {'name': 'Claude Sonnet', 'weekly_tokens': 900},
+        {'name': 'GPT-4o', 'weekly_tokens': 450},
+    ]}), encoding='utf-8')
+    # Keep the cost term from dominating so the ranking is interesting
+    weights = {'quality': 1.0, 'cost': 0.001, 'speed': 10.0, 'trend': 0.5}
+    return DynamicProviderSelector(weights, trend_store=TrendScoreStore(str(path)))
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    """Run with NumPy and with the pure Python fallback"""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(provider_selector, 'np', None)
+    return request.param
+
+
+def test_score_batch_matches_score(selector, backend):
+    """Test batch scores equal one-by-one scores, trend looked up by model"""
+    batch = selector.score_batch(COST, QUALITY, LATENCY, models=MODELS)
+    single = [
+        selector.score(model=m, cost_per_1k=c, quality=q, latency_ms=l)
+        for m, c, q, l in zip(MODELS, COST, QUALITY, LATENCY)
+    ]
+    assert list(batch) == pytest.approx(single)
+
+    with pytest.raises(ValueError):
+        selector.score_batch(COST, QUALITY[:2], LATENCY, models=MODELS)
+
+
+def test_choose_many_per_request_candidates(selector, backend):
+    """Test top-k per request agrees with choose() on each request's candidates"""
+    eligible = [
+        [True, True, True, True],
+        [True, False, True, False],
+        [False, False, False, True],
+        [False, False, False, False],
+    ]
+    top1 = selector.choose_many(MODELS, COST, QUALITY, LATENCY, eligible=eligible)
+    top2 = selector.choose_many(MODELS, COST, QUALITY, LATENCY, eligible=eligible, k=2)
+
+    for row, best, pair in zip(eligible[:3], top1, top2):
+        candidates = {
+            m: {'cost_per_1k': c, 'quality': q, 'latency_ms': l}
+            for m, c, q, l, ok in zip(MODELS, COST, QUALITY, LATENCY, row) if ok
+        }
+        assert best == [selector.choose(candidates)]
+        assert pair[0] == best[0]
+    assert top2[2] == ['llama 3']
+    assert top1[3] == [] and top2[3] == []
+
+
+
+def test_choose_many_without_models(selector, backend):
+    """Test an empty model list gives each request an empty choice"""
+    assert selector.choose_many([], []) == [[]]
+    assert selector.choose_many([], [], eligible=[[], []], k=2) == [[], []]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
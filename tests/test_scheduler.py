@@ -0,0 +1,94 @@
+"""
+Scheduler tests for the Earning Robot.
+Run with: pytest tests/test_scheduler.py
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import backend.app as app_module
+from backend.config import Config
+from backend.scheduler import TaskScheduler, job_metrics
+from backend.response_cache import clear_response_cache
+
+
+@pytest.fixture
+def scheduler_config(tmp_path, monkeypatch):
+    """Point the scheduler at throwaway robot and job store databases"""
+    monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'robot.db'))
+    monkeypatch.setattr(Config, 'SCHEDULER_DB_PATH', str(tmp_path / 'scheduler.db'))
+    monkeypatch.setattr(Config, 'ADMIN_TOKEN', 'admin-secret')
+
+
+@pytest.fixture
+def scheduler(scheduler_config):
+    """Started scheduler, stopped after the test"""
+    scheduler = TaskScheduler()
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+    scheduler.db.close()
+
+
+def test_schedules_persist_across_restarts(scheduler_config):
+    """Test stored jobs keep their next run time when the scheduler restarts"""
+    first = TaskScheduler()
+    first.start()
+    next_runs = {job['id']: job['next_run_time'] for job in first.list_jobs()}
+    first.stop()
+    first.db.close()
+
+    assert set(next_runs) == set(first.jobs)
+
+    second = TaskScheduler()
+    second.start()
+    assert {job['id']: job['next_run_time'] for job in second.list_jobs()} == next_runs
+    second.stop()
+    second.db.close()
+
+
+def test_run_job_records_metrics(scheduler, monkeypatch):
+    """Test successes and failures are counted with durations"""
+    scheduler.run_job('stats_reconcile')
+
+    def broken():
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(scheduler, 'record_api_expenses', broken)
+    scheduler.run_job('expense_accumulator')
+
+    session = scheduler.db.get_session()
+    metrics = job_metrics(session)
+    session.close()
+
+    assert metrics['stats_reconcile']['runs'] == 1
+    assert metrics['stats_reconcile']['last_status'] == 'success'
+    assert metrics['stats_reconcile']['last_success_at'] is not None
+    assert metrics['stats_reconcile']['avg_duration_ms'] is not None
+    assert metrics['expense_accumulator']['failures'] == 1
+    assert metrics['expense_accumulator']['last_error'] == 'boom'
+
+
+def test_admin_jobs_endpoint(scheduler, monkeypatch):
+    """Test listing and triggering jobs requires the admin token"""
+    monkeypatch.setattr(app_module, 'db', scheduler.db)
+    clear_response_cache()
+    client = app_module.app.test_client()
+
+    assert client.get('/api/admin/jobs').status_code == 401
+
+    headers = {'X-Admin-Token': 'admin-secret'}
+    listing = client.get('/api/admin/jobs', headers=headers).get_json()
+    assert listing['scheduler_running'] is True
+    assert {job['id'] for job in listing['jobs']} == set(scheduler.jobs)
+
+    assert client.post('/api/admin/jobs/missing/run', headers=headers).status_code == 404
+    response = client.post('/api/admin/jobs/health_check/run', headers=headers)
+    assert response.status_code == 202
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
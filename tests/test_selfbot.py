@@ -5,14 +5,19 @@ Run with: pytest tests/test_selfbot.py
 import pytest
 import sys
 import os
+import threading
+import time
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from selfbot.database import SelfBotDatabase, Opportunity, GeneratedContent, PublishResult, LearningRecord
+from selfbot.database import SelfBotDatabase, Opportunity, GeneratedContent, PublishResult, LearningRecord, FeedState
 from selfbot.config import SelfBotConfig
 from selfbot.brain import OpportunityScorer, DecisionEngine
-from selfbot.scanner import RSSScanner
+from selfbot.scanner import BaseScanner, FeedStateStore, RSSScanner, ScanRunner
+from selfbot.scanner.rss_monitor import MAX_ENTRIES_PER_FEED
+from selfbot.finance import FinanceTracker, SelfBotReports, SelfBotDataService
+from tests.stripe_fixtures import LiveServer
 from datetime import datetime
 
 
@@ -75,6 +80,8 @@ def test_create_generated_content(test_db):
     assert retrieved is not None
     assert retrieved.content_type == 'article'
     assert retrieved.quality_score == 0.85
+    assert retrieved.content == 'This is test content'
+    assert retrieved.content_preview == 'This is test content'
     
     session.close()
 
@@ -234,5 +241,243 @@ def test_economics_data():
     # Both refer to the same content type
 
 
+def _seed_results(session):
+    """Two articles and one code snippet with publish results"""
+    for content_id, ctype in [(1, 'article'), (2, 'article'), (3, 'code')]:
+        session.add(GeneratedContent(id=content_id, content_type=ctype, title=f"Item {content_id}",
+                                     tokens_used=100, quality_score=0.8, status='approved'))
+    session.add(Opportunity(title='Lead', content_type='article', status='selected'))
+    for content_id, revenue, cost, status in [
+        (1, 10.10, 0.10, 'published'),
+        (2, 20.20, 0.20, 'rejected'),
+        (3, 30.30, 0.30, 'accepted'),
+    ]:
+        session.add(PublishResult(content_id=content_id, platform='test', status=status,
+                                  actual_revenue=revenue, actual_cost=cost,
+                                  actual_profit=revenue - cost, roi=(revenue - cost) / cost))
+    session.commit()
+
+
+def test_selfbot_reports_aggregate_in_sql(test_db):
+    """Test report totals, per-type averages and the cycle report from SQL aggregates"""
+    session = test_db.get_session()
+    _seed_results(session)
+    reports = SelfBotReports(session)
+    
+    stats = reports.generate_summary_stats()
+    assert stats['total_published'] == 3
+    assert stats['total_content_generated'] == 3
+    assert stats['total_opportunities'] == 1
+    assert stats['total_revenue'] == 60.60
+    assert stats['total_cost'] == 0.60
+    assert stats['total_profit'] == 60.00
+    assert stats['average_profit_per_operation'] == 20.00
+    
+    assert reports.get_top_performing_content_types(limit=2) == [('code', 30.0), ('article', 15.0)]
+    
+    report = reports.generate_cycle_report()
+    assert 'Success Rate: 66.7%' in report
+    assert 'Profit: $60.00' in report
+    assert 'Average Quality: 0.80' in report
+    
+    summary = FinanceTracker(session).get_summary()
+    assert summary['total_operations'] == 3
+    assert summary['successful_operations'] == 2
+    assert summary['success_rate'] == 0.67
+    assert summary['average_roi'] == 100.0
+    
+    session.close()
+
+
+def test_selfbot_data_service_caches_aggregates(tmp_path):
+    """Test the data service keeps one engine and serves stats from its cache"""
+    service = SelfBotDataService(str(tmp_path / 'selfbot.db'), ttl=60)
+    assert service.summary_stats()['total_published'] == 0
+    
+    session = service.db.get_session()
+    _seed_results(session)
+    session.close()
+    
+    # Cached until the TTL expires or the cache is invalidated
+    assert service.summary_stats()['total_published'] == 0
+    engine = service.db.engine
+    service.invalidate()
+    assert service.summary_stats()['total_published'] == 3
+    assert service.db.engine is engine
+    
+    service.close()
+
+
+RSS_FEED = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Gigs</title>
+<item><title>Write a blog post about Python</title><link>https://example.com/1</link><guid>1</guid></item>
+<item><title>Fix a script</title><link>https://example.com/2</link><guid>2</guid></item>
+</channel></rss>"""
+
+
+class StubScanner(BaseScanner):
+    """Scanner returning one opportunity after a delay, or raising"""
+    
+    def __init__(self, name, delay=0.0, error=None, release=None):
+        super().__init__(name)
+        self.delay = delay
+        self.error = error
+        self.release = release
+    
+    def scan(self):
+        if self.release:
+            self.release.wait(self.delay)
+        else:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [{'source': self.name, 'title': self.name, 'description': '', 'content_type': 'article'}]
+
+
+def test_scan_runner_streams_results_and_abandons_slow_sources():
+    """Test results arrive in completion order and a hung source is dropped at its timeout"""
+    release = threading.Event()
+    scanners = [
+        StubScanner('slow', delay=5, release=release),
+        StubScanner('medium', delay=0.2),
+        StubScanner('fast'),
+        StubScanner('broken', error=RuntimeError('boom')),
+    ]
+    runner = ScanRunner(workers=4, timeout=0.5, cycle_timeout=10)
+    
+    start = time.monotonic()
+    names = [name for name, _ in runner.run(scanners)]
+    elapsed = time.monotonic() - start
+    release.set()
+    
+    assert names == ['fast', 'medium']
+    assert elapsed < 2
+    assert runner.stats == {'completed': 2, 'failed': 1, 'timed_out': 1}
+
+
+def test_rss_feeds_are_fetched_concurrently():
+    """Test each RSS feed is its own source, so feeds download in parallel"""
+    def app(environ, start_response):
+        time.sleep(0.3)
+        start_response('200 OK', [('Content-Type', 'application/rss+xml')])
+        return [RSS_FEED.encode('utf-8')]
+    
+    with LiveServer(app) as server:
+        scanner = RSSScanner([f"{server.url}/feed/{i}" for i in range(5)])
+        start = time.monotonic()
+        results = dict(ScanRunner(workers=5, timeout=5).run([scanner]))
+        elapsed = time.monotonic() - start
+    
+    assert len(results) == 5
+    assert all(len(opps) == 2 for opps in results.values())
+    assert results[f"RSSScanner:{server.url}/feed/0"][0]['title'] == 'Write a blog post about Python'
+    assert elapsed < 1.2
+
+
+class VersionedFeed:
+    """WSGI RSS feed with an ETag; records the If-None-Match of each request"""
+    
+    def __init__(self):
+        self.items = [('1', 'Write a blog post about Python'), ('2', 'Fix a script')]
+        self.requests = []
+    
+    @property
+    def etag(self):
+        return f'"v{len(self.items)}"'
+    
+    def __call__(self, environ, start_response):
+        self.requests.append(environ.get('HTTP_IF_NONE_MATCH'))
+        if environ.get('HTTP_IF_NONE_MATCH') == self.etag:
+            start_response('304 Not Modified', [('ETag', self.etag)])
+            return [b'']
+        items = ''.join(
+            f"<item><title>{title}</title><link>https://example.com/{guid}</link><guid>{guid}</guid></item>"
+            for guid, title in reversed(self.items)
+        )
+        body = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Gigs</title>{items}</channel></rss>'
+        start_response('200 OK', [('Content-Type', 'application/rss+xml'), ('ETag', self.etag)])
+        return [body.encode('utf-8')]
+
+
+def test_rss_scanner_emits_only_new_entries(tmp_path):
+    """Test feeds are revalidated with their ETag and seen entries are not emitted again"""
+    db = SelfBotDatabase(str(tmp_path / 'selfbot.db')).initialize()
+    feed = VersionedFeed()
+    
+    with LiveServer(feed) as server:
+        url = f"{server.url}/feed"
+        scanner = RSSScanner([url], FeedStateStore(db))
+        first = scanner.scan()
+        first.saved()
+        unchanged = scanner.scan()
+        unchanged.saved()
+        
+        feed.items.append(('3', 'Write an article about SEO'))
+        updated = scanner.scan()
+        updated.saved()
+        
+        # State survives a restart
+        restarted = RSSScanner([url], FeedStateStore(db)).scan()
+    
+    assert len(first) == 2
+    assert unchanged == []
+    assert [opp['title'] for opp in updated] == ['Write an article about SEO']
+    assert restarted == []
+    assert feed.requests == [None, '"v2"', '"v2"', '"v3"']
+    
+    session = db.get_session()
+    state = session.query(FeedState).filter_by(feed_url=url).one()
+    assert state.etag == '"v3"'
+    assert state.seen_ids == ['3', '2', '1']
+    session.close()
+    db.close()
+
+
+
+def test_rss_scanner_keeps_state_until_saved(tmp_path):
+    """Test entries whose opportunities were never saved are emitted again"""
+    db = SelfBotDatabase(str(tmp_path / 'selfbot.db')).initialize()
+    feed = VersionedFeed()
+    
+    with LiveServer(feed) as server:
+        url = f"{server.url}/feed"
+        scanner = RSSScanner([url], FeedStateStore(db))
+        # e.g. the commit failed or the source was abandoned
+        lost = scanner.scan()
+        retried = scanner.scan()
+        retried.saved()
+        after = scanner.scan()
+    
+    assert len(lost) == 2
+    assert [opp['title'] for opp in retried] == [opp['title'] for opp in lost]
+    assert after == []
+    assert feed.requests == [None, None, '"v2"']
+    db.close()
+
+
+
+def test_rss_scanner_defers_entries_over_the_cap(tmp_path):
+    """Test entries over MAX_ENTRIES_PER_FEED are emitted by the next scan instead of dropped"""
+    db = SelfBotDatabase(str(tmp_path / 'selfbot.db')).initialize()
+    feed = VersionedFeed()
+    feed.items = [(str(i), f'Write article {i}') for i in range(1, 14)]
+    
+    with LiveServer(feed) as server:
+        url = f"{server.url}/feed"
+        scanner = RSSScanner([url], FeedStateStore(db))
+        first = scanner.scan()
+        first.saved()
+        second = scanner.scan()
+        second.saved()
+        third = scanner.scan()
+    
+    assert len(first) == MAX_ENTRIES_PER_FEED
+    assert [opp['title'] for opp in second] == ['Write article 3', 'Write article 2', 'Write article 1']
+    assert third == []
+    # The capped fetch is not revalidated, so the remaining entries are served
+    assert feed.requests == [None, None, '"v13"']
+    db.close()
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,241 @@
+"""
+Telegram bot concurrency and webhook tests for the Earning Robot.
+Run with: pytest tests/test_telegram_bot.py
+"""
+import pytest
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from telegram import Update
+
+import backend.app as app_module
+from backend.config import Config
+from backend.database import BroadcastJob, Task, User
+from frontend.telegram_bot import TelegramBot
+from frontend.telegram_webhook import WebhookDispatcher, get_webhook_dispatcher, shard_key
+from tests.fake_telegram import FakeTelegramServer, command_update, generate_updates
+
+TOKEN = '123:TEST'
+AI_LATENCY = 0.3
+WEBHOOK_SECRET = 'hook-secret'
+
+
+class SlowAI:
+    """AI manager answering after a fixed delay, tracking peak concurrency"""
+
+    def __init__(self, latency=AI_LATENCY):
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def execute_task(self, prompt, provider='openai', max_tokens=500):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        return {'response': f"Answer to {prompt}", 'tokens_used': 10, 'cost': 0.0001}
+
+
+@pytest.fixture
+def telegram(tmp_path, monkeypatch):
+    """Fake Bot API server with the bot configured against it"""
+    with FakeTelegramServer(TOKEN) as server:
+        monkeypatch.setattr(Config, 'TELEGRAM_BOT_TOKEN', TOKEN)
+        monkeypatch.setattr(Config, 'TELEGRAM_API_BASE', server.url)
+        monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'robot.db'))
+        monkeypatch.setattr(Config, 'TELEGRAM_MAX_INFLIGHT_PER_USER', 1)
+        yield server
+
+
+async def deliver(bot, updates, expected_edits, server, timeout=10):
+    """Feed updates through the application and wait for the answers"""
+    application = bot.build_application(polling=False)
+    await application.initialize()
+    await application.start()
+    try:
+        started = time.monotonic()
+        for data in updates:
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        while len(server.edits) < expected_edits and time.monotonic() - started < timeout:
+            await asyncio.sleep(0.02)
+        return time.monotonic() - started
+    finally:
+        await application.stop()
+        await application.shutdown()
+
+
+def test_ask_updates_are_answered_in_parallel(telegram):
+    """Test slow AI calls from different users overlap instead of queueing"""
+    ai = SlowAI()
+    bot = TelegramBot(ai_manager=ai)
+    updates = [command_update(i, 1000 + i, f"/ask question {i}") for i in range(1, 9)]
+
+    elapsed = asyncio.run(deliver(bot, updates, 8, telegram))
+
+    assert len(telegram.edits) == 8
+    assert all(edit['text'].startswith('🤖 AI Response') for edit in telegram.edits)
+    assert ai.peak > 1
+    assert elapsed < 8 * AI_LATENCY
+
+    session = bot.db.get_session()
+    assert session.query(Task).filter_by(status='completed').count() == 8
+    session.close()
+
+
+def test_user_in_flight_limit(telegram):
+    """Test a second question from the same user is refused while the first runs"""
+    bot = TelegramBot(ai_manager=SlowAI())
+    updates = [
+        command_update(1, 2000, "/ask first"),
+        command_update(2, 2000, "/ask second"),
+    ]
+
+    asyncio.run(deliver(bot, updates, 1, telegram))
+
+    texts = [message['text'] for message in telegram.messages]
+    assert any('still being answered' in text for text in texts)
+    assert len(telegram.edits) == 1
+    assert bot._inflight == {}
+
+
+
+@pytest.fixture
+def webhook_client(telegram, monkeypatch):
+    """Flask test client with the webhook secret configured"""
+    monkeypatch.setattr(Config, 'TELEGRAM_WEBHOOK_SECRET', WEBHOOK_SECRET)
+    app_module.app.config['TESTING'] = True
+    return app_module.app.test_client()
+
+
+def test_webhook_keeps_per_chat_order(telegram, webhook_client):
+    """Test webhook updates from many chats are processed in parallel, each chat in order"""
+    ai = SlowAI(latency=0.05)
+    bot = TelegramBot(ai_manager=ai)
+    dispatcher = WebhookDispatcher(bot.build_application(polling=False), workers=3).start()
+    chats = [3001, 3002, 3003, 3004, 3005, 3006]
+    try:
+        for data in generate_updates(chats, per_chat=4):
+            response = webhook_client.post(
+                '/api/telegram/webhook', json=data,
+                headers={'X-Telegram-Bot-Api-Secret-Token': WEBHOOK_SECRET}
+            )
+            assert response.status_code == 200
+        assert dispatcher.flush(timeout=10)
+    finally:
+        dispatcher.stop()
+
+    assert get_webhook_dispatcher() is None
+    assert dispatcher.stats['processed'] == 24
+    assert ai.peak > 1
+    for chat_id in chats:
+        answers = [edit['text'] for edit in telegram.edits if int(edit['chat_id']) == chat_id]
+        assert answers == [f"🤖 AI Response:\n\nAnswer to question {n}\n\n"
+                           f"📊 Tokens used: 10 | Cost: $0.0001" for n in range(4)]
+
+
+def test_webhook_rejects_bad_secret_and_missing_dispatcher(webhook_client):
+    """Test the secret header is required and updates need a running dispatcher"""
+    data = command_update(1, 4001, '/start')
+    response = webhook_client.post('/api/telegram/webhook', json=data)
+    assert response.status_code == 401
+
+    response = webhook_client.post('/api/telegram/webhook', json=data,
+                                   headers={'X-Telegram-Bot-Api-Secret-Token': WEBHOOK_SECRET})
+    assert response.status_code == 503
+
+    assert shard_key(data) == 4001
+    assert shard_key({'update_id': 9, 'callback_query': {'from': {'id': 7}}}) == 7
+
+
+
+@pytest.fixture
+def broadcast_config(telegram, monkeypatch):
+    """Owner chat 1, small batches and a fast limiter"""
+    monkeypatch.setattr(Config, 'TELEGRAM_OWNER_ID', '1')
+    monkeypatch.setattr(Config, 'BROADCAST_BATCH_SIZE', 7)
+    monkeypatch.setattr(Config, 'BROADCAST_RATE', 500)
+    monkeypatch.setattr(Config, 'BROADCAST_PROGRESS_INTERVAL', 0)
+    return telegram
+
+
+def _add_recipients(db, count):
+    """Users 5001.. with Telegram IDs, plus one inactive and one email-only user"""
+    session = db.get_session()
+    users = [User(telegram_id=str(5000 + i)) for i in range(1, count + 1)]
+    session.add_all(users + [User(telegram_id='6000', is_active=False), User(email='web@example.com')])
+    session.commit()
+    ids = [user.id for user in users]
+    session.close()
+    return ids
+
+
+def _wait_for_job(db, job_id, timeout=10):
+    """Poll until the broadcast job leaves the running state"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        session = db.get_session()
+        job = session.get(BroadcastJob, job_id)
+        session.close()
+        if job and job.status != 'running':
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Broadcast #{job_id} did not finish")
+
+
+def test_broadcast_fans_out_in_batches(broadcast_config):
+    """Test /broadcast reaches every active user once and reports to the owner"""
+    telegram = broadcast_config
+    bot = TelegramBot(ai_manager=SlowAI())
+    _add_recipients(bot.db, 20)
+    telegram.blocked_chats.add('5005')
+
+    dispatcher = WebhookDispatcher(bot.build_application(polling=False), workers=2).start()
+    try:
+        dispatcher.submit(command_update(1, 1, "/broadcast Hello\nall"))
+        job = _wait_for_job(bot.db, 1)
+    finally:
+        dispatcher.stop()
+
+    recipients = [m['chat_id'] for m in telegram.messages if m['text'] == "Hello\nall"]
+    assert sorted(recipients) == [str(5000 + i) for i in range(1, 21) if i != 5]
+    assert (job.status, job.total, job.sent, job.failed) == ('completed', 20, 19, 1)
+
+    owner_messages = [m['text'] for m in telegram.messages if m['chat_id'] == '1']
+    assert owner_messages[0].startswith('📣 Broadcast #1 started')
+    assert telegram.edits[-1]['text'].startswith('✅ Broadcast #1 finished')
+
+
+def test_broadcast_resumes_from_checkpoint(broadcast_config):
+    """Test a job left running by a crash continues after its last checkpoint on start"""
+    telegram = broadcast_config
+    bot = TelegramBot(ai_manager=SlowAI())
+    user_ids = _add_recipients(bot.db, 20)
+    session = bot.db.get_session()
+    session.add(BroadcastJob(text='Resumed', owner_chat_id='1', total=20, sent=10,
+                             last_user_id=user_ids[9]))
+    session.commit()
+    session.close()
+
+    dispatcher = WebhookDispatcher(bot.build_application(polling=False)).start()
+    try:
+        job = _wait_for_job(bot.db, 1)
+    finally:
+        dispatcher.stop()
+
+    recipients = [m['chat_id'] for m in telegram.messages if m['text'] == 'Resumed']
+    assert sorted(recipients) == [str(5000 + i) for i in range(11, 21)]
+    assert (job.status, job.sent, job.failed) == ('completed', 20, 0)
+    assert any('resumed' in m['text'] for m in telegram.messages if m['chat_id'] == '1')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,180 @@
+"""
+Trending models fetcher tests for the Earning Robot.
+Run with: pytest tests/test_trending.py
+"""
+import pytest
+import sys
+import os
+import json
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.provider_selector import DynamicProviderSelector
+from backend.trend_store import TrendScoreStore, get_trend_store
+import backend.trending as trending
+from backend.trending import fetch_trending, persist_json
+from tests.stripe_fixtures import LiveServer
+
+FEED = {'data': [
+    {'name': 'Claude Sonnet', 'provider': 'anthropic', 'weekly_tokens': 900},
+    {'name': 'GPT-4o', 'provider': 'openai', 'weekly_tokens': 800},
+]}
+CSV = "name,provider,weekly_tokens\nMistral Large,mistral,700\n"
+
+
+class FeedApp:
+    """WSGI feed serving JSON with an ETag and optionally CSV; records requests per format"""
+
+    def __init__(self, json_status=200, serve_csv=True):
+        self.json_status = json_status
+        self.serve_csv = serve_csv
+        self.requests = []
+
+    def __call__(self, environ, start_response):
+        fmt = environ.get('QUERY_STRING', '').split('fmt=')[-1]
+        self.requests.append((fmt, environ.get('HTTP_IF_NONE_MATCH')))
+
+        if fmt == 'json':
+            if self.json_status != 200:
+                start_response(f'{self.json_status} Error', [('Content-Type', 'text/plain')])
+                return [b'error']
+            if environ.get('HTTP_IF_NONE_MATCH') == '"v1"':
+                start_response('304 Not Modified', [('ETag', '"v1"')])
+                return [b'']
+            start_response('200 OK', [('Content-Type', 'application/json'), ('ETag', '"v1"')])
+            return [json.dumps(FEED).encode('utf-8')]
+        if fmt == 'csv' and self.serve_csv:
+            start_response('200 OK', [('Content-Type', 'text/csv')])
+            return [CSV.encode('utf-8')]
+        start_response('404 Not Found', [('Content-Type', 'text/plain')])
+        return [b'not found']
+
+
+def test_unchanged_feed_is_revalidated_with_304(tmp_path):
+    """Test the second fetch sends the cached ETag and reuses the cached payload"""
+    app = FeedApp(serve_csv=False)
+    cache_path = str(tmp_path / 'cache.json')
+    with LiveServer(app) as server:
+        url = f"{server.url}/models?fmt=json"
+        first = fetch_trending(url, cache_path)
+        app.requests.clear()
+        second = fetch_trending(url, cache_path)
+
+    assert first.format == 'json' and not first.not_modified
+    assert [item['name'] for item in first.items] == ['Claude Sonnet', 'GPT-4o']
+    assert second.not_modified
+    assert second.items == first.items
+    # Only the revalidation (probe requests of the first fetch may still trickle in)
+    assert [request for request in app.requests if request[0] == 'json'] == [('json', '"v1"')]
+
+
+def test_probing_takes_first_working_format(tmp_path):
+    """Test a failing JSON endpoint falls back to CSV without waiting on it"""
+    app = FeedApp(json_status=500)
+    with LiveServer(app) as server:
+        result = fetch_trending(f"{server.url}/models?fmt=json", str(tmp_path / 'cache.json'))
+
+    assert result.format == 'csv'
+    assert result.items[0]['name'] == 'Mistral Large'
+
+
+def test_unavailable_feed_serves_last_good_payload(tmp_path):
+    """Test the cached payload is returned when every format fails"""
+    cache_path = str(tmp_path / 'cache.json')
+    with LiveServer(FeedApp(serve_csv=False)) as server:
+        url = f"{server.url}/models?fmt=json"
+        fetch_trending(url, cache_path)
+
+    # Server gone: every request fails
+    result = fetch_trending(url, cache_path)
+    assert result.not_modified
+    assert result.items[0]['name'] == 'Claude Sonnet'
+
+
+def test_losing_probe_connection_is_closed(tmp_path):
+    """Test a slow losing probe stops streaming once another format wins"""
+    stream_stopped = threading.Event()
+
+    def app(environ, start_response):
+        fmt = environ.get('QUERY_STRING', '').split('fmt=')[-1]
+        if fmt == 'csv':
+            start_response('200 OK', [('Content-Type', 'text/csv')])
+            return [CSV.encode('utf-8')]
+        if fmt != 'json':
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'not found']
+
+        def slow_body():
+            try:
+                for _ in range(100):
+                    yield b' ' * 1024
+                    time.sleep(0.1)
+            finally:
+                stream_stopped.set()
+
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return slow_body()
+
+    with LiveServer(app) as server:
+        result = fetch_trending(f"{server.url}/models?fmt=json", str(tmp_path / 'cache.json'))
+        assert result.format == 'csv'
+        # The full body would take 10 seconds
+        assert stream_stopped.wait(3)
+
+
+def test_unchanged_feed_rewrites_missing_output(tmp_path, monkeypatch):
+    """Test a 304 still republishes trending_models.json when it is missing"""
+    out_path = str(tmp_path / 'trending_models.json')
+    monkeypatch.setattr(trending, 'TRENDING_PATH', out_path)
+    monkeypatch.setattr(trending, 'FETCH_CACHE_PATH', str(tmp_path / 'cache.json'))
+    doc = tmp_path / 'doc.md'
+    doc.write_text(f"{trending.MARKER_BEGIN}\n{trending.MARKER_END}\n", encoding='utf-8')
+
+    with LiveServer(FeedApp(serve_csv=False)) as server:
+        monkeypatch.setattr(trending.Config, 'OPENROUTER_TREND_URL', f"{server.url}/models?fmt=json")
+        assert trending.update_openrouter_top_weekly([str(doc)])
+        assert not trending.update_openrouter_top_weekly([str(doc)])
+
+        os.remove(out_path)
+        trending.update_openrouter_top_weekly([str(doc)])
+
+    with open(out_path, encoding='utf-8') as f:
+        assert [item['name'] for item in json.load(f)['items']] == ['Claude Sonnet', 'GPT-4o']
+
+
+def test_trend_store_reloads_changed_file(tmp_path):
+    """Test selectors sharing a store see a rewritten file after the check interval"""
+    path = tmp_path / 'trending_models.json'
+    path.write_text(json.dumps({'items': FEED['data']}), encoding='utf-8')
+    store = TrendScoreStore(str(path), check_interval=0)
+    selector = DynamicProviderSelector(trend_store=store)
+
+    assert selector.trending == {'claude sonnet': 1.0, 'gpt-4o': 800 / 900}
+
+    path.write_text(json.dumps({'items': [{'name': 'GPT-4o', 'weekly_tokens': 10}]}), encoding='utf-8')
+    os.utime(path, ns=(0, 0))
+    assert store.score('GPT-4O') == 1.0
+    assert store.score('Claude Sonnet') == 0.0
+
+
+def test_persist_json_publishes_to_store(tmp_path):
+    """Test persisting trending items updates the shared store without a file check"""
+    path = str(tmp_path / 'trending_models.json')
+    store = get_trend_store(path)
+    store.check_interval = 3600
+    assert store.scores() == {}
+
+    persist_json(FEED['data'], path)
+
+    assert store.score('claude sonnet') == 1.0
+    assert get_trend_store(path) is store
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['items'] == FEED['data']
+    assert os.listdir(tmp_path) == ['trending_models.json']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])